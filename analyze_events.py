@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+analyze_events.py - Summarise the Adaptive EQ event stream
+
+Reads JSON-lines event files written by the daemon (see services/events.py)
+and reports preset switch counts, apply failure rates, Spotify API errors and
+latency distributions. Files are processed one line at a time with fixed-size
+histograms, so weeks of events don't need to fit in memory. Gzipped files
+(.gz) are read directly.
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import math
+import time
+import argparse
+from collections import Counter
+from services.events import DEFAULT_EVENTS_PATH
+
+class LatencyHistogram:
+    """Streaming latency distribution with logarithmic buckets (about 5% resolution)."""
+
+    BUCKETS_PER_DECADE = 48
+    MIN_SECONDS = 1e-5
+
+    def __init__(self):
+        self.buckets = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, seconds):
+        seconds = max(seconds, self.MIN_SECONDS)
+        self.buckets[int(math.log10(seconds / self.MIN_SECONDS) * self.BUCKETS_PER_DECADE)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def percentile(self, q):
+        """Approximate q-th percentile (0-100) in seconds: the upper bound of its bucket."""
+        if not self.count:
+            return None
+        rank = q / 100.0 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                upper = self.MIN_SECONDS * 10 ** ((bucket + 1) / self.BUCKETS_PER_DECADE)
+                return min(upper, self.max)
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean': self.total / self.count,
+            'min': self.min,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
+
+class EventStats:
+    """Aggregates events one at a time."""
+
+    def __init__(self, since=None):
+        self.since = since
+        self.first_ts = None
+        self.last_ts = None
+        self.events = Counter()
+        self.malformed = 0
+
+        self.tracks = 0
+        self.resolve_sources = Counter()
+        self.resolve_latency = LatencyHistogram()
+
+        self.switches = 0
+        self.applies = 0
+        self.apply_failures = 0
+        self.preset_applies = Counter()
+        self.preset_failures = Counter()
+        self.apply_latency = LatencyHistogram()
+        self._active_preset = None
+
+        # Track change → preset active, for tracks that needed a new preset
+        self.time_to_eq = LatencyHistogram()
+        self._track_detected_at = None
+
+        self.api_errors = Counter()
+
+    def add_line(self, line):
+        try:
+            event = json.loads(line)
+            kind = event['event']
+            ts = event['ts']
+        except (ValueError, KeyError, TypeError):
+            self.malformed += 1
+            return
+
+        if self.since is not None and ts < self.since:
+            return
+        if self.first_ts is None:
+            self.first_ts = ts
+        self.last_ts = ts
+        self.events[kind] += 1
+
+        if kind == 'track_detected':
+            self.tracks += 1
+            self._track_detected_at = ts
+        elif kind == 'preset_resolved':
+            self.resolve_sources[event.get('source')] += 1
+            if event.get('duration') is not None:
+                self.resolve_latency.add(event['duration'])
+        elif kind == 'apply_result':
+            self._add_apply_result(event, ts)
+        elif kind == 'api_error':
+            self.api_errors[(event.get('endpoint'), event.get('status'))] += 1
+
+    def _add_apply_result(self, event, ts):
+        preset = event.get('preset')
+        self.applies += 1
+        self.preset_applies[preset] += 1
+        if event.get('duration') is not None:
+            self.apply_latency.add(event['duration'])
+
+        if not event.get('success'):
+            self.apply_failures += 1
+            self.preset_failures[preset] += 1
+            return
+
+        if preset != self._active_preset:
+            self.switches += 1
+            self._active_preset = preset
+        if self._track_detected_at is not None:
+            self.time_to_eq.add(ts - self._track_detected_at)
+            self._track_detected_at = None
+
+    def report(self):
+        return {
+            'first_event': self.first_ts,
+            'last_event': self.last_ts,
+            'events': dict(self.events),
+            'malformed_lines': self.malformed,
+            'tracks_detected': self.tracks,
+            'preset_switches': self.switches,
+            'applies': self.applies,
+            'apply_failures': self.apply_failures,
+            'apply_failure_rate': self.apply_failures / self.applies if self.applies else 0.0,
+            'presets': {
+                preset: {'applies': count, 'failures': self.preset_failures[preset]}
+                for preset, count in self.preset_applies.most_common()
+            },
+            'resolve_sources': dict(self.resolve_sources),
+            'latency': {
+                'resolve': self.resolve_latency.summary(),
+                'apply': self.apply_latency.summary(),
+                'track_to_eq': self.time_to_eq.summary(),
+            },
+            'api_errors': [
+                {'endpoint': endpoint, 'status': status, 'count': count}
+                for (endpoint, status), count in self.api_errors.most_common()
+            ],
+        }
+
+def _open_events(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, 'r', encoding='utf-8', errors='replace')
+
+def _parse_since(value):
+    """Parse '36h', '7d' or '90m' into an epoch timestamp."""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([mhd])', value.strip())
+    if not match:
+        raise argparse.ArgumentTypeError("use a number followed by m, h or d (e.g. 7d)")
+    amount, unit = float(match.group(1)), match.group(2)
+    return time.time() - amount * {'m': 60, 'h': 3600, 'd': 86400}[unit]
+
+def _format_latency(summary):
+    if not summary['count']:
+        return "no samples"
+    ms = lambda seconds: f"{seconds * 1000:.1f} ms"
+    return (f"n={summary['count']}  mean {ms(summary['mean'])}  p50 {ms(summary['p50'])}  "
+            f"p90 {ms(summary['p90'])}  p99 {ms(summary['p99'])}  max {ms(summary['max'])}")
+
+def print_report(report):
+    """Print a human-readable report."""
+    if report['first_event'] is None:
+        print("No events found.")
+        return
+
+    fmt_time = lambda ts: time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))
+    print(f"\nEvents from {fmt_time(report['first_event'])} to {fmt_time(report['last_event'])}")
+    print(f"  {sum(report['events'].values())} events, {report['malformed_lines']} malformed lines")
+    for kind, count in sorted(report['events'].items()):
+        print(f"  {kind}: {count}")
+
+    print(f"\nTracks detected: {report['tracks_detected']}")
+    print(f"Preset switches: {report['preset_switches']}")
+    print(f"Applies: {report['applies']} ({report['apply_failures']} failed, "
+          f"{report['apply_failure_rate'] * 100:.1f}% failure rate)")
+
+    if report['presets']:
+        print("\nApplies by preset:")
+        for preset, counts in report['presets'].items():
+            print(f"  {preset}: {counts['applies']} ({counts['failures']} failed)")
+
+    if report['resolve_sources']:
+        print("\nPreset sources:")
+        for source, count in sorted(report['resolve_sources'].items(), key=lambda item: -item[1]):
+            print(f"  {source}: {count}")
+
+    print("\nLatency:")
+    print(f"  resolve:     {_format_latency(report['latency']['resolve'])}")
+    print(f"  apply:       {_format_latency(report['latency']['apply'])}")
+    print(f"  track → EQ:  {_format_latency(report['latency']['track_to_eq'])}")
+
+    if report['api_errors']:
+        print("\nSpotify API errors:")
+        for error in report['api_errors']:
+            status = f" (HTTP {error['status']})" if error['status'] else ""
+            print(f"  {error['endpoint']}{status}: {error['count']}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarise Adaptive EQ event files')
+    parser.add_argument('files', nargs='*',
+                        help=f'Event files, oldest first (default: {DEFAULT_EVENTS_PATH} and its rotated copy)')
+    parser.add_argument('--since', type=_parse_since, help='Only include recent events, e.g. 24h or 7d')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    files = args.files
+    if not files:
+        files = [path for path in (f"{DEFAULT_EVENTS_PATH}.1", DEFAULT_EVENTS_PATH) if os.path.exists(path)]
+        if not files:
+            print(f"No event file found at {DEFAULT_EVENTS_PATH}")
+            sys.exit(1)
+
+    stats = EventStats(since=args.since)
+    for path in files:
+        try:
+            with _open_events(path) as f:
+                for line in f:
+                    stats.add_line(line)
+        except OSError as e:
+            print(f"Error reading {path}: {e}")
+            sys.exit(1)
+
+    report = stats.report()
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
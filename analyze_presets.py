@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+analyze_presets.py - Check EQ presets for clipping and overlapping bands
+
+Computes the frequency response of every preset in one NumPy batch (see
+services/preset_analysis.py) and reports presets whose peak boost exceeds
+their output gain, with the output gain that would keep them from clipping,
+and presets with neighbouring bands whose gains stack up. With --compensate,
+clipping presets get the suggested output gain written to their files.
+With --duplicates, presets whose equalizers sound the same (see
+services/preset_similarity.py) are listed in groups, as candidates for
+consolidation.
+
+Requires NumPy.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from services.eq_control import EASYEFFECTS_PRESETS_PATH, SYSTEM_PRESETS_PATH
+from services.preset_analysis import analyze, load_preset_files, write_output_gain, SAMPLE_RATE, np
+from services.preset_similarity import near_duplicates, DEFAULT_THRESHOLD
+
+def print_report(results, elapsed, show_all=False):
+    """Print a human-readable report."""
+    clipping = [result for result in results if result['clips']]
+    overlapping = [result for result in results if result['overlaps']]
+    print(f"\nAnalyzed {len(results)} presets in {elapsed * 1000:.0f} ms")
+    print(f"  {len(clipping)} can clip, {len(overlapping)} have overlapping bands")
+
+    shown = results if show_all else clipping
+    if shown:
+        print("\nPeak boost (input gain included) and output gain:")
+        for result in sorted(shown, key=lambda result: result['headroom_db']):
+            line = (f"  {result['name']}: peak {result['peak_db']:+.1f} dB at {result['peak_hz']} Hz, "
+                    f"output gain {result['output_gain']:+.1f} dB")
+            if result['clips']:
+                line += f" → suggested {result['suggested_output_gain']:+.1f} dB"
+            print(line)
+
+    if overlapping:
+        print("\nOverlapping bands (gains stack up):")
+        for result in overlapping:
+            pairs = ", ".join(f"{low:g}/{high:g} Hz" for low, high in result['overlaps'])
+            print(f"  {result['name']}: {pairs}")
+
+def print_duplicates(groups, threshold):
+    """Print groups of presets that sound the same."""
+    if not groups:
+        print(f"\nNo presets within {threshold} dB (RMS) of each other.")
+        return
+    print(f"\nPresets that sound the same (equalizers within {threshold} dB RMS), "
+          f"{sum(len(group) for group in groups)} presets in {len(groups)} groups:")
+    for group in groups:
+        first, _ = group[0]
+        others = ", ".join(f"{name} ({distance:.2f} dB)" for name, distance in group[1:])
+        print(f"  {first}: {others}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Check EQ presets for clipping and overlapping bands')
+    parser.add_argument('paths', nargs='*',
+                        help=f'Preset files or directories (default: {EASYEFFECTS_PRESETS_PATH} and '
+                             f'{SYSTEM_PRESETS_PATH})')
+    parser.add_argument('--all', action='store_true', help='List every preset, not only those that can clip')
+    parser.add_argument('--sample-rate', type=int, default=SAMPLE_RATE,
+                        help=f'Sample rate the equalizer runs at (default: {SAMPLE_RATE})')
+    parser.add_argument('--compensate', action='store_true',
+                        help='Write the suggested output gain to the files of presets that can clip')
+    parser.add_argument('--duplicates', action='store_true',
+                        help='List groups of presets that sound the same, for consolidation')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Largest difference (dB RMS) counted as the same sound (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    args = parser.parse_args()
+
+    if np is None:
+        print("NumPy is required: pip install numpy")
+        sys.exit(1)
+
+    paths = args.paths or [path for path in (EASYEFFECTS_PRESETS_PATH, SYSTEM_PRESETS_PATH) if os.path.isdir(path)]
+    models, sources = load_preset_files(paths)
+    if not models:
+        print("No presets found.")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    results = analyze(models, sample_rate=args.sample_rate)
+    elapsed = time.perf_counter() - start
+
+    groups = near_duplicates(models, args.threshold) if args.duplicates else None
+
+    if args.json:
+        report = {'presets': results}
+        if groups is not None:
+            report['duplicates'] = [[{'name': name, 'distance': distance} for name, distance in group]
+                                    for group in groups]
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(results, elapsed, show_all=args.all)
+        if groups is not None:
+            print_duplicates(groups, args.threshold)
+
+    if args.compensate:
+        written = 0
+        for result in results:
+            if not result['clips']:
+                continue
+            try:
+                write_output_gain(sources[result['name']], result['suggested_output_gain'])
+                written += 1
+            except (OSError, ValueError) as e:
+                print(f"Error compensating {result['name']}: {e}", file=sys.stderr)
+        print(f"\nSet the suggested output gain on {written} preset(s).", file=sys.stderr if args.json else sys.stdout)
+
+if __name__ == "__main__":
+    main()
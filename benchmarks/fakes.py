@@ -0,0 +1,219 @@
+"""
+In-process fakes for benchmarking Adaptive EQ on a headless machine
+
+- FakeSpotify stands in for a spotipy.Spotify client, serving canned
+  playback state, playlists and artists without any network access.
+- install_fake_spotipy() registers a minimal spotipy module when the real one
+  isn't installed, so services.spotify can be imported.
+- FakeEasyEffects answers gsettings, dconf, dbus-send, pgrep, pkill and killall
+  in-process in place of subprocess, keeping the settings EasyEffects would hold.
+- FakeBackend is an AdaptiveEngine backend that applies presets instantly.
+- make_preset_dir() writes a directory of synthetic preset files.
+"""
+
+import os
+import sys
+import json
+import types
+import subprocess
+from unittest import mock
+
+GENRES = [
+    'rock', 'indie rock', 'hip hop', 'pop', 'dance pop', 'edm', 'classical', 'jazz',
+    'blues', 'folk', 'r&b', 'reggae', 'metal', 'ambient', 'soundtrack', 'singer-songwriter',
+]
+
+def install_fake_spotipy():
+    """Make `import spotipy` work without the real package (no-op if it is installed)."""
+    try:
+        import spotipy  # noqa: F401
+        return False
+    except ImportError:
+        pass
+
+    class SpotifyException(Exception):
+        def __init__(self, http_status, code, msg, reason=None, headers=None):
+            super().__init__(msg)
+            self.http_status = http_status
+            self.code = code
+            self.msg = msg
+
+    spotipy = types.ModuleType('spotipy')
+    spotipy.Spotify = FakeSpotify
+    spotipy.SpotifyException = SpotifyException
+    oauth2 = types.ModuleType('spotipy.oauth2')
+    oauth2.SpotifyOAuth = lambda *args, **kwargs: None
+    oauth2.SpotifyClientCredentials = type('SpotifyClientCredentials', (), {'__init__': lambda self, **kwargs: None})
+    spotipy.oauth2 = oauth2
+    cache_handler = types.ModuleType('spotipy.cache_handler')
+    cache_handler.MemoryCacheHandler = lambda *args, **kwargs: None
+    spotipy.cache_handler = cache_handler
+    sys.modules['spotipy'] = spotipy
+    sys.modules['spotipy.oauth2'] = oauth2
+    sys.modules['spotipy.cache_handler'] = cache_handler
+    return True
+
+def _artist(index):
+    return {'id': f"artist{index:06d}", 'name': f"Artist {index}"}
+
+def _track(index, artist_count):
+    artist = _artist(index % artist_count)
+    return {
+        'id': f"track{index:06d}",
+        'uri': f"spotify:track:track{index:06d}",
+        'name': f"Track {index}",
+        'duration_ms': 200000,
+        'artists': [artist],
+        'album': {'name': f"Album {index // 10}", 'images': [{'url': 'https://example.invalid/cover.jpg'}]},
+    }
+
+class FakeSpotify:
+    """Canned spotipy.Spotify replacement."""
+
+    def __init__(self, playlist_tracks=100, artist_count=50, **kwargs):
+        """
+        Args:
+            playlist_tracks (int): Tracks in every playlist
+            artist_count (int): Distinct artists the tracks are spread over
+        """
+        self.playlist_tracks = playlist_tracks
+        self.artist_count = artist_count
+        self.playing = _track(0, artist_count)
+        self.calls = 0
+
+    def current_user(self):
+        self.calls += 1
+        return {'id': 'benchmark', 'display_name': 'Benchmark'}
+
+    def current_playback(self):
+        self.calls += 1
+        return {
+            'is_playing': True,
+            'progress_ms': 60000,
+            'item': self.playing,
+            'context': {'type': 'playlist', 'uri': 'spotify:playlist:benchmark'},
+        }
+
+    def current_user_playing_track(self):
+        return self.current_playback()
+
+    def queue(self):
+        self.calls += 1
+        return {'currently_playing': self.playing,
+                'queue': [_track(i, self.artist_count) for i in range(1, 21)]}
+
+    def _page(self, offset, limit):
+        items = [{'track': _track(i, self.artist_count)}
+                 for i in range(offset, min(offset + limit, self.playlist_tracks))]
+        more = offset + limit < self.playlist_tracks
+        return {'items': items, 'offset': offset, 'limit': limit, 'total': self.playlist_tracks,
+                'next': f"fake://playlist?offset={offset + limit}&limit={limit}" if more else None}
+
+    def playlist_items(self, playlist_id, fields=None, limit=100, offset=0, **kwargs):
+        self.calls += 1
+        return self._page(offset, limit)
+
+    def next(self, result):
+        self.calls += 1
+        if not result.get('next'):
+            return None
+        return self._page(result['offset'] + result['limit'], result['limit'])
+
+    def artist(self, artist_id):
+        self.calls += 1
+        index = int(artist_id.replace('artist', ''))
+        return dict(_artist(index), genres=[GENRES[index % len(GENRES)]])
+
+    def artists(self, artist_ids):
+        return {'artists': [self.artist(artist_id) for artist_id in artist_ids]}
+
+    def search(self, q, type='artist', limit=1, **kwargs):
+        self.calls += 1
+        return {'artists': {'items': [dict(_artist(0), genres=[GENRES[0]])]}}
+
+class FakeEasyEffects:
+    """
+    Answers EasyEffects-related commands in-process.
+
+    Executables listed in `failing` exit with status 1, so later apply
+    methods can be exercised on their own.
+    """
+
+    def __init__(self, running=True, failing=()):
+        self.running = running
+        self.failing = set(failing)
+        self.settings = {'last-used-output-preset': 'default'}
+        self.commands = []
+
+    def run(self, cmd, *args, **kwargs):
+        self.commands.append(cmd)
+        name = cmd[0]
+        if name in self.failing:
+            return subprocess.CompletedProcess(cmd, 1, '', f"{name}: simulated failure")
+
+        stdout = ''
+        if name == 'gsettings' and cmd[1] == 'set':
+            self.settings[cmd[3]] = cmd[4]
+        elif name == 'gsettings' and cmd[1] == 'get':
+            stdout = f"'{self.settings.get(cmd[3], '')}'\n"
+        elif name == 'dbus-send' and cmd[-1].startswith('string:'):
+            self.settings['last-used-output-preset'] = cmd[-1][len('string:'):]
+        elif name == 'pgrep':
+            return subprocess.CompletedProcess(cmd, 0 if self.running else 1, '4242\n' if self.running else '', '')
+        return subprocess.CompletedProcess(cmd, 0, stdout, '')
+
+    def popen(self, cmd, *args, **kwargs):
+        self.commands.append(cmd)
+        self.running = True
+        return mock.Mock(pid=4242, returncode=None)
+
+    def installed(self):
+        """Context manager routing subprocess.run/Popen to this fake."""
+        return mock.patch.multiple(subprocess, run=self.run, Popen=self.popen)
+
+def make_preset_dir(path, count, names=None):
+    """
+    Write synthetic preset files to path: `count` of them named preset0000.json, ...,
+    or one per name in `names`.
+
+    Returns:
+        list: The preset names
+    """
+    os.makedirs(path, exist_ok=True)
+    names = list(names) if names is not None else [f"preset{i:04d}" for i in range(count)]
+    for i, name in enumerate(names):
+        data = {
+            'output': {
+                'blocklist': [],
+                'plugins_order': ['equalizer#0'],
+                'equalizer#0': {
+                    'mode': 'IIR',
+                    'num-bands': 10,
+                    'left': {
+                        f"band{band}": {'frequency': 31.25 * 2 ** band, 'gain': ((i + band) % 13) - 6.0, 'q': 1.5}
+                        for band in range(10)
+                    },
+                },
+            }
+        }
+        with open(os.path.join(path, f"{name}.json"), 'w') as f:
+            json.dump(data, f)
+    return names
+
+class FakeBackend:
+    """AdaptiveEngine backend that applies presets instantly and counts them."""
+
+    def __init__(self, fail=()):
+        """
+        Args:
+            fail (iterable): Presets whose application fails
+        """
+        self.fail = set(fail)
+        self.applied = []
+
+    def apply(self, preset):
+        self.applied.append(preset)
+        return preset not in self.fail
+
+    async def apply_async(self, preset):
+        return self.apply(preset)
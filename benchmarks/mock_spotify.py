@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+benchmarks/mock_spotify.py - Local mock of the Spotify Web API
+
+Emulates the endpoints Adaptive EQ uses (me, me/player, me/player/queue,
+search, artists, playlists/{id} and playlists/{id}/tracks (or /items) with paging, album
+tracks and artist top tracks) over a synthetic library of configurable size,
+for benchmarking and load-testing the polling and import paths offline.
+
+Faults can be injected: response latency, rate limiting (429 with
+Retry-After) and access tokens that expire.
+
+    python -m benchmarks.mock_spotify --artists 5000 --playlist-tracks 10000 --latency 0.05
+    SPOTIFY_API_URL=http://127.0.0.1:8899/v1 python main.py
+    python playlist_to_eq.py --api-url http://127.0.0.1:8899/v1 https://open.spotify.com/playlist/playlist0000
+
+Tokens are issued by POST /api/token (client credentials, any id/secret);
+GET /stats returns request counts by endpoint and status.
+"""
+
+import json
+import math
+import time
+import random
+import secrets
+import argparse
+import threading
+from collections import Counter
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from benchmarks.fakes import GENRES
+
+# Page size limits of the real API
+PLAYLIST_PAGE_LIMIT = 100
+ALBUM_PAGE_LIMIT = 50
+ARTISTS_BATCH_LIMIT = 50
+
+class SyntheticLibrary:
+    """Deterministic artists, tracks and playlists generated on demand."""
+
+    def __init__(self, artists=1000, playlists=10, playlist_tracks=500, album_tracks=10, queue_length=20,
+                 track_seconds=180):
+        """
+        Args:
+            artists (int): Number of artists
+            playlists (int): Number of playlists (playlist0000, playlist0001, ...)
+            playlist_tracks (int): Tracks per playlist
+            album_tracks (int): Tracks per album
+            queue_length (int): Tracks in the playback queue
+            track_seconds (float): How long each track "plays" before playback moves on
+        """
+        self.artists = artists
+        self.playlists = playlists
+        self.playlist_tracks = playlist_tracks
+        self.album_tracks = album_tracks
+        self.queue_length = queue_length
+        self.track_seconds = track_seconds
+        self.started = time.time()
+        self._names = {self.artist(i)['name'].lower(): i for i in range(artists)}
+
+    def artist(self, index, full=False):
+        artist = {
+            'id': f"artist{index:06d}",
+            'name': f"Artist {index}",
+            'type': 'artist',
+            'uri': f"spotify:artist:artist{index:06d}",
+        }
+        if full:
+            artist['genres'] = [GENRES[index % len(GENRES)], GENRES[(index * 7) % len(GENRES)]]
+            artist['popularity'] = index % 100
+        return artist
+
+    def track(self, index):
+        album = index // self.album_tracks
+        return {
+            'id': f"track{index:08d}",
+            'name': f"Track {index}",
+            'type': 'track',
+            'uri': f"spotify:track:track{index:08d}",
+            'duration_ms': int(self.track_seconds * 1000),
+            'artists': [self.artist(index % self.artists)],
+            'album': {'id': f"album{album:07d}", 'name': f"Album {album}", 'uri': f"spotify:album:album{album:07d}"},
+        }
+
+    @staticmethod
+    def index(object_id, prefix):
+        """Parse 'artist000042' → 42, or None if it isn't one of ours."""
+        if not object_id.startswith(prefix) or not object_id[len(prefix):].isdigit():
+            return None
+        return int(object_id[len(prefix):])
+
+    def playlist_track(self, playlist, position):
+        # Playlists overlap a little, like real ones
+        return self.track(playlist * self.playlist_tracks // 2 + position)
+
+    def now_playing(self):
+        """(track index, progress in ms) of the simulated playback."""
+        elapsed = time.time() - self.started
+        position = int(elapsed // self.track_seconds) % self.playlist_tracks
+        return position, int((elapsed % self.track_seconds) * 1000)
+
+    def search_artists(self, query, limit):
+        query = query.split(':', 1)[1] if query.startswith('artist:') else query
+        query = query.strip().strip('"').lower()
+        exact = self._names.get(query)
+        if exact is not None:
+            return [self.artist(exact, full=True)]
+        matches = []
+        for name, index in self._names.items():
+            if query in name:
+                matches.append(self.artist(index, full=True))
+                if len(matches) >= limit:
+                    break
+        return matches
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = 'MockSpotify/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.mock.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, body=None, headers=None):
+        data = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        if body is not None:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status, message, headers=None):
+        self._send_json(status, {'error': {'status': status, 'message': message}}, headers)
+
+    def do_POST(self):
+        mock = self.server.mock
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        if urlsplit(self.path).path != '/api/token':
+            mock.count('unknown', 404)
+            return self._error(404, 'Service not found')
+        mock.count('token', 200)
+        self._send_json(200, mock.issue_token())
+
+    def do_GET(self):
+        mock = self.server.mock
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if url.path == '/stats':
+            return self._send_json(200, mock.stats())
+        if not url.path.startswith('/v1/'):
+            mock.count('unknown', 404)
+            return self._error(404, 'Service not found')
+
+        parts = url.path[len('/v1/'):].strip('/').split('/')
+        endpoint = mock.endpoint_name(parts)
+        status, body, headers = mock.handle(parts, query, self.headers.get('Authorization', ''),
+                                            f"http://{self.headers.get('Host', mock.address)}")
+        mock.count(endpoint, status)
+        if status >= 400:
+            return self._error(status, body, headers)
+        self._send_json(status, body, headers)
+
+class MockSpotifyServer:
+    """Serves a SyntheticLibrary over HTTP, with optional latency, rate limits and token expiry."""
+
+    def __init__(self, library=None, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, rate_limit=None,
+                 token_ttl=3600, advertised_ttl=None, require_auth=True, verbose=False):
+        """
+        Args:
+            library (SyntheticLibrary): Data to serve (a default-sized one if None)
+            host (str): Address to listen on
+            port (int): Port to listen on, 0 for any free port
+            latency (float): Seconds added to every API response
+            jitter (float): Random extra latency, up to this many seconds
+            rate_limit (float): Requests per second before answering 429, or None
+            token_ttl (float): Seconds an access token is accepted
+            advertised_ttl (float): expires_in reported to clients (defaults to token_ttl);
+                                    set it higher to make tokens expire early
+            require_auth (bool): Reject requests without a valid token
+            verbose (bool): Log every request
+        """
+        self.library = library or SyntheticLibrary()
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.token_ttl = token_ttl
+        self.advertised_ttl = advertised_ttl if advertised_ttl is not None else token_ttl
+        self.require_auth = require_auth
+        self.verbose = verbose
+
+        self._tokens = {}
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._allowance = rate_limit or 0
+        self._last_request = time.monotonic()
+
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.mock = self
+        self._thread = None
+
+    @property
+    def address(self):
+        host, port = self._server.server_address[:2]
+        return f"{host}:{port}"
+
+    @property
+    def url(self):
+        """Base URL to use as SPOTIFY_API_URL."""
+        return f"http://{self.address}/v1/"
+
+    def start(self):
+        """Serve on a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-spotify", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def count(self, endpoint, status):
+        with self._lock:
+            self._counts[(endpoint, status)] += 1
+
+    def stats(self):
+        """Request counts by endpoint and status."""
+        with self._lock:
+            return [{'endpoint': endpoint, 'status': status, 'count': count}
+                    for (endpoint, status), count in sorted(self._counts.items())]
+
+    def issue_token(self):
+        token = secrets.token_urlsafe(24)
+        with self._lock:
+            now = time.time()
+            # Forget expired tokens so a long load test doesn't grow the table
+            self._tokens = {key: expiry for key, expiry in self._tokens.items() if expiry > now}
+            self._tokens[token] = now + self.token_ttl
+        return {'access_token': token, 'token_type': 'Bearer', 'expires_in': int(self.advertised_ttl)}
+
+    def _check_token(self, authorization):
+        if not self.require_auth:
+            return None
+        if not authorization.startswith('Bearer '):
+            return 'No token provided'
+        with self._lock:
+            expiry = self._tokens.get(authorization[len('Bearer '):])
+        if expiry is None:
+            return 'Invalid access token'
+        if expiry <= time.time():
+            return 'The access token expired'
+        return None
+
+    def _retry_after(self):
+        """Token bucket: seconds until the next request is allowed, or 0 to allow it now."""
+        if not self.rate_limit:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            self._allowance = min(self.rate_limit, self._allowance + (now - self._last_request) * self.rate_limit)
+            self._last_request = now
+            if self._allowance >= 1:
+                self._allowance -= 1
+                return 0
+            return (1 - self._allowance) / self.rate_limit
+
+    @staticmethod
+    def endpoint_name(parts):
+        """Endpoint label for stats, with IDs replaced by placeholders."""
+        if parts[0] in ('playlists', 'artists', 'albums') and len(parts) > 1:
+            return '/'.join([parts[0], '{id}'] + parts[2:])
+        return '/'.join(parts)
+
+    def handle(self, parts, query, authorization, origin):
+        """
+        Answer one API request.
+
+        Returns:
+            tuple: (status, body or error message, extra headers)
+        """
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+
+        retry_after = self._retry_after()
+        if retry_after:
+            return 429, 'API rate limit exceeded', {'Retry-After': str(max(1, math.ceil(retry_after)))}
+
+        auth_error = self._check_token(authorization)
+        if auth_error:
+            return 401, auth_error, None
+
+        library = self.library
+        route = parts[0]
+        if parts == ['me']:
+            return 200, {'id': 'mock-user', 'display_name': 'Mock User', 'type': 'user'}, None
+        if parts in (['me', 'player'], ['me', 'player', 'currently-playing']):
+            position, progress = library.now_playing()
+            return 200, {
+                'is_playing': True,
+                'progress_ms': progress,
+                'currently_playing_type': 'track',
+                'item': library.playlist_track(0, position),
+                'context': {'type': 'playlist', 'uri': 'spotify:playlist:playlist0000'},
+            }, None
+        if parts == ['me', 'player', 'queue']:
+            position, _ = library.now_playing()
+            return 200, {
+                'currently_playing': library.playlist_track(0, position),
+                'queue': [library.playlist_track(0, (position + i) % library.playlist_tracks)
+                          for i in range(1, library.queue_length + 1)],
+            }, None
+        if parts == ['search']:
+            limit = min(int(query.get('limit', 10)), 50)
+            items = library.search_artists(query.get('q', ''), limit)
+            return 200, {'artists': {'items': items, 'limit': limit, 'offset': 0, 'total': len(items), 'next': None}}, None
+        if route == 'artists':
+            return self._artists(parts, query)
+        if route == 'playlists' and len(parts) in (2, 3):
+            return self._playlist(parts, query, origin)
+        if route == 'albums' and len(parts) == 3 and parts[2] == 'tracks':
+            return self._album_tracks(parts[1], query, origin)
+        return 404, 'Service not found', None
+
+    def _artists(self, parts, query):
+        library = self.library
+        if len(parts) == 1:
+            ids = [artist_id for artist_id in query.get('ids', '').split(',') if artist_id]
+            if not ids or len(ids) > ARTISTS_BATCH_LIMIT:
+                return 400, f"Between 1 and {ARTISTS_BATCH_LIMIT} ids are required", None
+            indices = [library.index(artist_id, 'artist') for artist_id in ids]
+            return 200, {'artists': [
+                library.artist(index, full=True) if index is not None and index < library.artists else None
+                for index in indices
+            ]}, None
+
+        index = library.index(parts[1], 'artist')
+        if index is None or index >= library.artists:
+            return 404, 'Non existing id', None
+        if len(parts) == 2:
+            return 200, library.artist(index, full=True), None
+        if parts[2] == 'top-tracks':
+            return 200, {'tracks': [library.track(index + i * library.artists) for i in range(10)]}, None
+        return 404, 'Service not found', None
+
+    def _page(self, items_for, total, query, max_limit, next_url):
+        offset = max(0, int(query.get('offset', 0)))
+        limit = max(1, min(int(query.get('limit', max_limit)), max_limit))
+        end = min(offset + limit, total)
+        return {
+            'href': next_url(offset, limit),
+            'items': [items_for(position) for position in range(offset, end)],
+            'limit': limit,
+            'offset': offset,
+            'total': total,
+            'next': next_url(end, limit) if end < total else None,
+            'previous': next_url(max(0, offset - limit), limit) if offset else None,
+        }
+
+    def _playlist(self, parts, query, origin):
+        library = self.library
+        playlist = library.index(parts[1], 'playlist')
+        if playlist is None or playlist >= library.playlists:
+            return 404, 'Not found.', None
+        # Newer spotipy versions read playlist tracks from /items
+        if len(parts) == 3 and parts[2] not in ('tracks', 'items'):
+            return 404, 'Service not found', None
+
+        tracks_url = f"{origin}/v1/playlists/{parts[1]}/{parts[2] if len(parts) == 3 else 'tracks'}"
+        page = self._page(
+            lambda position: {'added_at': '2024-01-01T00:00:00Z', 'track': library.playlist_track(playlist, position)},
+            library.playlist_tracks, query if len(parts) == 3 else {}, PLAYLIST_PAGE_LIMIT,
+            lambda offset, limit: f"{tracks_url}?offset={offset}&limit={limit}"
+        )
+        if len(parts) == 3:
+            return 200, page, None
+        return 200, {
+            'id': parts[1],
+            'name': f"Playlist {playlist}",
+            'type': 'playlist',
+            'uri': f"spotify:playlist:{parts[1]}",
+            'owner': {'id': 'mock-user'},
+            'tracks': page,
+        }, None
+
+    def _album_tracks(self, album_id, query, origin):
+        library = self.library
+        album = library.index(album_id, 'album')
+        if album is None:
+            return 404, 'Non existing id', None
+        first = album * library.album_tracks
+        return 200, self._page(
+            lambda position: library.track(first + position), library.album_tracks, query, ALBUM_PAGE_LIMIT,
+            lambda offset, limit: f"{origin}/v1/albums/{album_id}/tracks?offset={offset}&limit={limit}"
+        ), None
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a mock Spotify Web API for offline testing')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8899, help='Port to listen on')
+    parser.add_argument('--artists', type=int, default=1000, help='Artists in the synthetic library')
+    parser.add_argument('--playlists', type=int, default=10, help='Number of playlists')
+    parser.add_argument('--playlist-tracks', type=int, default=500, help='Tracks per playlist')
+    parser.add_argument('--track-seconds', type=float, default=180, help='Seconds before playback moves to the next track')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every API response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Random extra latency, up to this many seconds')
+    parser.add_argument('--rate-limit', type=float, help='Requests per second before answering 429 with Retry-After')
+    parser.add_argument('--token-ttl', type=float, default=3600, help='Seconds an access token stays valid')
+    parser.add_argument('--expire-early', action='store_true',
+                        help='Advertise tokens as valid for an hour while they expire after --token-ttl')
+    parser.add_argument('--no-auth', action='store_true', help='Accept requests without a valid token')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Log every request')
+    args = parser.parse_args()
+
+    library = SyntheticLibrary(artists=args.artists, playlists=args.playlists,
+                               playlist_tracks=args.playlist_tracks, track_seconds=args.track_seconds)
+    server = MockSpotifyServer(
+        library, host=args.host, port=args.port, latency=args.latency, jitter=args.jitter,
+        rate_limit=args.rate_limit, token_ttl=args.token_ttl,
+        advertised_ttl=3600 if args.expire_early else None, require_auth=not args.no_auth,
+        verbose=args.verbose
+    )
+    print(f"Mock Spotify Web API on {server.url}")
+    print(f"  export SPOTIFY_API_URL={server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("\nRequests:")
+        for entry in server.stats():
+            print(f"  {entry['endpoint']} {entry['status']}: {entry['count']}")
+
+if __name__ == "__main__":
+    main()
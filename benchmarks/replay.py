@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+benchmarks/replay.py - Replay playback traces through the Adaptive EQ pipeline
+
+Feeds a recorded listening session (main.py --record-trace, see
+services/trace.py) through the real AdaptiveEngine on a virtual clock:
+polls are answered from the trace and presets go to a fake backend, so a
+day of listening replays in seconds. The report shows what that session
+costs under the chosen settings: polls (each one a Spotify API request),
+applies, how long after a track started its preset was active, and the CPU
+time spent in the pipeline.
+
+    python -m benchmarks.replay ~/listening.jsonl.gz
+    python -m benchmarks.replay ~/listening.jsonl.gz --scheduler fixed --poll-interval 2 --json
+    python -m benchmarks.replay --synthesize 24 --map-fraction 0.6 --backend commands
+
+Without a recording, --synthesize generates a day-like session instead.
+"""
+
+import os
+import json
+import time
+import random
+import shutil
+import tempfile
+import argparse
+
+# Isolate the run from the user's config and caches before any service module is imported
+_BENCH_HOME = tempfile.mkdtemp(prefix='adaptive-eq-replay-')
+os.environ['HOME'] = _BENCH_HOME
+os.environ['ADAPTIVE_EQ_EVENTS'] = 'off'
+os.environ.setdefault('ADAPTIVE_EQ_LOG_LEVEL', 'error')
+
+from benchmarks.fakes import (  # noqa: E402
+    GENRES, FakeBackend, FakeEasyEffects, install_fake_spotipy, make_preset_dir
+)
+install_fake_spotipy()
+
+from services import eq_control  # noqa: E402
+from services.engine import (  # noqa: E402
+    AdaptiveEngine, EasyEffectsBackend, FixedIntervalScheduler, TrackBoundaryScheduler
+)
+from services.events import EventLog  # noqa: E402
+from services.profiles import load_profile_map, DEFAULT_PROFILE_PATH  # noqa: E402
+from services.trace import TraceRecorder, TraceTrackSource, VirtualClock, load_trace  # noqa: E402
+from analyze_events import LatencyHistogram  # noqa: E402
+
+def synthesize_trace(path, hours=24, artists=300, seed=0):
+    """
+    Write a synthetic listening session: playlist sessions of 30 minutes to
+    3 hours with pauses in between, runs of tracks by the same artist, skips
+    and the occasional seek.
+    """
+    rng = random.Random(seed)
+    recorder = TraceRecorder(path)
+    start = 1_700_000_000.0
+    end = start + hours * 3600
+    now = start
+    track_number = 0
+
+    while now < end:
+        session_end = min(end, now + rng.uniform(1800, 3 * 3600))
+        context = {'type': 'playlist', 'uri': f"spotify:playlist:synthetic{rng.randrange(20):02d}"}
+        artist = rng.randrange(artists)
+        while now < session_end:
+            # Albums and artist radio play several tracks by the same artist in a row
+            if rng.random() > 0.4:
+                artist = rng.randrange(artists)
+            track_number += 1
+            duration = rng.randint(150, 330) * 1000
+            track = {
+                'id': f"synthetic{track_number:07d}",
+                'artist': f"Artist {artist}",
+                'all_artists': [f"Artist {artist}"],
+                'artist_ids': [f"artist{artist:06d}"],
+                'track': f"Track {track_number}",
+                'album': f"Album {artist}-{track_number // 10}",
+                'uri': f"spotify:track:synthetic{track_number:07d}",
+                'duration_ms': duration,
+                'context': context,
+            }
+            recorder.record(dict(track, progress_ms=0), now)
+
+            played = duration / 1000
+            if rng.random() < 0.1:
+                played = rng.uniform(5, 60)  # Skipped
+            elif rng.random() < 0.05:
+                # Seek forward halfway through
+                seek_at = played / 2
+                recorder.record(dict(track, progress_ms=int(duration * 0.8)), now + seek_at)
+                played = seek_at + played * 0.2
+            now += played
+
+        recorder.record(None, now)
+        now += rng.uniform(600, 4 * 3600)
+
+    recorder.record(None, min(now, end))
+    recorder.close()
+
+def build_engine(trace, clock, args):
+    """The engine under test, configured from the command line."""
+    if args.scheduler == 'fixed':
+        scheduler = FixedIntervalScheduler(args.poll_interval, args.idle_interval, args.idle_max_interval)
+    else:
+        scheduler = TrackBoundaryScheduler(args.poll_interval, args.idle_interval, args.boundary_margin,
+                                           args.idle_max_interval)
+
+    if args.map_fraction is not None:
+        # Map a share of the artists in the trace, spread over the genre presets
+        artists = sorted({track['artist'] for track in trace.tracks.values()})
+        rng = random.Random(0)
+        profile_map = {artist: GENRES[i % len(GENRES)].replace(' ', '-')
+                       for i, artist in enumerate(artists) if rng.random() < args.map_fraction}
+    else:
+        profile_map = load_profile_map(args.profiles)
+
+    if args.backend == 'commands':
+        # The real apply path (eq_control) with EasyEffects' commands answered in-process
+        presets = sorted(set(profile_map.values()) | {args.default_preset})
+        make_preset_dir(eq_control.EASYEFFECTS_PRESETS_PATH, 0, names=presets)
+        eq_control.SYSTEM_PRESETS_PATH = os.path.join(_BENCH_HOME, 'no-system-presets')
+        backend = EasyEffectsBackend()
+        if args.no_preset_cache:
+            apply = backend.apply
+            backend.apply = lambda preset: (eq_control.invalidate_preset_cache(), apply(preset))[1]
+    else:
+        backend = FakeBackend()
+
+    return AdaptiveEngine(
+        source=TraceTrackSource(trace, clock), backend=backend, scheduler=scheduler,
+        profile_map=profile_map, default_preset=args.default_preset,
+        skip_identical=not args.no_skip_identical, events=EventLog(None)
+    )
+
+def replay(trace, engine, clock, speed=None):
+    """
+    Run the engine's poll loop over the whole trace.
+
+    Args:
+        speed (float): Pace the replay at this multiple of real time; None replays as fast as possible
+
+    Returns:
+        dict: Replay statistics
+    """
+    time_to_eq = LatencyHistogram()
+    tracks_seen = []
+
+    def on_track(track):
+        if track and (not tracks_seen or tracks_seen[-1] != track['id']):
+            tracks_seen.append(track['id'])
+
+    def on_preset(preset, artist):
+        started = trace.track_started_at(clock())
+        if started is not None:
+            time_to_eq.add(max(0.0, clock() - started))
+
+    engine.on_track = on_track
+    engine.on_preset = on_preset
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    while clock() < trace.end:
+        track = engine.poll_once()
+        delay = engine.scheduler.next_delay(track)
+        clock.advance(delay)
+        if speed:
+            time.sleep(delay / speed)
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+
+    trace_tracks = sum(1 for i, state in enumerate(trace.states)
+                       if state[1] is not None and (i == 0 or trace.states[i - 1][1] != state[1]))
+    hours = trace.duration / 3600 or 1
+    stats = engine.stats
+    return {
+        'trace_hours': round(trace.duration / 3600, 3),
+        'trace_tracks': trace_tracks,
+        'tracks_observed': len(tracks_seen),
+        'polls': stats['polls'],
+        'api_calls': stats['polls'],
+        'api_calls_per_hour': round(stats['polls'] / hours, 1),
+        'artist_changes': stats['artist_changes'],
+        'applies': stats['applies'],
+        'applies_skipped': stats['applies_skipped'],
+        'apply_failures': stats['apply_failures'],
+        'time_to_eq': time_to_eq.summary(),
+        'cpu_ms': round(cpu * 1000, 1),
+        'cpu_ms_per_hour': round(cpu * 1000 / hours, 2),
+        'cpu_ms_per_day': round(cpu * 1000 / hours * 24, 1),
+        'wall_seconds': round(wall, 3),
+        'speedup': round(trace.duration / wall) if wall else None,
+    }
+
+def print_report(report, settings):
+    print(f"\nReplayed {report['trace_hours']} h of playback "
+          f"({report['trace_tracks']} tracks) in {report['wall_seconds']} s ({report['speedup']}x)")
+    print(f"Settings: {', '.join(f'{key}={value}' for key, value in settings.items())}")
+    print(f"\nPolls / API calls:  {report['polls']} ({report['api_calls_per_hour']} per hour)")
+    print(f"Tracks observed:    {report['tracks_observed']} of {report['trace_tracks']}")
+    print(f"Artist changes:     {report['artist_changes']}")
+    print(f"Applies:            {report['applies']} ({report['applies_skipped']} skipped as identical, "
+          f"{report['apply_failures']} failed)")
+    lag = report['time_to_eq']
+    if lag['count']:
+        print(f"Track start → EQ:   mean {lag['mean']:.2f} s, p50 {lag['p50']:.2f} s, "
+              f"p90 {lag['p90']:.2f} s, max {lag['max']:.2f} s")
+    print(f"Pipeline CPU time:  {report['cpu_ms']} ms ({report['cpu_ms_per_hour']} ms per listening hour, "
+          f"{report['cpu_ms_per_day']} ms per day)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a playback trace through the Adaptive EQ pipeline')
+    parser.add_argument('trace', nargs='?', help='Trace file recorded with main.py --record-trace')
+    parser.add_argument('--synthesize', type=float, metavar='HOURS',
+                        help='Replay a synthetic session of this many hours instead of a recording')
+    parser.add_argument('--save-trace', metavar='PATH', help='Keep the synthetic trace at this path')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for --synthesize')
+    parser.add_argument('--speed', type=float, help='Pace the replay at this multiple of real time, e.g. 1000')
+    parser.add_argument('--scheduler', choices=('boundary', 'fixed'), default='boundary',
+                        help='Poll scheduler (default: boundary, as used by the daemon)')
+    parser.add_argument('--poll-interval', type=float, default=5, help='Seconds between polls while playing')
+    parser.add_argument('--idle-interval', type=float, default=10, help='Seconds between polls while idle')
+    parser.add_argument('--idle-max-interval', type=float, default=300,
+                        help='Ceiling of the idle backoff (set to --idle-interval to disable it)')
+    parser.add_argument('--boundary-margin', type=float, default=0.25,
+                        help='Seconds after a track boundary to poll (boundary scheduler)')
+    parser.add_argument('--profiles', default=DEFAULT_PROFILE_PATH, help='Artist → preset profile map')
+    parser.add_argument('--map-fraction', type=float,
+                        help='Instead of --profiles, map this fraction of the trace\'s artists to presets')
+    parser.add_argument('--default-preset', default='default', help='Preset for unmapped artists')
+    parser.add_argument('--no-skip-identical', action='store_true', help='Re-apply presets that are already active')
+    parser.add_argument('--backend', choices=('fake', 'commands'), default='fake',
+                        help='fake: instant in-memory applies; commands: the eq_control apply path '
+                             'with EasyEffects commands answered in-process')
+    parser.add_argument('--no-preset-cache', action='store_true',
+                        help='Drop the parsed preset cache before every apply (commands backend)')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    if not args.trace and not args.synthesize:
+        parser.error('give a trace file or --synthesize HOURS')
+
+    try:
+        trace_path = args.trace
+        if args.synthesize:
+            trace_path = args.save_trace or os.path.join(_BENCH_HOME, 'synthetic.jsonl.gz')
+            synthesize_trace(trace_path, hours=args.synthesize, seed=args.seed)
+        trace = load_trace(trace_path)
+
+        clock = VirtualClock()
+        if args.backend == 'commands':
+            with FakeEasyEffects().installed():
+                engine = build_engine(trace, clock, args)
+                report = replay(trace, engine, clock, args.speed)
+        else:
+            engine = build_engine(trace, clock, args)
+            report = replay(trace, engine, clock, args.speed)
+    finally:
+        shutil.rmtree(_BENCH_HOME, ignore_errors=True)
+
+    settings = {
+        'scheduler': args.scheduler,
+        'poll_interval': args.poll_interval,
+        'idle_interval': args.idle_interval,
+        'idle_max_interval': args.idle_max_interval,
+        'skip_identical': not args.no_skip_identical,
+        'backend': args.backend,
+        'preset_cache': not args.no_preset_cache,
+        'profiles': len(engine.profile_map),
+    }
+    if args.json:
+        print(json.dumps({'settings': settings, 'report': report}, indent=2))
+    else:
+        print_report(report, settings)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+benchmarks/run.py - Microbenchmarks for Adaptive EQ's hot paths
+
+Runs headless: Spotify and EasyEffects are replaced by the in-process fakes
+in benchmarks/fakes.py, and HOME points at a temporary directory so the real
+configuration and caches are never touched.
+
+    python -m benchmarks.run -o results.json
+    python -m benchmarks.run --filter apply --compare results.json
+
+Results are written as JSON (one entry per benchmark and parameter set) so
+runs from different versions can be compared with --compare.
+"""
+
+import os
+import json
+import time
+import shutil
+import platform
+import tempfile
+import argparse
+import itertools
+import statistics
+import contextlib
+import subprocess
+from unittest import mock
+
+# Isolate the run from the user's config and caches before any service module is imported
+_BENCH_HOME = tempfile.mkdtemp(prefix='adaptive-eq-bench-')
+os.environ['HOME'] = _BENCH_HOME
+os.environ['ADAPTIVE_EQ_EVENTS'] = 'off'
+os.environ.setdefault('ADAPTIVE_EQ_LOG_LEVEL', 'error')
+
+from benchmarks.fakes import (  # noqa: E402
+    GENRES, FakeSpotify, FakeEasyEffects, install_fake_spotipy, make_preset_dir
+)
+install_fake_spotipy()
+
+from services import spotify, eq_control  # noqa: E402
+from services.engine import AdaptiveEngine  # noqa: E402
+from services.events import EventLog  # noqa: E402
+from services.genres import recommend_preset  # noqa: E402
+import playlist_to_eq  # noqa: E402
+
+RESULTS_VERSION = 1
+
+# Registered benchmarks: (name, params, setup)
+BENCHMARKS = []
+
+def benchmark(name, **params):
+    """
+    Register a benchmark. The decorated generator function receives the params,
+    does its setup, yields the callable to time and cleans up afterwards.
+    Stack the decorator to run the same benchmark with several parameter sets.
+    """
+    def decorator(setup):
+        # Stacked decorators apply bottom-up; keep them in the order they are written
+        index = next((i for i, entry in enumerate(BENCHMARKS) if entry[2] is setup), len(BENCHMARKS))
+        BENCHMARKS.insert(index, (name, params, setup))
+        return setup
+    return decorator
+
+def _isolated_presets(count):
+    """Point eq_control at a fresh preset directory holding `count` presets."""
+    path = tempfile.mkdtemp(prefix='presets-', dir=_BENCH_HOME)
+    names = make_preset_dir(path, count)
+    patches = mock.patch.multiple(
+        eq_control, EASYEFFECTS_PRESETS_PATH=path + os.sep,
+        SYSTEM_PRESETS_PATH=os.path.join(_BENCH_HOME, 'no-system-presets')
+    )
+    return path, names, patches
+
+@benchmark('get_current_track', track_changes=False)
+@benchmark('get_current_track', track_changes=True)
+def bench_get_current_track(track_changes):
+    client = FakeSpotify(artist_count=50)
+    tracks = itertools.cycle([client.playing, dict(client.playing, id='track-other', uri='spotify:track:other')])
+
+    def poll():
+        if track_changes:
+            client.playing = next(tracks)
+        return spotify.get_current_track()
+
+    with mock.patch.object(spotify, '_spotify_client', client):
+        yield poll
+
+@benchmark('apply_eq_preset', method='gsettings')
+@benchmark('apply_eq_preset', method='dbus')
+@benchmark('apply_eq_preset', method='file')
+@benchmark('apply_eq_preset', method='config')
+def bench_apply_eq_preset(method):
+    # Each method is reached by making the ones before it fail; 'config' is the
+    # forced-refresh path that runs every method
+    failing = {'gsettings': (), 'dbus': ('gsettings',), 'file': ('gsettings', 'dbus-send')}.get(method, ())
+    easyeffects = FakeEasyEffects(failing=failing)
+    path, names, patches = _isolated_presets(20)
+    preset = names[0]
+
+    with patches, easyeffects.installed():
+        eq_control.preload_presets([preset])
+        # Applying the preset once makes later applies skip the automatic refresh
+        eq_control.apply_eq_preset(preset)
+        yield lambda: eq_control.apply_eq_preset(preset, force_ui_refresh=(method == 'config'))
+    eq_control.invalidate_preset_cache()
+    shutil.rmtree(path, ignore_errors=True)
+
+@benchmark('get_available_presets', presets=10)
+@benchmark('get_available_presets', presets=1000)
+@benchmark('get_available_presets', presets=10000)
+def bench_get_available_presets(presets):
+    path, names, patches = _isolated_presets(presets)
+    with patches:
+        yield eq_control.get_available_presets
+    shutil.rmtree(path, ignore_errors=True)
+
+@benchmark('profile_lookup', profiles=100)
+@benchmark('profile_lookup', profiles=10000)
+def bench_profile_lookup(profiles):
+    profile_map = {f"Artist {i}": GENRES[i % len(GENRES)] for i in range(profiles)}
+    engine = AdaptiveEngine(source=object(), backend=object(), profile_map=profile_map, events=EventLog(None))
+    # Half of the lookups miss and fall through to the default preset
+    tracks = itertools.cycle([{'artist': f"Artist {i}", 'artist_ids': [f"artist{i:06d}"]}
+                              for i in range(0, profiles * 2, max(1, profiles // 500))])
+    yield lambda: engine.resolve_preset(next(tracks))
+
+@benchmark('recommend_preset', genres=1)
+@benchmark('recommend_preset', genres=5)
+def bench_recommend_preset(genres):
+    genre_lists = itertools.cycle([
+        [GENRES[(i + j) % len(GENRES)] + suffix for j in range(genres)]
+        for i in range(len(GENRES)) for suffix in ('', ' revival', ' underground')
+    ])
+    yield lambda: recommend_preset(next(genre_lists))
+
+@benchmark('get_unique_artists', tracks=100)
+@benchmark('get_unique_artists', tracks=10000)
+def bench_get_unique_artists(tracks):
+    client = FakeSpotify(playlist_tracks=tracks, artist_count=max(1, tracks // 5))
+
+    def run():
+        # The script reports progress on stdout
+        with contextlib.redirect_stdout(None):
+            return playlist_to_eq.get_unique_artists(client, 'benchmark')
+    yield run
+
+def measure(func, min_time=0.2, repeat=5):
+    """
+    Time func: calibrate the loop count so one round takes at least min_time,
+    then run `repeat` rounds.
+
+    Returns:
+        dict: Loop count and per-call timings in seconds
+    """
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1_000_000:
+            break
+        loops = min(1_000_000, loops * 10 if elapsed < min_time / 10 else loops * 2)
+
+    timings = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        timings.append((time.perf_counter() - start) / loops)
+
+    median = statistics.median(timings)
+    return {
+        'loops': loops,
+        'repeat': repeat,
+        'min': min(timings),
+        'median': median,
+        'mean': statistics.mean(timings),
+        'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        'ops_per_sec': 1 / median if median else None,
+    }
+
+def _git_commit():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), timeout=5)
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def _key(result):
+    return (result['name'], json.dumps(result['params'], sort_keys=True))
+
+def _format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('µs', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+def _describe(result):
+    params = ', '.join(f"{key}={value}" for key, value in result['params'].items())
+    return f"{result['name']}({params})"
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the Adaptive EQ microbenchmarks')
+    parser.add_argument('-o', '--output', help='Write the results to this JSON file')
+    parser.add_argument('--filter', help='Only run benchmarks whose name contains this text')
+    parser.add_argument('--quick', action='store_true', help='Shorter rounds, for a smoke test')
+    parser.add_argument('--compare', metavar='FILE', help='Earlier results to compare against')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {_key(result): result for result in json.load(f)['results']}
+
+    min_time, repeat = (0.02, 3) if args.quick else (0.2, 5)
+    results = []
+    try:
+        for name, params, setup in BENCHMARKS:
+            if args.filter and args.filter not in name:
+                continue
+            with contextlib.contextmanager(setup)(**params) as func:
+                result = dict(name=name, params=params, **measure(func, min_time, repeat))
+            results.append(result)
+
+            line = f"{_describe(result):<50} {_format_time(result['median']):>10} per call"
+            previous = baseline.get(_key(result))
+            if previous:
+                line += f"  ({result['median'] / previous['median']:.2f}x vs baseline)"
+            print(line)
+    finally:
+        shutil.rmtree(_BENCH_HOME, ignore_errors=True)
+
+    if args.output:
+        report = {
+            'version': RESULTS_VERSION,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
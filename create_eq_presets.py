@@ -3,18 +3,22 @@
 create_eq_presets.py - Automatically create EQ presets for EasyEffects
 
 This script generates predefined EQ presets for different music genres
-and saves them to the EasyEffects preset directory.
+and saves them to the EasyEffects preset directory. Each genre is a curve of
+(frequency, gain) control points, compiled onto the equalizer's bands by
+services/preset_compiler.py; presets whose content hasn't changed are not
+rewritten.
 """
 
 import os
-import json
 import argparse
+from services.preset_compiler import compile_presets
 
 # Path where EasyEffects stores its presets
 EASYEFFECTS_PRESETS_PATH = os.path.expanduser("~/.config/easyeffects/output/")
 
 # Define EQ presets for different genres
-# Format: {genre_name: [(frequency, gain), ...]}
+# Format: {genre_name: [(frequency, gain), ...]} control points; bands between
+# them are interpolated over log-frequency, bands beyond them get the outer gain
 GENRE_PRESETS = {
     "hiphop": [
         (32, 3.0), (64, 4.0), (125, 3.0), (250, 1.0), (500, -1.0),
@@ -70,84 +74,10 @@ GENRE_PRESETS = {
     ],
 }
 
-def get_base_preset_template():
-    """Returns a base preset template for EasyEffects."""
-    # This is a simplified version of EasyEffects output preset template
-    return {
-        "output": {
-            "blocklist": [],
-            "equalizer": {
-                "input-gain": 0.0,
-                "output-gain": 0.0,
-                "mode": "IIR",
-                "num-bands": 10,
-                "split-channels": False,
-                "right": {
-                    "band0": {"frequency": 32, "gain": 0.0, "mode": "RLC (BT)", "q": 1.504, "slope": "x1", "solo": False, "type": "Bell"},
-                    "band1": {"frequency": 64, "gain": 0.0, "mode": "RLC (BT)", "q": 1.504, "slope": "x1", "solo": False, "type": "Bell"},
-                    "band2": {"frequency": 125, "gain": 0.0, "mode": "RLC (BT)", "q": 1.504, "slope": "x1", "solo": False, "type": "Bell"},
-                    "band3": {"frequency": 250, "gain": 0.0, "mode": "RLC (BT)", "q": 1.504, "slope": "x1", "solo": False, "type": "Bell"},
-                    "band4": {"frequency": 500, "gain": 0.0, "mode": "RLC (BT)", "q": 1.504, "slope": "x1", "solo": False, "type": "Bell"},
-                    "band5": {"frequency": 1000, "gain": 0.0, "mode": "RLC (BT)", "q": 1.504, "slope": "x1", "solo": False, "type": "Bell"},
-                    "band6": {"frequency": 2000, "gain": 0.0, "mode": "RLC (BT)", "q": 1.504, "slope": "x1", "solo": False, "type": "Bell"},
-                    "band7": {"frequency": 4000, "gain": 0.0, "mode": "RLC (BT)", "q": 1.504, "slope": "x1", "solo": False, "type": "Bell"},
-                    "band8": {"frequency": 8000, "gain": 0.0, "mode": "RLC (BT)", "q": 1.504, "slope": "x1", "solo": False, "type": "Bell"},
-                    "band9": {"frequency": 16000, "gain": 0.0, "mode": "RLC (BT)", "q": 1.504, "slope": "x1", "solo": False, "type": "Bell"},
-                },
-                "left": {
-                    "band0": {"frequency": 32, "gain": 0.0, "mode": "RLC (BT)", "q": 1.504, "slope": "x1", "solo": False, "type": "Bell"},
-                    "band1": {"frequency": 64, "gain": 0.0, "mode": "RLC (BT)", "q": 1.504, "slope": "x1", "solo": False, "type": "Bell"},
-                    "band2": {"frequency": 125, "gain": 0.0, "mode": "RLC (BT)", "q": 1.504, "slope": "x1", "solo": False, "type": "Bell"},
-                    "band3": {"frequency": 250, "gain": 0.0, "mode": "RLC (BT)", "q": 1.504, "slope": "x1", "solo": False, "type": "Bell"},
-                    "band4": {"frequency": 500, "gain": 0.0, "mode": "RLC (BT)", "q": 1.504, "slope": "x1", "solo": False, "type": "Bell"},
-                    "band5": {"frequency": 1000, "gain": 0.0, "mode": "RLC (BT)", "q": 1.504, "slope": "x1", "solo": False, "type": "Bell"},
-                    "band6": {"frequency": 2000, "gain": 0.0, "mode": "RLC (BT)", "q": 1.504, "slope": "x1", "solo": False, "type": "Bell"},
-                    "band7": {"frequency": 4000, "gain": 0.0, "mode": "RLC (BT)", "q": 1.504, "slope": "x1", "solo": False, "type": "Bell"},
-                    "band8": {"frequency": 8000, "gain": 0.0, "mode": "RLC (BT)", "q": 1.504, "slope": "x1", "solo": False, "type": "Bell"},
-                    "band9": {"frequency": 16000, "gain": 0.0, "mode": "RLC (BT)", "q": 1.504, "slope": "x1", "solo": False, "type": "Bell"},
-                }
-            },
-            "plugins_order": ["equalizer"],
-            "limiter": {
-                "alr": False,
-                "alr-attack": 5.0,
-                "alr-knee": 0.0,
-                "alr-release": 50.0,
-                "attack": 5.0,
-                "dithering": "None",
-                "external-sidechain": False,
-                "gain-boost": True,
-                "input-gain": 0.0,
-                "lookahead": 5.0,
-                "mode": "Herm Thin",
-                "output-gain": 0.0,
-                "oversampling": "None",
-                "release": 5.0,
-                "sidechain-preamp": 0.0,
-                "stereo-link": 100.0,
-                "threshold": 0.0
-            }
-        }
-    }
-
-def create_eq_preset(genre_name, eq_settings, output_dir):
-    """Create an EQ preset for a specific genre."""
-    preset = get_base_preset_template()
-    
-    # Apply EQ settings to both left and right channels
-    for i, (freq, gain) in enumerate(eq_settings):
-        band_key = f"band{i}"
-        preset["output"]["equalizer"]["left"][band_key]["gain"] = gain
-        preset["output"]["equalizer"]["right"][band_key]["gain"] = gain
-    
-    # Save the preset to a file
-    preset_path = os.path.join(output_dir, f"{genre_name}.json")
-    os.makedirs(output_dir, exist_ok=True)
-    
-    with open(preset_path, "w") as f:
-        json.dump(preset, f, indent=4)
-    
-    return preset_path
+def create_eq_preset(genre_name, eq_settings, output_dir, bands=10):
+    """Create an EQ preset for a specific genre; returns the preset's path."""
+    compile_presets({genre_name: eq_settings}, output_dir, bands=bands)
+    return os.path.join(output_dir, f"{genre_name}.json")
 
 def main():
     parser = argparse.ArgumentParser(description="Create EQ presets for EasyEffects")
@@ -156,6 +86,11 @@ def main():
     parser.add_argument("--all", action="store_true", help="Create presets for all genres")
     parser.add_argument("--output-dir", default=EASYEFFECTS_PRESETS_PATH, 
                         help=f"Output directory (default: {EASYEFFECTS_PRESETS_PATH})")
+    parser.add_argument("--bands", type=int, default=10,
+                        help="Equalizer bands per preset, e.g. 10, 16 or 32 (default: 10)")
+    parser.add_argument("--compensate", action="store_true",
+                        help="Lower each preset's output gain so its boosts can't clip (requires NumPy)")
+    parser.add_argument("--force", action="store_true", help="Rewrite presets even if they are unchanged")
     
     args = parser.parse_args()
     
@@ -168,18 +103,19 @@ def main():
     
     # Determine which genres to create presets for
     genres_to_create = list(GENRE_PRESETS.keys()) if args.all else args.genres
+    curves = {genre: GENRE_PRESETS[genre] for genre in genres_to_create if genre in GENRE_PRESETS}
     
-    created_presets = []
-    for genre in genres_to_create:
-        if genre in GENRE_PRESETS:
-            preset_path = create_eq_preset(genre, GENRE_PRESETS[genre], args.output_dir)
-            created_presets.append((genre, preset_path))
-            print(f"Created preset for '{genre}' at: {preset_path}")
+    result = compile_presets(curves, args.output_dir, bands=args.bands, compensate=args.compensate,
+                             force=args.force)
+    for preset_path in result['written']:
+        print(f"Created preset '{os.path.splitext(os.path.basename(preset_path))[0]}' at: {preset_path}")
     
-    if created_presets:
-        print(f"\nSuccessfully created {len(created_presets)} preset(s).")
+    if result['written']:
+        print(f"\nSuccessfully created {len(result['written'])} preset(s).")
         print("You can now use these presets in the Adaptive EQ application.")
-    else:
+    if result['unchanged']:
+        print(f"{len(result['unchanged'])} preset(s) already up to date.")
+    if not curves:
         print("No presets were created.")
 
 if __name__ == "__main__":
@@ -13,10 +13,10 @@ import os
 import sys
 import time
 import json
-import subprocess
 import signal
 import argparse
 from services.logger import setup_logger
+from services.commands import run_command, start_command
 from services.eq_control import apply_eq_preset, get_available_presets
 
 # Set up logger
@@ -25,11 +25,7 @@ logger = setup_logger("debug_easyeffects", log_level="debug")
 def check_easyeffects_running():
     """Check if EasyEffects is currently running"""
     try:
-        result = subprocess.run(
-            ["pgrep", "-f", "easyeffects"], 
-            capture_output=True, 
-            text=True
-        )
+        result = run_command(["pgrep", "-f", "easyeffects"])
         
         if result.returncode == 0:
             pid = result.stdout.strip()
@@ -46,22 +42,14 @@ def check_easyeffects_running():
 def check_gsettings_schema():
     """Check if the EasyEffects gsettings schema is available"""
     try:
-        result = subprocess.run(
-            ["gsettings", "list-recursively", "com.github.wwmm.easyeffects"], 
-            capture_output=True, 
-            text=True
-        )
+        result = run_command(["gsettings", "list-recursively", "com.github.wwmm.easyeffects"])
         
         if result.returncode == 0:
             logger.info("✅ EasyEffects gsettings schema is available")
             
             # Check for the last-used-output-preset key specifically
             if "last-used-output-preset" in result.stdout:
-                preset = subprocess.run(
-                    ["gsettings", "get", "com.github.wwmm.easyeffects", "last-used-output-preset"],
-                    capture_output=True,
-                    text=True
-                ).stdout.strip().strip("'")
+                preset = run_command(["gsettings", "get", "com.github.wwmm.easyeffects", "last-used-output-preset"]).stdout.strip().strip("'")
                 
                 logger.info(f"✅ Current preset according to gsettings: {preset}")
                 return True
@@ -79,12 +67,8 @@ def check_gsettings_schema():
 def check_dbus_interface():
     """Check if EasyEffects is accessible via DBus"""
     try:
-        result = subprocess.run(
-            ["dbus-send", "--session", "--print-reply", "--dest=com.github.wwmm.easyeffects", 
-             "/com/github/wwmm/easyeffects", "org.freedesktop.DBus.Introspectable.Introspect"], 
-            capture_output=True, 
-            text=True
-        )
+        result = run_command(["dbus-send", "--session", "--print-reply", "--dest=com.github.wwmm.easyeffects", 
+                              "/com/github/wwmm/easyeffects", "org.freedesktop.DBus.Introspectable.Introspect"])
         
         if result.returncode == 0:
             logger.info("✅ EasyEffects DBus interface is accessible")
@@ -154,18 +138,10 @@ def test_preset_application(preset_name=None, delay=5):
         
         # Method 1: Try gsettings
         logger.info("Method 1: Using gsettings...")
-        subprocess.run(
-            ["gsettings", "set", "com.github.wwmm.easyeffects", "last-used-output-preset", preset],
-            capture_output=True,
-            text=True
-        )
+        run_command(["gsettings", "set", "com.github.wwmm.easyeffects", "last-used-output-preset", preset])
         
         # Check if the preset was applied via gsettings
-        current = subprocess.run(
-            ["gsettings", "get", "com.github.wwmm.easyeffects", "last-used-output-preset"],
-            capture_output=True,
-            text=True
-        ).stdout.strip().strip("'")
+        current = run_command(["gsettings", "get", "com.github.wwmm.easyeffects", "last-used-output-preset"]).stdout.strip().strip("'")
         
         if current == preset:
             logger.info(f"✅ gsettings successfully set to '{preset}'")
@@ -196,7 +172,7 @@ def test_preset_application(preset_name=None, delay=5):
                     "com.github.wwmm.easyeffects.load_preset", 
                     f"string:{preset}"
                 ]
-                dbus_result = subprocess.run(dbus_cmd, capture_output=True, text=True)
+                dbus_result = run_command(dbus_cmd)
                 
                 if dbus_result.returncode == 0:
                     logger.info(f"✅ DBus command executed successfully")
@@ -250,12 +226,12 @@ def test_preset_application(preset_name=None, delay=5):
                         
                         # Send a refresh signal to EasyEffects
                         refresh_cmd = ["pkill", "-HUP", "easyeffects"]
-                        subprocess.run(refresh_cmd, capture_output=True, text=True)
+                        run_command(refresh_cmd)
                         logger.info("✅ Sent refresh signal to EasyEffects")
                         
                         # Also try to trigger a reload via dconf
                         reload_cmd = ["dconf", "write", "/com/github/wwmm/easyeffects/reload-presets", "true"]
-                        subprocess.run(reload_cmd, capture_output=True, text=True)
+                        run_command(reload_cmd)
                         logger.info("✅ Sent reload-presets signal via dconf")
                     else:
                         logger.error(f"❌ Preset file not found for {preset}")
@@ -344,7 +320,7 @@ def main():
     ee_running = check_easyeffects_running()
     if not ee_running:
         logger.info("Starting EasyEffects...")
-        subprocess.Popen(["easyeffects"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        start_command(["easyeffects"])
         time.sleep(3)  # Wait for it to start
         ee_running = check_easyeffects_running()
     
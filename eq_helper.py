@@ -6,6 +6,7 @@ This script provides additional functionality for the Adaptive EQ application:
 1. Testing EQ profile configurations
 2. Listing and managing EQ presets
 3. Visualizing artist to EQ preset mappings
+4. Following and controlling the running Adaptive EQ daemon
 """
 
 import os
@@ -15,7 +16,7 @@ import argparse
 import subprocess
 import time
 from services.eq_control import get_available_presets, apply_eq_preset
-from services.spotify import get_spotify_client, get_current_track
+from services.ipc import IPCClient, IPCError, daemon_running, start_daemon
 
 def load_eq_profiles(config_path="config/eq_profiles.json"):
     """Load existing EQ profiles from config file."""
@@ -62,7 +63,15 @@ def test_eq_profile(artist, config_path="config/eq_profiles.json"):
         return False
     
     print(f"Applying EQ preset '{preset}' for artist '{artist}'...")
-    result = apply_eq_preset(preset)
+    if daemon_running():
+        # Go through the daemon so its idea of the active preset stays correct
+        try:
+            result = IPCClient().request('set_preset', timeout=60, preset=preset)
+        except IPCError as e:
+            print(f"Error: {e}")
+            result = False
+    else:
+        result = apply_eq_preset(preset)
     
     if result:
         print("EQ preset applied successfully!")
@@ -93,41 +102,93 @@ def list_artists_by_preset(config_path="config/eq_profiles.json"):
         for i, artist in enumerate(sorted(artists), 1):
             print(f"  {i}. {artist}")
 
-def monitor_current_track(duration=60, interval=5, config_path="config/eq_profiles.json"):
-    """Monitor the current track and apply EQ preset accordingly."""
-    print(f"Monitoring current track for {duration} seconds...")
+def monitor_current_track(duration=60, config_path="config/eq_profiles.json"):
+    """
+    Follow the daemon's track and preset changes. If no daemon is running, one
+    is started with config_path for the time of the monitoring and stopped after.
+    """
+    started = not daemon_running()
+    if started:
+        if not start_daemon(profile_path=config_path):
+            print("Error: Could not start the Adaptive EQ daemon.")
+            return
+    elif config_path != "config/eq_profiles.json":
+        print("Note: a daemon is already running; it keeps using its own profile file.")
     
-    profiles = load_eq_profiles(config_path)
-    sp = get_spotify_client()
-    
-    if not sp:
-        print("Error: Could not initialize Spotify client.")
-        return
+    print(f"Monitoring current track for {duration} seconds...")
+    deadline = time.monotonic() + duration
+    try:
+        for event in IPCClient().events(idle_timeout=1):
+            if time.monotonic() >= deadline:
+                break
+            if event is None:
+                continue
+            
+            kind = event.get('event')
+            if kind in ('status', 'track'):
+                track = event.get('track')
+                if track is None:
+                    print("No track playing...")
+                else:
+                    print(f"\nDetected new artist: {track.get('artist')}")
+                    print(f"Track: {track.get('track')}")
+            elif kind == 'preset':
+                print(f"Applied EQ preset: {event.get('preset')}")
+            elif kind == 'apply_failed':
+                print(f"Failed to apply EQ preset: {event.get('preset')}")
+            elif kind == 'mode':
+                print(f"Adaptive mode {'enabled' if event.get('adaptive') else 'disabled'}")
+            elif kind == 'error':
+                print(f"Error: {event.get('message')}")
+    except IPCError as e:
+        print(f"Error: {e}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if started:
+            # Like the tray, only stop a daemon this command started
+            try:
+                IPCClient().request('shutdown', timeout=2)
+            except IPCError as e:
+                print(f"Error stopping the daemon: {e}")
+
+def show_daemon_status():
+    """Print the running daemon's state and statistics."""
+    try:
+        status = IPCClient().request('status')
+    except IPCError as e:
+        print(f"Error: {e}")
+        return False
     
-    start_time = time.time()
-    last_artist = None
+    track = status.get('track')
+    print(f"Daemon PID: {status.get('pid')}")
+    print(f"Adaptive mode: {'on' if status.get('adaptive') else 'off'}")
+    print(f"Now playing: {track['artist'] + ' - ' + track['track'] if track else 'nothing'}")
+    print(f"Current EQ: {status.get('preset') or 'None'}")
+    print("\nStatistics:")
+    for key, value in sorted(status.get('stats', {}).items()):
+        print(f"  {key}: {round(value, 3) if isinstance(value, float) else value}")
+    if 'idle_wakeups_per_hour' in status:
+        print(f"  wakeups per idle hour: {status['idle_wakeups_per_hour']}")
     
-    while time.time() - start_time < duration:
-        track = get_current_track()
-        
-        if track is None:
-            print("No track playing...")
-        else:
-            artist = track.get("artist")
-            if artist != last_artist:
-                print(f"\nDetected new artist: {artist}")
-                print(f"Track: {track.get('track')}")
-                
-                if artist in profiles:
-                    preset = profiles[artist]
-                    print(f"Applying EQ preset: {preset}")
-                    apply_eq_preset(preset)
-                else:
-                    print(f"No EQ preset configured for {artist}")
-                
-                last_artist = artist
-        
-        time.sleep(interval)
+    commands = status.get('commands')
+    if commands:
+        print("\nExternal commands:")
+        for name, stats in sorted(commands.items()):
+            mean = stats['time_total'] / stats['calls'] if stats['calls'] else 0
+            print(f"  {name}: {stats['calls']} calls, {stats['failures']} failed, {stats['timeouts']} timed out, "
+                  f"{stats.get('cancelled', 0)} cancelled, {stats['errors']} not run, mean {mean * 1000:.0f} ms, max {stats['time_max'] * 1000:.0f} ms")
+    return True
+
+def set_adaptive_mode(enabled):
+    """Turn the daemon's adaptive mode on or off."""
+    try:
+        IPCClient().request('set_mode', adaptive=enabled)
+    except IPCError as e:
+        print(f"Error: {e}")
+        return False
+    print(f"Adaptive mode {'enabled' if enabled else 'disabled'}")
+    return True
 
 def remove_artist(artist, config_path="config/eq_profiles.json"):
     """Remove an artist from the EQ profiles."""
@@ -157,10 +218,19 @@ def main():
     list_parser.add_argument('--config', default='config/eq_profiles.json', help='Path to eq_profiles.json config file')
     
     # Monitor current track
-    monitor_parser = subparsers.add_parser('monitor', help='Monitor current track and apply EQ preset')
+    monitor_parser = subparsers.add_parser('monitor', help='Follow track and EQ preset changes of the daemon '
+                                                         '(a daemon started for this is stopped afterwards)')
     monitor_parser.add_argument('--duration', type=int, default=60, help='Duration to monitor in seconds')
-    monitor_parser.add_argument('--interval', type=int, default=5, help='Polling interval in seconds')
-    monitor_parser.add_argument('--config', default='config/eq_profiles.json', help='Path to eq_profiles.json config file')
+    monitor_parser.add_argument('--config', default='config/eq_profiles.json',
+                                help='Path to eq_profiles.json config file (for a daemon started by monitor)')
+    monitor_parser.add_argument('--interval', type=int, help='Deprecated and ignored; the daemon sets the poll interval')
+    
+    # Daemon status
+    subparsers.add_parser('status', help='Show the state of the running Adaptive EQ daemon')
+    
+    # Adaptive mode toggle
+    mode_parser = subparsers.add_parser('mode', help='Turn adaptive mode of the daemon on or off')
+    mode_parser.add_argument('state', choices=['on', 'off'], help='New adaptive mode')
     
     # Remove artist
     remove_parser = subparsers.add_parser('remove', help='Remove an artist from the EQ profiles')
@@ -174,7 +244,13 @@ def main():
     elif args.command == 'list':
         list_artists_by_preset(args.config)
     elif args.command == 'monitor':
-        monitor_current_track(args.duration, args.interval, args.config)
+        if args.interval is not None:
+            print("Note: --interval is deprecated and ignored; use the daemon's --poll-interval instead.")
+        monitor_current_track(args.duration, args.config)
+    elif args.command == 'status':
+        show_daemon_status()
+    elif args.command == 'mode':
+        set_adaptive_mode(args.state == 'on')
     elif args.command == 'remove':
         remove_artist(args.artist, args.config)
     else:
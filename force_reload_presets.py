@@ -10,7 +10,7 @@ import os
 import sys
 import json
 import time
-import subprocess
+from services.commands import run_command, start_command
 from services.logger import get_logger, log_exceptions
 
 # Set up logger
@@ -30,7 +30,7 @@ def force_reload_easyeffects(preset_name):
         cmd = ["gsettings", "set", "com.github.wwmm.easyeffects", 
                "last-used-output-preset", preset_name]
         
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = run_command(cmd)
         if result.returncode == 0:
             logger.debug("gsettings command successful")
         else:
@@ -41,8 +41,7 @@ def force_reload_easyeffects(preset_name):
     # Method 2: Reset and restart EasyEffects
     try:
         # First check if EasyEffects is running
-        ee_running = subprocess.run(["pgrep", "-f", "easyeffects"], 
-                                    capture_output=True, text=True).returncode == 0
+        ee_running = run_command(["pgrep", "-f", "easyeffects"]).returncode == 0
         
         if ee_running:
             logger.debug("EasyEffects is running, will restart it")
@@ -75,25 +74,20 @@ def force_reload_easyeffects(preset_name):
             logger.debug(f"Updated config.json with preset: {preset_name}")
             
             # Stop EasyEffects
-            subprocess.run(["killall", "easyeffects"], 
-                          capture_output=True, text=True)
+            run_command(["killall", "easyeffects"])
             
             # Wait a moment
             time.sleep(1)
             
             # Start EasyEffects in the background
-            subprocess.Popen(["easyeffects", "--gapplication-service"], 
-                            stdout=subprocess.DEVNULL, 
-                            stderr=subprocess.DEVNULL)
+            start_command(["easyeffects", "--gapplication-service"])
             
             logger.info("Restarted EasyEffects service")
         else:
             logger.debug("EasyEffects is not running, starting it")
             
             # Start EasyEffects in the background with the preset
-            subprocess.Popen(["easyeffects", "--gapplication-service"], 
-                            stdout=subprocess.DEVNULL, 
-                            stderr=subprocess.DEVNULL)
+            start_command(["easyeffects", "--gapplication-service"])
             
             logger.info("Started EasyEffects service")
             
@@ -103,7 +97,7 @@ def force_reload_easyeffects(preset_name):
             # Apply the preset
             cmd = ["gsettings", "set", "com.github.wwmm.easyeffects", 
                   "last-used-output-preset", preset_name]
-            subprocess.run(cmd, capture_output=True, text=True)
+            run_command(cmd)
     except Exception as e:
         logger.error(f"Error restarting EasyEffects: {e}")
     
@@ -135,12 +129,10 @@ def force_reload_easyeffects(preset_name):
             logger.debug(f"Copied preset from {src_preset_path} to current_preset.json")
             
             # Send a refresh signal
-            subprocess.run(["pkill", "-HUP", "easyeffects"], 
-                          capture_output=True, text=True)
+            run_command(["pkill", "-HUP", "easyeffects"])
             
             # Trigger a reload via dconf
-            subprocess.run(["dconf", "write", "/com/github/wwmm/easyeffects/reload-presets", "true"],
-                          capture_output=True, text=True)
+            run_command(["dconf", "write", "/com/github/wwmm/easyeffects/reload-presets", "true"])
             
             logger.debug("Sent signals to reload presets")
         else:
@@ -1,71 +1,95 @@
 #!/usr/bin/env python3
 
-import time
-import os
-import json
+import sys
+import asyncio
 import argparse
-from services.spotify import get_current_track
-from services.eq_control import apply_eq_preset, force_ui_refresh
+from services.daemon import AdaptiveDaemon
+from services.ipc import IPCError, default_socket_path
+from services.profiler import install_profiler
+from services.profiles import DEFAULT_PROFILE_PATH
 from services.logger import setup_logger
 
 # Set up logger
 logger = setup_logger("adaptive_eq", log_level="info")
 
-# Load EQ profile mapping (artist → preset)
-def load_profile_map(path="config/eq_profiles.json"):
-    if not os.path.exists(path):
-        logger.warning(f"Profile map not found at {path}")
-        return {}
-    with open(path, "r") as f:
-        return json.load(f)
-
 def main():
     # Parse command line arguments
     parser = argparse.ArgumentParser(description="Adaptive EQ - Automatically adjust EQ based on Spotify tracks")
     parser.add_argument("--force-refresh", action="store_true", help="Force UI refresh when applying presets")
     parser.add_argument("--refresh-interval", type=int, default=30, 
                         help="Interval in seconds to force EasyEffects UI refresh (default: 30)")
+    parser.add_argument("--config", default=DEFAULT_PROFILE_PATH,
+                        help=f"Path to the artist → preset profile map (default: {DEFAULT_PROFILE_PATH})")
+    parser.add_argument("--poll-interval", type=int, default=5,
+                        help="Interval in seconds between Spotify polls while playing (default: 5)")
+    parser.add_argument("--idle-interval", type=int, default=10,
+                        help="Interval in seconds between Spotify polls once playback stops (default: 10)")
+    parser.add_argument("--idle-max-interval", type=int, default=300,
+                        help="Ceiling the idle interval backs off to, doubling per idle poll (default: 300)")
+    parser.add_argument("--no-dbus-wake", action="store_true",
+                        help="Don't poll immediately on MPRIS playback and session unlock signals")
+    parser.add_argument("--queue-lookahead", type=int, default=3,
+                        help="Number of queued tracks to resolve presets for ahead of time (0 disables, default: 3)")
+    parser.add_argument("--prefetch-interval", type=int, default=15,
+                        help="Interval in seconds between Spotify queue reads (default: 15)")
+    parser.add_argument("--no-context", action="store_true",
+                        help="Don't pre-resolve presets for the playlist/album being played")
+    parser.add_argument("--no-genre-fallback", action="store_true",
+                        help="Don't look up genres for artists without a mapping")
+    parser.add_argument("--save-genre-presets", action="store_true",
+                        help="Save genre-based presets for unmapped artists to the profile map")
+    parser.add_argument("--no-blend", action="store_true",
+                        help="Don't blend presets for collaborations and genre mixes (only used with NumPy)")
+    parser.add_argument("--similar-threshold", type=float, default=0.5,
+                        help="Don't switch to a preset within this many dB (RMS) of the active one's sound; "
+                             "0 compares names only (only used with NumPy, default: 0.5)")
+    parser.add_argument("--api-timeout", type=int, default=10,
+                        help="Seconds before a Spotify API request is abandoned (default: 10)")
+    parser.add_argument("--metrics-interval", type=int, default=300,
+                        help="Interval in seconds between statistics log lines (default: 300)")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Serve Prometheus metrics on this localhost port (default: off)")
+    parser.add_argument("--metrics-socket",
+                        help="Serve Prometheus metrics on this Unix socket (default: off)")
+    parser.add_argument("--socket", default=default_socket_path(),
+                        help="Unix socket the tray and helper CLIs connect to (default: %(default)s)")
+    parser.add_argument("--record-trace", metavar="PATH",
+                        help="Record playback states to a trace file for benchmarks/replay.py (.gz to compress)")
     args = parser.parse_args()
     
     logger.info("Starting Adaptive EQ Daemon...")
-    profile_map = load_profile_map()
-    logger.info(f"Loaded {len(profile_map)} artist → preset mappings")
+    # ADAPTIVE_EQ_PROFILE=1 profiles from the start; SIGUSR2 toggles profiling
+    install_profiler()
+    daemon = AdaptiveDaemon(
+        profile_path=args.config,
+        force_refresh=args.force_refresh,
+        refresh_interval=args.refresh_interval,
+        poll_interval=args.poll_interval,
+        idle_interval=args.idle_interval,
+        idle_max_interval=args.idle_max_interval,
+        wake_on_dbus=not args.no_dbus_wake,
+        queue_lookahead=args.queue_lookahead,
+        prefetch_interval=args.prefetch_interval,
+        use_context=not args.no_context,
+        use_genre_fallback=not args.no_genre_fallback,
+        save_genre_presets=args.save_genre_presets,
+        blend_presets=not args.no_blend,
+        similar_threshold=args.similar_threshold,
+        api_timeout=args.api_timeout,
+        metrics_interval=args.metrics_interval,
+        socket_path=args.socket,
+        metrics_port=args.metrics_port,
+        metrics_socket=args.metrics_socket,
+        trace_path=args.record_trace
+    )
     
-    last_artist = None
-    last_refresh = time.time()
-
-    while True:
-        track = get_current_track()
-
-        if track is None:
-            logger.debug("No track playing...")
-            time.sleep(10)
-            continue
-
-        artist = track.get("artist")
-        current_time = time.time()
-        
-        # Periodically force a UI refresh
-        if args.force_refresh and (current_time - last_refresh > args.refresh_interval):
-            logger.debug("Performing periodic UI refresh")
-            force_ui_refresh()
-            last_refresh = current_time
-        
-        if artist != last_artist:
-            logger.info(f"Detected new artist: {artist}")
-            preset = profile_map.get(artist, "default")
-            logger.info(f"Applying EQ preset: {preset}")
-            
-            success = apply_eq_preset(preset, force_ui_refresh=args.force_refresh)
-            
-            if success:
-                logger.info(f"Successfully applied EQ preset: {preset} for artist: {artist}")
-            else:
-                logger.error(f"Failed to apply EQ preset: {preset} for artist: {artist}")
-            last_artist = artist
-            last_refresh = current_time
-
-        time.sleep(5)
+    try:
+        asyncio.run(daemon.run())
+    except IPCError as e:
+        logger.error(str(e))
+        sys.exit(1)
+    except KeyboardInterrupt:
+        logger.info("Adaptive EQ Daemon stopped")
 
 if __name__ == "__main__":
     main()
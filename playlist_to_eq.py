@@ -10,8 +10,8 @@ import os
 import sys
 import json
 import argparse
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
+from services.genres import recommend_preset
+from services.spotify import DEFAULT_SPOTIFY_API_URL, SPOTIFY_API_URL, create_spotify_client
 
 def load_credentials():
     """Load Spotify credentials from the credentials file."""
@@ -39,22 +39,23 @@ def load_credentials():
     
     return creds
 
-def get_spotify_client():
+def get_spotify_client(api_url=SPOTIFY_API_URL):
     """Initialize and return an authenticated Spotify client."""
-    creds = load_credentials()
+    # A local mock server doesn't check credentials
+    if api_url.rstrip('/') + '/' == DEFAULT_SPOTIFY_API_URL:
+        creds = load_credentials()
+    else:
+        creds = {'client_id': None, 'client_secret': None, 'redirect_uri': None}
     
     try:
         # Set up authentication scope
         scope = "playlist-read-private user-library-read"
         
         # Create Spotify client
-        sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
-            client_id=creds['client_id'],
-            client_secret=creds['client_secret'],
-            redirect_uri=creds['redirect_uri'],
-            scope=scope,
-            cache_path=os.path.expanduser('~/.adaptive-eq-spotify-cache')
-        ))
+        sp = create_spotify_client(
+            creds['client_id'], creds['client_secret'], creds['redirect_uri'], scope,
+            os.path.expanduser('~/.adaptive-eq-spotify-cache'), api_url=api_url
+        )
         return sp
     except Exception as e:
         print(f"Error authenticating with Spotify: {e}")
@@ -121,57 +122,6 @@ def get_unique_artists(sp, playlist_id):
         print(f"Error getting playlist data: {e}")
         sys.exit(1)
 
-def recommend_preset(genres):
-    """Recommend an EQ preset based on artist genres."""
-    # Define genre to preset mapping
-    genre_preset_map = {
-        'rock': 'rock',
-        'alternative': 'alternative',
-        'metal': 'rock',
-        'hard rock': 'rock',
-        'hip hop': 'hiphop',
-        'rap': 'hiphop',
-        'trap': 'hiphop',
-        'pop': 'pop',
-        'dance': 'electronic',
-        'electronic': 'electronic',
-        'edm': 'electronic',
-        'house': 'electronic',
-        'techno': 'electronic',
-        'ambient': 'electronic',
-        'classical': 'classical',
-        'orchestra': 'orchestral',
-        'orchestral': 'orchestral',
-        'soundtrack': 'orchestral',
-        'folk': 'acoustic',
-        'acoustic': 'acoustic',
-        'jazz': 'jazz',
-        'blues': 'blues',
-        'soul': 'vocal',
-        'r&b': 'vocal',
-        'vocal': 'vocal',
-        'reggae': 'reggae'
-    }
-    
-    if not genres:
-        return None
-    
-    # Count genre matches
-    preset_counts = {}
-    for genre in genres:
-        genre_lower = genre.lower()
-        
-        # Check for partial matches
-        for key, preset in genre_preset_map.items():
-            if key in genre_lower:
-                preset_counts[preset] = preset_counts.get(preset, 0) + 1
-    
-    # Return the most matched preset or None if no matches
-    if preset_counts:
-        return max(preset_counts.items(), key=lambda x: x[1])[0]
-    
-    return None
-
 def get_artist_genres(sp, artist_ids):
     """Get genre information for artists."""
     genre_map = {}
@@ -401,6 +351,8 @@ def main():
                         help='Path to eq_profiles.json config file')
     parser.add_argument('--auto', '-a', action='store_true', help='Automatically map artists based on genre')
     parser.add_argument('--list-artists', '-l', action='store_true', help='List all artists in eq_profiles.json')
+    parser.add_argument('--api-url', default=SPOTIFY_API_URL,
+                        help='Spotify Web API base URL, e.g. a local mock server (default: $SPOTIFY_API_URL or the real API)')
     
     args = parser.parse_args()
     
@@ -424,7 +376,7 @@ def main():
     print(f"Default preset: {args.default}")
     
     # Get Spotify client
-    sp = get_spotify_client()
+    sp = get_spotify_client(args.api_url)
     
     # Get available presets
     available_presets = get_available_presets()
@@ -0,0 +1,277 @@
+"""
+Preset blending for Adaptive EQ
+
+A collaboration between a jazz and a hip-hop artist, or an artist whose
+genres match several presets, gets a mix of the matching presets instead of
+whichever one wins. The weighted presets are combined band by band:
+
+- gains are averaged in dB, so +4 dB and 0 dB at equal weights give +2 dB
+- Q factors are averaged in the log domain (a weighted geometric mean), so a
+  narrow and a wide band meet in between instead of at the wider one
+- presets with a different band layout are resampled onto the heaviest
+  preset's bands (see CompactPreset.resample)
+
+The result is written to the user presets directory as "blend-<hash>", the
+hash being that of the preset's content, so the same mix is only ever
+written once and EasyEffects can load it like any other preset. The least
+recently used blends beyond MAX_CACHED_BLENDS are deleted, never the ones in
+use (see PresetBlender's in_use).
+
+Blending reads and writes preset files. Callers on an event loop use
+submit(), which only looks the mix up in memory and hands unknown mixes to an
+enqueue callable (the daemon builds them on a worker with process()).
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from services.preset_model import CompactPreset, np
+from services.eq_control import load_preset, EASYEFFECTS_PRESETS_PATH
+from services.logger import get_logger
+
+# Set up logger
+logger = get_logger(__name__)
+
+BLEND_PREFIX = "blend-"
+
+# Blended presets kept in the presets directory
+MAX_CACHED_BLENDS = 50
+# Presets mixed into one blend, heaviest first
+MAX_BLEND_PRESETS = 3
+# Presets weighing less than this share of the blend are left out
+MIN_BLEND_SHARE = 0.15
+
+def is_blend(preset):
+    """Whether a preset name is one of the generated blends"""
+    return bool(preset) and preset.startswith(BLEND_PREFIX)
+
+def blend_models(models, weights):
+    """
+    Combine compact presets with the given weights.
+
+    Args:
+        models (list): CompactPreset objects; the first one's bands are used
+        weights: Weight per model (normalized here)
+
+    Returns:
+        CompactPreset: The blended curve
+    """
+    weights = np.asarray(weights, dtype=float)
+    weights = weights / weights.sum()
+    freqs = models[0].freqs
+    gains, qs = zip(*(model.resample(freqs) for model in models))
+    return CompactPreset(
+        freqs,
+        weights @ np.vstack(gains),
+        np.exp(weights @ np.log(np.vstack(qs))),
+        output_gain=weights @ np.array([model.output_gain for model in models]),
+        input_gain=weights @ np.array([model.input_gain for model in models]),
+    )
+
+class PresetBlender:
+    """Writes (or reuses) synthetic presets blended from weighted presets. Thread-safe."""
+
+    def __init__(self, presets_dir=EASYEFFECTS_PRESETS_PATH, max_cached=MAX_CACHED_BLENDS,
+                 max_presets=MAX_BLEND_PRESETS, min_share=MIN_BLEND_SHARE, on_resolved=None, enqueue=None,
+                 in_use=None):
+        """
+        Args:
+            presets_dir (str): Directory blends are written to (must be one EasyEffects loads from)
+            max_cached (int): Blends kept on disk; the least recently used are deleted
+            max_presets (int): Presets mixed into one blend at most
+            min_share (float): Presets below this share of the total weight are dropped
+            on_resolved: Callable(preset) invoked from the worker when a submitted blend is ready
+            enqueue: Callable(weights) that arranges for process(weights) to run on a worker;
+                     without it, submit() blends inline
+            in_use: Callable returning the presets that must not be pruned (e.g. the
+                    requested and the active one)
+
+        Raises:
+            RuntimeError: If NumPy isn't installed
+        """
+        if np is None:
+            raise RuntimeError("NumPy is required for preset blending")
+        self.presets_dir = presets_dir
+        self.max_cached = max_cached
+        self.max_presets = max_presets
+        self.min_share = min_share
+        self.on_resolved = on_resolved
+        self.enqueue = enqueue
+        self.in_use = in_use
+        self._lock = threading.Lock()  # Held while blending and writing
+        # Mix → blend name, and mixes queued by submit(); under their own lock so lookups never wait on a write
+        self._blends = {}
+        self._pending = set()
+        # Blend → when it was last handed out; lookups are served from memory, so file mtimes lag behind
+        self._used = {}
+        self._blends_lock = threading.Lock()
+        self.stats = {'blends': 0, 'written': 0, 'reused': 0, 'pruned': 0}
+
+    def _select(self, weights):
+        """The heaviest presets worth mixing, as (preset, weight) pairs"""
+        chosen = sorted(((preset, weight) for preset, weight in weights.items() if preset and weight > 0),
+                        key=lambda item: (-item[1], item[0]))[:self.max_presets]
+        total = sum(weight for _, weight in chosen)
+        return [(preset, weight) for preset, weight in chosen if weight >= total * self.min_share]
+
+    def _mix(self, chosen):
+        """Hashable key of a selection: presets and their shares"""
+        total = sum(weight for _, weight in chosen)
+        return tuple((preset, round(weight / total, 3)) for preset, weight in chosen)
+
+    def lookup(self, weights):
+        """
+        The preset for weighted presets if it is known without touching the disk:
+        a blend made earlier, or the single preset left after selection.
+
+        Returns:
+            str: The preset, or None if the blend hasn't been made yet
+        """
+        chosen = self._select(weights)
+        if len(chosen) < 2:
+            return chosen[0][0] if chosen else None
+        with self._blends_lock:
+            name = self._blends.get(self._mix(chosen))
+            if name:
+                self._used[name] = time.time()
+            return name
+
+    def submit(self, weights):
+        """
+        Blend weighted presets without blocking when an enqueue callable is set:
+        known blends are returned from memory, new ones are queued.
+
+        Returns:
+            str: The preset if it is already known, else None (or, without enqueue,
+                 the result of blend())
+        """
+        preset = self.lookup(weights)
+        if preset:
+            return preset
+        if self.enqueue is None:
+            return self.blend(weights)
+
+        mix = self._mix(self._select(weights))
+        with self._blends_lock:
+            if mix in self._pending:
+                return None
+            self._pending.add(mix)
+        self.enqueue(weights)
+        return None
+
+    def process(self, weights):
+        """
+        Blend a submitted mix and notify on_resolved. Reads and writes preset
+        files, so it must run off the event loop.
+
+        Returns:
+            str: As blend()
+        """
+        try:
+            preset = self.blend(weights)
+        finally:
+            with self._blends_lock:
+                self._pending.discard(self._mix(self._select(weights)))
+        if preset and self.on_resolved:
+            try:
+                self.on_resolved(preset)
+            except Exception as e:
+                logger.error(f"Error in blend callback: {e}")
+        return preset
+
+    def blend(self, weights):
+        """
+        Blend weighted presets into one.
+
+        Args:
+            weights (dict): Preset → weight (any positive scale)
+
+        Returns:
+            str: The blended preset's name, the single preset when only one is
+                 left after selection, or None if none of the presets can be loaded
+        """
+        chosen = self._select(weights)
+        sources = []
+        for preset, weight in chosen:
+            model = CompactPreset.load(preset)
+            if model is not None:
+                sources.append((preset, weight, model))
+        if len(sources) < 2:
+            return sources[0][0] if sources else None
+
+        blended = blend_models([model for _, _, model in sources], [weight for _, weight, _ in sources])
+        data = blended.to_data(load_preset(sources[0][0]))
+        content = json.dumps(data, indent=4, sort_keys=True)
+        name = BLEND_PREFIX + hashlib.sha1(content.encode()).hexdigest()[:12]
+
+        with self._lock:
+            self.stats['blends'] += 1
+            try:
+                written = self._store(name, content)
+            except OSError as e:
+                logger.error(f"Could not write blended preset {name}: {e}")
+                return sources[0][0]
+            with self._blends_lock:
+                self._blends[self._mix(chosen)] = name
+                self._used[name] = time.time()
+        total = sum(weight for _, weight, _ in sources)
+        mix = ", ".join(f"{preset} {weight / total:.0%}" for preset, weight, _ in sources)
+        if written:
+            logger.info(f"Wrote blended preset {name}: {mix}")
+        else:
+            logger.debug(f"Reusing blended preset {name}: {mix}")
+        return name
+
+    def _store(self, name, content):
+        """Write a blend unless it exists already. Returns True if it was written."""
+        path = os.path.join(self.presets_dir, f"{name}.json")
+        if os.path.exists(path):
+            os.utime(path)  # Most recently used; pruned last
+            self.stats['reused'] += 1
+            return False
+
+        os.makedirs(self.presets_dir, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        self.stats['written'] += 1
+        self._prune()
+        return True
+
+    def _prune(self):
+        pruned = set()
+        try:
+            blends = [entry for entry in os.scandir(self.presets_dir)
+                      if entry.name.startswith(BLEND_PREFIX) and entry.name.endswith('.json')]
+            if len(blends) <= self.max_cached:
+                return
+            keep = set()
+            if self.in_use:
+                try:
+                    keep = set(self.in_use())
+                except Exception as e:
+                    logger.error(f"Error getting the presets in use: {e}")
+                    return  # Better to keep too many blends than to delete one that is playing
+            with self._blends_lock:
+                used = dict(self._used)
+
+            def last_used(entry):
+                return max(entry.stat().st_mtime, used.get(entry.name[:-len('.json')], 0))
+
+            candidates = sorted((entry for entry in blends if entry.name[:-len('.json')] not in keep), key=last_used)
+            for entry in candidates[:len(blends) - self.max_cached]:
+                os.remove(entry.path)
+                pruned.add(entry.name[:-len('.json')])
+                self.stats['pruned'] += 1
+        except OSError as e:
+            logger.warning(f"Could not prune blended presets in {self.presets_dir}: {e}")
+        finally:
+            if pruned:
+                # Deleted blends have to be made again
+                with self._blends_lock:
+                    self._blends = {mix: name for mix, name in self._blends.items() if name not in pruned}
+                    for name in pruned:
+                        self._used.pop(name, None)
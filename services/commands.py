@@ -0,0 +1,209 @@
+"""
+Shared runner for external commands
+
+Every call to gsettings, dconf, dbus-send, pgrep, pkill, killall etc. goes
+through here, so each gets a timeout (a hung gsettings can't stall the
+caller forever) and is accounted for: call counts, exit codes, timeouts and
+wall time per command, available from get_command_stats() and the metrics
+endpoint.
+
+Commands never raise for "not installed" or "timed out"; the returned
+CompletedProcess has returncode None instead, so callers can keep checking
+`result.returncode == 0`.
+"""
+
+import time
+import asyncio
+import threading
+import subprocess
+from collections import Counter
+from services.metrics import COMMANDS, COMMAND_SECONDS
+from services.logger import get_logger
+
+# Set up logger
+logger = get_logger(__name__)
+
+# Seconds before a command is killed, by executable
+COMMAND_TIMEOUTS = {
+    'gsettings': 5,
+    'dconf': 5,
+    'dbus-send': 5,
+    'pgrep': 2,
+    'pkill': 2,
+    'killall': 5,
+}
+DEFAULT_TIMEOUT = 10
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+def _timeout_for(cmd, timeout):
+    if timeout is not None:
+        return timeout
+    return COMMAND_TIMEOUTS.get(cmd[0], DEFAULT_TIMEOUT)
+
+def _record(cmd, returncode, elapsed, outcome):
+    name = cmd[0]
+    with _stats_lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = {
+                'calls': 0, 'failures': 0, 'timeouts': 0, 'errors': 0, 'cancelled': 0,
+                'time_total': 0.0, 'time_max': 0.0, 'exit_codes': Counter(),
+            }
+        stats['calls'] += 1
+        stats['time_total'] += elapsed
+        stats['time_max'] = max(stats['time_max'], elapsed)
+        if outcome == 'timeout':
+            stats['timeouts'] += 1
+        elif outcome == 'error':
+            stats['errors'] += 1
+        elif outcome == 'cancelled':
+            stats['cancelled'] += 1
+        else:
+            stats['exit_codes'][returncode] += 1
+            if returncode != 0:
+                stats['failures'] += 1
+                outcome = 'failed'
+
+    COMMANDS.inc(command=name, result=outcome)
+    COMMAND_SECONDS.observe(elapsed, command=name)
+
+def get_command_stats():
+    """
+    Snapshot of the per-command statistics.
+
+    Returns:
+        dict: Executable name → calls, failures, timeouts, errors, time_total,
+              time_max and exit_codes (exit code → count)
+    """
+    with _stats_lock:
+        return {
+            name: dict(stats, exit_codes={str(code): count for code, count in stats['exit_codes'].items()})
+            for name, stats in _stats.items()
+        }
+
+def run_command(cmd, timeout=None):
+    """
+    Run a command, capturing its output as text.
+
+    Args:
+        cmd (list): Command and arguments
+        timeout (float): Seconds before the command is killed, defaults to COMMAND_TIMEOUTS
+
+    Returns:
+        subprocess.CompletedProcess: returncode is None if the command couldn't run or timed out
+    """
+    timeout = _timeout_for(cmd, timeout)
+    start = time.monotonic()
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _record(cmd, None, time.monotonic() - start, 'timeout')
+        logger.warning(f"Command timed out after {timeout}s: {' '.join(cmd)}")
+        return subprocess.CompletedProcess(cmd, None, '', 'timed out')
+    except OSError as e:
+        _record(cmd, None, time.monotonic() - start, 'error')
+        return subprocess.CompletedProcess(cmd, None, '', str(e))
+
+    _record(cmd, result.returncode, time.monotonic() - start, 'ok')
+    return result
+
+async def _kill(proc):
+    """
+    Kill a child process and reap it, even if the calling task is cancelled
+    meanwhile; the cancellation is re-raised once the child is reaped.
+    """
+    if proc.returncode is None:
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+    reaped = asyncio.ensure_future(proc.wait())
+    cancelled = None
+    while not reaped.done():
+        try:
+            await asyncio.shield(reaped)
+        except asyncio.CancelledError as e:
+            cancelled = e  # Finish reaping first
+    if cancelled is not None:
+        raise cancelled
+
+async def run_command_async(cmd, timeout=None):
+    """
+    asyncio variant of run_command; doesn't block the event loop.
+
+    Returns:
+        subprocess.CompletedProcess: returncode is None if the command couldn't run or timed out
+    """
+    timeout = _timeout_for(cmd, timeout)
+    start = time.monotonic()
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+    except OSError as e:
+        _record(cmd, None, time.monotonic() - start, 'error')
+        return subprocess.CompletedProcess(cmd, None, '', str(e))
+
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        try:
+            await _kill(proc)
+        except asyncio.CancelledError:
+            _record(cmd, None, time.monotonic() - start, 'cancelled')
+            raise
+        _record(cmd, None, time.monotonic() - start, 'timeout')
+        logger.warning(f"Command timed out after {timeout}s: {' '.join(cmd)}")
+        return subprocess.CompletedProcess(cmd, None, '', 'timed out')
+    except BaseException:
+        # Cancelled by an outer timeout (a whole preset apply) or shutdown; don't leave the child behind
+        await _kill(proc)
+        _record(cmd, None, time.monotonic() - start, 'cancelled')
+        raise
+
+    _record(cmd, proc.returncode, time.monotonic() - start, 'ok')
+    return subprocess.CompletedProcess(
+        cmd, proc.returncode, stdout.decode(errors='replace'), stderr.decode(errors='replace')
+    )
+
+def start_command(cmd):
+    """
+    Start a long-running command in the background (e.g. the EasyEffects service)
+    without waiting for it. Only the start is accounted for.
+
+    Returns:
+        subprocess.Popen: The process, or None if it couldn't be started
+    """
+    start = time.monotonic()
+    try:
+        process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except OSError as e:
+        _record(cmd, None, time.monotonic() - start, 'error')
+        logger.error(f"Could not start {' '.join(cmd)}: {e}")
+        return None
+    _record(cmd, 0, time.monotonic() - start, 'ok')
+    return process
+
+async def start_command_async(cmd):
+    """
+    asyncio variant of start_command with stdout piped, for long-running
+    commands whose output is followed line by line (e.g. dbus-monitor).
+    Only the start is accounted for.
+
+    Returns:
+        asyncio.subprocess.Process: The process, or None if it couldn't be started
+    """
+    start = time.monotonic()
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *cmd, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+    except OSError as e:
+        _record(cmd, None, time.monotonic() - start, 'error')
+        logger.debug(f"Could not start {' '.join(cmd)}: {e}")
+        return None
+    _record(cmd, 0, time.monotonic() - start, 'ok')
+    return process
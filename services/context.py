@@ -0,0 +1,122 @@
+"""
+Playback-context pre-resolution for Adaptive EQ
+
+When playback starts from a playlist, album or artist, the whole context's
+track list is fetched once in the background and every track is resolved to
+a preset in bulk. Later track changes within that context are dict lookups.
+"""
+
+import threading
+from services.spotify import get_spotify_client, get_context_tracks
+from services.eq_control import get_available_presets, preload_presets
+from services.genres import fetch_artist_genres, recommend_preset
+from services.logger import get_logger
+
+# Set up logger
+logger = get_logger(__name__)
+
+class ContextResolver:
+    """Keeps a track ID → preset table for the current playback context."""
+
+    def __init__(self, profile_map, default_preset="default", use_genres=True):
+        """
+        Args:
+            profile_map (dict): Artist → preset mapping (read, never modified)
+            default_preset (str): Preset for artists with no mapping and no usable genres
+            use_genres (bool): Classify unmapped artists by their Spotify genres
+        """
+        self.profile_map = profile_map
+        self.default_preset = default_preset
+        self.use_genres = use_genres
+
+        self.context_uri = None
+        self._presets = {}
+        self._lock = threading.Lock()
+
+    def on_track(self, track):
+        """
+        Note the context of the current track, starting a background resolution
+        job when playback moves to a new context.
+
+        Args:
+            track (dict): Track info dict as returned by get_current_track
+        """
+        context = track.get('context') if track else None
+        context_uri = context.get('uri') if context else None
+
+        with self._lock:
+            if context_uri == self.context_uri:
+                return
+            self.context_uri = context_uri
+            self._presets = {}
+
+        if not context_uri:
+            return
+
+        logger.info(f"Playback context changed to {context_uri}, resolving presets in background")
+        thread = threading.Thread(target=self._resolve_context, args=(context_uri,), name="context-resolver")
+        thread.daemon = True
+        thread.start()
+
+    def lookup(self, track):
+        """Return the pre-resolved preset for a track, or None if not resolved (yet)."""
+        track_id = track.get('id') if track else None
+        if not track_id:
+            return None
+        with self._lock:
+            return self._presets.get(track_id)
+
+    def resolve_tracks(self, tracks):
+        """
+        Resolve presets for many tracks at once.
+
+        Artists in the profile map use their mapped preset; the rest are classified
+        from genres fetched in batches of 50 (cached across contexts).
+
+        Returns:
+            dict: Track ID → preset name
+        """
+        presets = {}
+        unmapped = {}
+        for track in tracks:
+            preset = self.profile_map.get(track['artist'])
+            if preset:
+                presets[track['id']] = preset
+            else:
+                artist_id = (track.get('artist_ids') or [None])[0]
+                if artist_id:
+                    unmapped[artist_id] = track['artist']
+
+        genre_presets = {}
+        if self.use_genres and unmapped:
+            client = get_spotify_client()
+            if client:
+                available = set(get_available_presets())
+                for artist_id, genres in fetch_artist_genres(client, unmapped).items():
+                    recommended = recommend_preset(genres)
+                    if recommended in available:
+                        genre_presets[artist_id] = recommended
+
+        for track in tracks:
+            if track['id'] not in presets:
+                artist_id = (track.get('artist_ids') or [None])[0]
+                presets[track['id']] = genre_presets.get(artist_id, self.default_preset)
+
+        return presets
+
+    def _resolve_context(self, context_uri):
+        try:
+            tracks = get_context_tracks(context_uri)
+            presets = self.resolve_tracks(tracks)
+            preload_presets(set(presets.values()))
+        except Exception as e:
+            logger.error(f"Error resolving presets for context {context_uri}: {e}")
+            return
+
+        with self._lock:
+            # Playback may have moved on while we were resolving
+            if self.context_uri != context_uri:
+                return
+            self._presets = presets
+
+        logger.info(f"Resolved presets for {len(presets)} tracks in context {context_uri}")
@@ -0,0 +1,672 @@
+"""
+asyncio daemon core for Adaptive EQ
+
+Runs each stage of the daemon as its own asyncio task so a slow or hung
+component can't delay the others:
+
+- playback source: polls Spotify and detects artist changes
+- genre resolver: classifies unmapped artists from their genres
+- queue prefetcher: resolves presets for upcoming tracks
+- apply worker: applies the most recently requested preset
+- file watchers: reload the profile map and preset catalog when they change
+- metrics: periodically logs poll/apply statistics
+- wake monitor: cuts the idle backoff short on MPRIS playback and unlock
+  signals (see services/wake.py)
+- warm-up: at startup, authenticates with Spotify, loads the profile map,
+  indexes the preset catalog and restores the last applied preset
+  concurrently, so the first poll isn't held up by any one of them
+- IPC server: serves status, events, preset overrides and mode toggles to the
+  tray and helper CLIs over a Unix socket (see services/ipc.py)
+
+With NumPy installed, tracks by several mapped artists and artists whose
+genres match several presets get a blend of those presets (see
+services/blend.py). New blends are made on the file worker; the primary
+artist's preset plays until the blend is ready.
+
+Blocking work (spotipy, file parsing) runs on per-stage thread pools with
+timeouts; external commands run through asyncio subprocesses. Track changes
+are detected and resolved by the shared AdaptiveEngine; this module only
+schedules it on the event loop.
+"""
+
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from services.spotify import AsyncSpotifyClient, get_cached_track_info
+from services.eq_control import (
+    force_ui_refresh, preload_presets, invalidate_preset_cache, get_available_presets,
+    get_active_preset_async, EASYEFFECTS_PRESETS_PATH, SYSTEM_PRESETS_PATH
+)
+from services.engine import AdaptiveEngine, EasyEffectsBackend, TrackBoundaryScheduler
+from services.prefetch import QueuePrefetcher
+from services.context import ContextResolver
+from services.genre_fallback import GenreFallbackResolver
+from services.blend import PresetBlender, np
+from services.preset_similarity import PresetSimilarity, DEFAULT_THRESHOLD
+from services.profiles import load_profile_map, load_last_preset, save_last_preset, DEFAULT_PROFILE_PATH
+from services.ipc import IPCServer
+from services.metrics import MetricsServer
+from services.trace import TraceRecorder
+from services.commands import get_command_stats
+from services.wake import DBusWakeMonitor
+from services.logger import get_logger
+
+# Set up logger
+logger = get_logger(__name__)
+
+# Consecutive failed polls before subscribers are told Spotify is unreachable
+POLL_FAILURES_BEFORE_ERROR = 3
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+class AdaptiveDaemon:
+    """Adaptive EQ daemon built from concurrent asyncio tasks."""
+
+    def __init__(self, profile_path=DEFAULT_PROFILE_PATH, force_refresh=False, refresh_interval=30,
+                 poll_interval=5, idle_interval=10, idle_max_interval=300, wake_on_dbus=True,
+                 queue_lookahead=3, prefetch_interval=15,
+                 use_context=True, use_genre_fallback=True, save_genre_presets=False, blend_presets=True,
+                 similar_threshold=DEFAULT_THRESHOLD,
+                 api_timeout=10, apply_timeout=30, command_timeout=None,
+                 watch_interval=2, metrics_interval=300, socket_path=None,
+                 metrics_port=None, metrics_socket=None, trace_path=None):
+        """
+        Args:
+            profile_path (str): Artist → preset mapping file
+            force_refresh (bool): Force EasyEffects UI refreshes when applying presets
+            refresh_interval (int): Seconds between periodic UI refreshes (with force_refresh)
+            poll_interval (int): Seconds between playback polls while a track is playing
+            idle_interval (int): Seconds between playback polls while nothing is playing
+            idle_max_interval (int): Ceiling the idle interval backs off to (doubling per idle poll)
+            wake_on_dbus (bool): Poll immediately on MPRIS playback and session unlock signals
+            queue_lookahead (int): Queued tracks to resolve ahead of time (0 disables)
+            prefetch_interval (int): Seconds between queue reads
+            use_context (bool): Pre-resolve presets for the playback context
+            use_genre_fallback (bool): Classify unmapped artists by genre
+            save_genre_presets (bool): Persist genre-based presets to the profile map
+            blend_presets (bool): Blend presets for collaborations and genre mixes (needs NumPy)
+            similar_threshold (float): Skip switching to presets within this perceptual distance
+                                       (RMS dB) of the active one (needs NumPy; 0 disables)
+            api_timeout (int): Seconds before a Spotify request is abandoned
+            apply_timeout (int): Seconds before a whole preset application is abandoned
+            command_timeout (int): Seconds before a single external command or file operation is
+                                   abandoned (default: per-command timeouts, 5 s for files)
+            watch_interval (int): Seconds between checks of the watched files
+            metrics_interval (int): Seconds between statistics log lines
+            socket_path (str): IPC socket path, defaults to ipc.default_socket_path()
+            metrics_port (int): Serve Prometheus metrics on this localhost port
+            metrics_socket (str): Serve Prometheus metrics on this Unix socket
+            trace_path (str): Record the polled playback states to this trace file
+                              (see services/trace.py)
+        """
+        self.profile_path = profile_path
+        self.force_refresh = force_refresh
+        self.refresh_interval = refresh_interval
+        self.prefetch_interval = prefetch_interval
+        self.api_timeout = api_timeout
+        self.apply_timeout = apply_timeout
+        self.command_timeout = command_timeout
+        self.file_timeout = command_timeout or 5
+        self.watch_interval = watch_interval
+        self.metrics_interval = metrics_interval
+        self.wake_on_dbus = wake_on_dbus
+
+        # Filled in place by the warm-up (the resolvers hold a reference to this dict)
+        self.profile_map = {}
+
+        # One small pool per stage, so a hung call in one can't starve the others
+        self._executors = {
+            'spotify': ThreadPoolExecutor(max_workers=2, thread_name_prefix="spotify"),
+            'genres': ThreadPoolExecutor(max_workers=1, thread_name_prefix="genres"),
+            'prefetch': ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch"),
+            # Two workers so the warm-up can read the profile map and the preset catalog at once
+            'files': ThreadPoolExecutor(max_workers=2, thread_name_prefix="files"),
+        }
+        self.spotify = AsyncSpotifyClient(timeout=api_timeout, executor=self._executors['spotify'])
+
+        self.blender = None
+        if blend_presets:
+            if np is not None:
+                self.blender = PresetBlender(in_use=self._presets_in_use)
+            else:
+                logger.info("NumPy not installed; collaborations get the primary artist's preset")
+        self.similarity = None
+        if similar_threshold > 0 and np is not None:
+            self.similarity = PresetSimilarity(similar_threshold)
+
+        self.engine = AdaptiveEngine(
+            backend=EasyEffectsBackend(force_ui_refresh=force_refresh, command_timeout=command_timeout,
+                                       executor=self._executors['files']),
+            scheduler=TrackBoundaryScheduler(poll_interval, idle_interval, idle_max_interval=idle_max_interval),
+            profile_map=self.profile_map,
+            context_resolver=ContextResolver(self.profile_map) if use_context else None,
+            on_track=self._on_track,
+            on_preset=self._on_preset,
+            on_apply_failed=self._on_apply_failed,
+            blender=self.blender,
+            similarity=self.similarity
+        )
+        if queue_lookahead > 0:
+            # Driven by the prefetch task instead of its own thread
+            self.engine.prefetcher = QueuePrefetcher(
+                self.engine.resolve_preset, lookahead=queue_lookahead, interval=prefetch_interval
+            )
+        self.use_genre_fallback = use_genre_fallback
+        self.save_genre_presets = save_genre_presets
+
+        self.ipc = IPCServer({
+            'ping': lambda request: 'pong',
+            'status': lambda request: self.status(),
+            'presets': self._cmd_presets,
+            'set_preset': self._cmd_set_preset,
+            'set_mode': self._cmd_set_mode,
+            'refresh': self._cmd_refresh,
+            'wake': self._cmd_wake,
+            'shutdown': self._cmd_shutdown,
+        }, path=socket_path, snapshot=self.status)
+        self.trace = TraceRecorder(trace_path) if trace_path else None
+        self.metrics_server = None
+        if metrics_port or metrics_socket:
+            self.metrics_server = MetricsServer(port=metrics_port, path=metrics_socket)
+
+        self.last_refresh = time.time()
+        self.track = None  # Summary of the track last reported to clients
+        self._poll_failures = 0
+        self._manual = False  # Whether the apply in progress is a client override
+        self._desired = None  # (preset, artist, force, waiter) for the apply worker
+        self._started = None  # Monotonic time run() started
+        self._restored_preset = None  # Preset active from the last session, once confirmed or re-applied
+        self._first_preset = None  # Preset requested by the first poll, until it is active
+        self._first_poll_done = False
+        self.stats = self.engine.stats
+        self.stats.update({
+            'apply_timeouts': 0,
+            'applies_coalesced': 0,
+            'genre_lookups': 0,
+            'genre_timeouts': 0,
+            'manual_applies': 0,
+            'idle_wakeups': 0,  # Polls while nothing was playing (timer or signal)
+            'idle_time_total': 0.0,
+            'signal_wakeups': 0,  # Idle waits cut short by a wake signal or client
+        })
+
+    async def run(self):
+        """
+        Run all daemon tasks until cancelled.
+
+        Raises:
+            IPCError: If another daemon is already running
+        """
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._apply_requested = asyncio.Event()
+        self._prefetch_requested = asyncio.Event()
+        self._genre_queue = asyncio.Queue()
+        self._blend_queue = asyncio.Queue()
+        self._stopped = asyncio.Event()
+        self._profiles_ready = asyncio.Event()
+        self._started = time.monotonic()
+        await self.ipc.start()
+        if self.metrics_server:
+            await self.metrics_server.start()
+
+        if self.blender:
+            # Make new blends on the file worker; the engine only looks them up
+            self.blender.enqueue = lambda weights: self._loop.call_soon_threadsafe(self._blend_queue.put_nowait,
+                                                                                  weights)
+            self.blender.on_resolved = lambda preset: self._loop.call_soon_threadsafe(self._wake.set)
+
+        if self.use_genre_fallback:
+            self.engine.genre_fallback = GenreFallbackResolver(
+                on_resolved=self._on_genre_resolved_threadsafe,
+                profile_map=self.profile_map if self.save_genre_presets else None,
+                persist_path=self.profile_path if self.save_genre_presets else None,
+                enqueue=lambda item: self._loop.call_soon_threadsafe(self._genre_queue.put_nowait, item),
+                blender=self.blender
+            )
+
+        stages = [self._playback_loop(), self._apply_loop(), self._watch_loop(), self._metrics_loop()]
+        if self.engine.genre_fallback:
+            stages.append(self._genre_loop())
+        if self.blender:
+            stages.append(self._blend_loop())
+        if self.engine.prefetcher:
+            stages.append(self._prefetch_loop())
+        if self.force_refresh:
+            stages.append(self._ui_refresh_loop())
+        if self.wake_on_dbus:
+            stages.append(self._wake_signal_loop())
+
+        # Not a stage: it finishes, and a failed step must not stop the daemon
+        warm_up = asyncio.ensure_future(self._warm_up())
+        tasks = [asyncio.ensure_future(stage) for stage in stages]
+        stopped = asyncio.ensure_future(self._stopped.wait())
+        try:
+            done, _ = await asyncio.wait(tasks + [stopped], return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()  # Re-raise if a stage crashed
+            logger.info("Adaptive EQ Daemon stopped by client request")
+        finally:
+            stopped.cancel()
+            warm_up.cancel()
+            for task in tasks:
+                task.cancel()
+            await self.ipc.close()
+            if self.metrics_server:
+                await self.metrics_server.close()
+            await self.spotify.close()
+            self.engine.events.flush()
+            if self.trace:
+                self.trace.close()
+            for executor in self._executors.values():
+                executor.shutdown(wait=False)
+
+    async def _warm_up(self):
+        """
+        Run the startup steps concurrently and log how long each took.
+        Steps that fail are logged and retried lazily by the stages that need them.
+        """
+        timings = {}
+
+        async def timed(name, step):
+            start = time.monotonic()
+            try:
+                await step()
+            except asyncio.TimeoutError:
+                logger.warning(f"Warm-up step {name} timed out")
+            except Exception as e:
+                logger.warning(f"Warm-up step {name} failed: {e}")
+            timings[name] = time.monotonic() - start
+
+        await asyncio.gather(
+            timed('auth', self.spotify.warm_up),
+            timed('profiles', self._load_profiles),
+            timed('catalog', self._index_presets),
+            timed('restore', self._restore_last_preset),
+        )
+        logger.info(f"Warm-up finished in {time.monotonic() - self._started:.2f} s ("
+                    + ', '.join(f"{name} {elapsed:.2f} s" for name, elapsed in timings.items()) + ")")
+
+    async def _load_profiles(self):
+        try:
+            profiles = await self._in_executor('files', load_profile_map, self.profile_path,
+                                               timeout=self.file_timeout)
+            self.profile_map.update(profiles)
+            logger.info(f"Loaded {len(profiles)} artist → preset mappings")
+        finally:
+            # Without a map every artist gets the default preset; don't hold up playback for it
+            self._profiles_ready.set()
+
+    async def _index_presets(self):
+        presets = await self._in_executor('files', get_available_presets, timeout=self.apply_timeout)
+        await self._profiles_ready.wait()
+        wanted = (set(self.profile_map.values()) | {self.engine.default_preset}) & set(presets)
+        await self._in_executor('files', preload_presets, sorted(wanted), timeout=self.apply_timeout)
+        logger.debug(f"Indexed {len(presets)} presets, parsed {len(wanted)} mapped ones")
+
+    async def _restore_last_preset(self):
+        """Put the last session's preset back before Spotify has answered."""
+        last = await self._in_executor('files', load_last_preset, timeout=self.file_timeout)
+        if not last:
+            return
+        preset = last['preset']
+        if await get_active_preset_async() == preset:
+            # EasyEffects kept it across the restart; nothing to apply
+            if self.engine.current_preset is None:
+                self.engine.current_preset = preset
+                self._restored_preset = preset
+                logger.info(f"EQ preset from the last session still active: {preset}")
+            self._check_first_preset()
+        elif self.engine.requested_preset is None and self._desired is None:
+            # Only if the first poll hasn't already asked for something
+            logger.info(f"Restoring EQ preset from the last session: {preset}")
+            self._restored_preset = preset
+            self._request_apply(preset, last.get('artist'))
+
+    def _check_first_preset(self):
+        """Log how long it took from startup until the first poll's preset was active."""
+        # A preset that sounds the same as the active one counts as active (it isn't applied);
+        # only what the apply worker already found out counts, as comparing may read files
+        if self._first_preset is None or self._first_preset not in (self.engine.current_preset,
+                                                                   self.engine.equivalent_preset):
+            return
+        elapsed = time.monotonic() - self._started
+        restored = self._restored_preset is not None and self.engine.current_preset == self._restored_preset
+        logger.info(f"First correct EQ after {elapsed:.2f} s: {self._first_preset}"
+                    + (" (restored from last session)" if restored else ""))
+        self.engine.events.emit('startup', preset=self._first_preset, restored=restored,
+                                time_to_eq=round(elapsed, 3))
+        self._first_preset = None
+
+    async def _sleep(self, delay):
+        """Sleep until the delay passes or the playback loop is woken."""
+        try:
+            await asyncio.wait_for(self._wake.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+
+    def _wake_up(self, source, detail=None):
+        """Poll now, and restart the idle backoff (a sign that playback may start)."""
+        self.engine.scheduler.reset_idle()
+        if self.track is None:
+            self.stats['signal_wakeups'] += 1
+            logger.debug(f"Woken by {source}" + (f" ({detail})" if detail else ""))
+        self._wake.set()
+
+    async def _in_executor(self, stage, func, *args, timeout=None):
+        future = self._loop.run_in_executor(self._executors[stage], func, *args)
+        return await asyncio.wait_for(future, timeout)
+
+    def _request_apply(self, preset, artist, force=False, waiter=None):
+        if self._desired is not None and self._apply_requested.is_set():
+            # The previous request was never started; only the latest matters
+            self.stats['applies_coalesced'] += 1
+            superseded = self._desired[3]
+            if superseded is not None and not superseded.done():
+                superseded.set_result(False)
+        self._desired = (preset, artist, force, waiter)
+        self._apply_requested.set()
+
+    def status(self):
+        """Snapshot of the daemon state for IPC clients."""
+        return {
+            'adaptive': self.engine.enabled,
+            'track': self.track,
+            'preset': self.engine.current_preset,
+            'requested_preset': self.engine.requested_preset,
+            'stats': dict(self.stats),
+            'commands': get_command_stats(),
+            'idle_wakeups_per_hour': round(self._idle_wakeups_per_hour(), 1),
+            'pid': os.getpid(),
+        }
+
+    def _on_track(self, track):
+        summary = None
+        if track:
+            summary = {key: track.get(key) for key in ('artist', 'track', 'album', 'id')}
+        if summary != self.track:
+            self.track = summary
+            self.ipc.broadcast('track', track=summary)
+
+    def _on_preset(self, preset, artist):
+        self.ipc.broadcast('preset', preset=preset, artist=artist, manual=self._manual)
+        # Fire and forget; the next startup restores this preset
+        self._loop.run_in_executor(self._executors['files'], save_last_preset, preset, artist)
+
+    def _on_apply_failed(self, preset, artist):
+        self.ipc.broadcast('apply_failed', preset=preset, artist=artist, manual=self._manual)
+
+    async def _cmd_presets(self, request):
+        return await self._in_executor('files', get_available_presets, timeout=self.file_timeout)
+
+    async def _cmd_set_preset(self, request):
+        """Manual override: apply a preset now, even if it is already active."""
+        preset = request.get('preset')
+        if preset not in await self._cmd_presets(request):
+            raise ValueError(f"Unknown preset: {preset}")
+
+        self.stats['manual_applies'] += 1
+        waiter = self._loop.create_future()
+        self._request_apply(preset, self.engine.last_artist, force=True, waiter=waiter)
+        return await waiter
+
+    def _cmd_set_mode(self, request):
+        """Turn adaptive mode on or off; re-enabling re-evaluates the current track."""
+        enabled = bool(request.get('adaptive'))
+        if enabled != self.engine.enabled:
+            self.engine.enabled = enabled
+            if enabled:
+                self.engine.last_artist = None
+                self._wake_up('mode')
+            logger.info(f"Adaptive mode {'enabled' if enabled else 'disabled'}")
+            self.ipc.broadcast('mode', adaptive=enabled)
+        return enabled
+
+    async def _cmd_refresh(self, request):
+        """Refresh the EasyEffects UI and re-apply the active preset."""
+        await self._in_executor('files', force_ui_refresh, timeout=self.apply_timeout)
+        self.last_refresh = time.time()
+        preset = self.engine.current_preset
+        if not preset:
+            return False
+        waiter = self._loop.create_future()
+        self._request_apply(preset, self.engine.last_artist, force=True, waiter=waiter)
+        return await waiter
+
+    def _cmd_wake(self, request):
+        self._wake_up(request.get('source', 'client'))
+        return True
+
+    def _cmd_shutdown(self, request):
+        # Give the reply a moment to reach the client before the socket closes
+        self._loop.call_later(0.1, self._stopped.set)
+        return True
+
+    async def _playback_loop(self):
+        while True:
+            track = None
+            failed = False
+            start = time.monotonic()
+            try:
+                track = await asyncio.wait_for(self.spotify.get_current_track(), self.api_timeout + 1)
+                self.engine.record_poll(time.monotonic() - start)
+                self._poll_failures = 0
+                if self.trace:
+                    self.trace.record(track)
+            except asyncio.TimeoutError:
+                self.engine.record_poll(time.monotonic() - start, error=True)
+                self._poll_failed("Playback poll timed out")
+                failed = True
+            except Exception as e:
+                self.engine.record_poll(time.monotonic() - start, error=True)
+                # Timeouts from aiohttp and the executor have an empty message, so include the type
+                self._poll_failed(f"Error in playback loop: {type(e).__name__}: {e}")
+                failed = True
+
+            resolve_track = track
+            if failed:
+                if self.engine.last_artist is not None:
+                    # Unknown, not stopped: keep the track (and preset) as they were and just back off
+                    await self._sleep(self.engine.scheduler.next_delay(None))
+                    continue
+                # Offline before any track was seen: use the last known track's preset,
+                # but keep backing off as if nothing were playing
+                resolve_track = await self._cached_track()
+            elif track is None:
+                logger.debug("No track playing...")
+            try:
+                # Resolving against a half-loaded map would apply the default preset first
+                await self._profiles_ready.wait()
+                preset = self.engine.observe(resolve_track)
+                if not self._first_poll_done:
+                    self._first_poll_done = True
+                    self._first_preset = preset
+                    self._check_first_preset()
+                if preset:
+                    self._request_apply(preset, resolve_track.get("artist"))
+                    # The queue has moved on; resolve the next tracks while this one plays
+                    self._prefetch_requested.set()
+            except Exception as e:
+                logger.error(f"Error processing track: {e}")
+
+            slept = time.monotonic()
+            await self._sleep(self.engine.scheduler.next_delay(track))
+            if track is None:
+                self.stats['idle_wakeups'] += 1
+                self.stats['idle_time_total'] += time.monotonic() - slept
+
+    async def _cached_track(self):
+        """The last track seen playing (from an earlier session too), or None"""
+        try:
+            track = await self._in_executor('files', get_cached_track_info, timeout=self.file_timeout)
+        except Exception as e:
+            logger.debug(f"Could not read the cached track: {e}")
+            return None
+        if track:
+            logger.info("Using cached track information until Spotify can be reached")
+        return track
+
+    def _poll_failed(self, message):
+        logger.warning(message)
+        self._poll_failures += 1
+        if self._poll_failures == POLL_FAILURES_BEFORE_ERROR:
+            self.ipc.broadcast('error', message=f"Failed to reach Spotify {self._poll_failures} times in a row")
+
+    def _on_genre_resolved_threadsafe(self, artist, preset):
+        self._loop.call_soon_threadsafe(self._on_genre_resolved, artist, preset)
+
+    def _on_genre_resolved(self, artist, preset):
+        if artist == self.engine.last_artist:
+            # The engine picks up the genre-based preset on the next poll
+            self._wake.set()
+
+    async def _apply_loop(self):
+        while True:
+            await self._apply_requested.wait()
+            self._apply_requested.clear()
+            preset, artist, force, waiter = self._desired
+            self._manual = waiter is not None
+
+            try:
+                comparison = await self._in_executor('files', self._prepare_apply, preset, force,
+                                                     timeout=self.file_timeout)
+                success = await asyncio.wait_for(self.engine.apply_async(preset, artist, force, comparison),
+                                                 self.apply_timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"Timed out applying EQ preset: {preset}")
+                self.stats['apply_timeouts'] += 1
+                success = False
+            except Exception as e:
+                logger.error(f"Error applying EQ preset {preset}: {e}")
+                success = False
+
+            if success:
+                self.last_refresh = time.time()
+                self._check_first_preset()
+            if waiter is not None and not waiter.done():
+                waiter.set_result(success)
+
+    def _presets_in_use(self):
+        """Presets that must stay installed: the active, the requested and the queued one (any thread)"""
+        desired = self._desired
+        return {self.engine.current_preset, self.engine.requested_preset, desired[0] if desired else None}
+
+    def _prepare_apply(self, preset, force):
+        """Parse the preset and the active one, and compare them (on the file worker)"""
+        preload_presets([name for name in (preset, self.engine.current_preset) if name])
+        return None if force else self.engine.compare_active(preset)
+
+    async def _genre_loop(self):
+        while True:
+            artist, artist_id = await self._genre_queue.get()
+            self.stats['genre_lookups'] += 1
+            try:
+                await self._in_executor('genres', self.engine.genre_fallback.process, artist, artist_id,
+                                        timeout=self.api_timeout * 2)
+            except asyncio.TimeoutError:
+                logger.warning(f"Genre lookup for {artist} timed out")
+                self.stats['genre_timeouts'] += 1
+            except Exception as e:
+                logger.error(f"Error in genre resolver for {artist}: {e}")
+
+    async def _blend_loop(self):
+        while True:
+            weights = await self._blend_queue.get()
+            try:
+                await self._in_executor('files', self.blender.process, weights, timeout=self.file_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Blending {', '.join(weights)} timed out")
+            except Exception as e:
+                logger.error(f"Error blending {', '.join(weights)}: {e}")
+
+    async def _prefetch_loop(self):
+        while True:
+            try:
+                await self._in_executor('prefetch', self.engine.prefetcher.refresh, timeout=self.api_timeout * 2)
+            except asyncio.TimeoutError:
+                logger.warning("Queue prefetch timed out")
+            except Exception as e:
+                logger.error(f"Error in queue prefetcher: {e}")
+
+            try:
+                await asyncio.wait_for(self._prefetch_requested.wait(), self.prefetch_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._prefetch_requested.clear()
+
+    async def _ui_refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            if self.engine.last_artist is None or time.time() - self.last_refresh < self.refresh_interval:
+                continue
+            logger.debug("Performing periodic UI refresh")
+            try:
+                await self._in_executor('files', force_ui_refresh, timeout=self.apply_timeout)
+            except Exception as e:
+                logger.error(f"Error during periodic UI refresh: {e}")
+            self.last_refresh = time.time()
+
+    async def _watch_loop(self):
+        watched_dirs = [EASYEFFECTS_PRESETS_PATH, SYSTEM_PRESETS_PATH]
+        profile_mtime = _mtime(self.profile_path)
+        dir_mtimes = [_mtime(path) for path in watched_dirs]
+
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            try:
+                mtime = _mtime(self.profile_path)
+                if mtime != profile_mtime:
+                    profile_mtime = mtime
+                    profiles = await self._in_executor('files', load_profile_map, self.profile_path,
+                                                       timeout=self.file_timeout)
+                    # Update in place (the resolvers hold a reference to this dict),
+                    # without an empty window other threads could observe
+                    self.profile_map.update(profiles)
+                    for artist in set(self.profile_map) - set(profiles):
+                        del self.profile_map[artist]
+                    logger.info(f"Profile map changed, reloaded {len(profiles)} mappings")
+
+                mtimes = [_mtime(path) for path in watched_dirs]
+                if mtimes != dir_mtimes:
+                    dir_mtimes = mtimes
+                    invalidate_preset_cache()
+                    logger.info("Preset directories changed, preset cache cleared")
+
+                # Events are only flushed when recorded; don't leave them buffered while idle
+                self.engine.events.flush()
+                if self.trace:
+                    self.trace.flush()
+            except Exception as e:
+                logger.error(f"Error checking watched files: {e}")
+
+    async def _wake_signal_loop(self):
+        await DBusWakeMonitor(self._wake_up).run()
+        # Returns when dbus-monitor isn't available; a finished stage would stop the daemon
+        await asyncio.Event().wait()
+
+    async def _metrics_loop(self):
+        while True:
+            await asyncio.sleep(self.metrics_interval)
+            stats = self.stats
+            polls = stats['polls'] or 1
+            applies = stats['applies'] or 1
+            logger.info(
+                f"Stats: {stats['polls']} polls (avg {stats['poll_time_total'] / polls * 1000:.0f} ms, "
+                f"max {stats['poll_time_max'] * 1000:.0f} ms), {stats['artist_changes']} artist changes, "
+                f"{stats['applies']} applies (avg {stats['apply_time_total'] / applies * 1000:.0f} ms, "
+                f"{stats['apply_failures']} failed, {stats['apply_timeouts']} timed out, "
+                f"{stats['applies_skipped']} skipped as identical ({stats['applies_skipped_similar']} sounding the same), "
+                f"{stats['applies_coalesced']} coalesced), "
+                f"{stats['genre_lookups']} genre lookups, {self._idle_wakeups_per_hour():.1f} wakeups "
+                f"per idle hour ({stats['signal_wakeups']} by signals)"
+            )
+
+    def _idle_wakeups_per_hour(self):
+        idle_hours = self.stats['idle_time_total'] / 3600
+        return self.stats['idle_wakeups'] / idle_hours if idle_hours else 0.0
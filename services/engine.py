@@ -0,0 +1,489 @@
+"""
+Shared monitoring engine for Adaptive EQ
+
+One detect → resolve → apply pipeline used by every entry point (the daemon,
+the tray and the helper CLI). Track sources, poll schedulers and apply
+backends are pluggable, and UI code hooks in through callbacks.
+"""
+
+import time
+import threading
+from services.spotify import get_current_track
+from services.eq_control import apply_eq_preset, apply_eq_preset_async, preload_presets
+from services.events import get_event_log
+from services.metrics import POLL_SECONDS, APPLY_SECONDS, record_cache_lookup
+from services.logger import get_logger
+
+# Set up logger
+logger = get_logger(__name__)
+
+class SpotifyTrackSource:
+    """Track source backed by the Spotify Web API."""
+
+    def get_track(self):
+        """Return the current track info dict, or None if nothing is playing."""
+        return get_current_track()
+
+class FixedIntervalScheduler:
+    """
+    Polls at a fixed interval, optionally slower while nothing is playing.
+    With idle_max_interval, the idle interval doubles with every poll that finds
+    nothing playing, up to that ceiling, until playback resumes or reset_idle().
+    """
+
+    def __init__(self, interval=5, idle_interval=None, idle_max_interval=None, idle_backoff=2):
+        """
+        Args:
+            interval (float): Seconds between polls while a track is playing
+            idle_interval (float): Seconds between polls while nothing is playing (defaults to interval)
+            idle_max_interval (float): Ceiling for the idle backoff (None disables the backoff)
+            idle_backoff (float): Factor the idle interval grows by per idle poll
+        """
+        self.interval = interval
+        self.idle_interval = idle_interval if idle_interval is not None else interval
+        self.idle_max_interval = idle_max_interval if idle_max_interval is not None else self.idle_interval
+        self.idle_backoff = idle_backoff
+        self._idle_polls = 0
+
+    def next_delay(self, track):
+        """Seconds to wait before the next poll, given the track just polled."""
+        if not track:
+            return self._idle_delay()
+        self._idle_polls = 0
+        return self.interval
+
+    def _idle_delay(self):
+        delay = min(self.idle_interval * self.idle_backoff ** self._idle_polls, self.idle_max_interval)
+        if delay < self.idle_max_interval:
+            self._idle_polls += 1
+        return max(delay, self.idle_interval)
+
+    def reset_idle(self):
+        """Go back to the shortest idle interval, e.g. after a local sign that playback may start."""
+        self._idle_polls = 0
+
+class TrackBoundaryScheduler(FixedIntervalScheduler):
+    """
+    Polls at a fixed interval, but when the current track is about to end, wakes
+    just after the boundary so the next track's preset is applied immediately.
+    """
+
+    def __init__(self, interval=5, idle_interval=10, boundary_margin=0.25, idle_max_interval=None):
+        super().__init__(interval, idle_interval, idle_max_interval)
+        self.boundary_margin = boundary_margin
+
+    def next_delay(self, track):
+        if not track:
+            return self._idle_delay()
+        self._idle_polls = 0
+
+        duration = track.get("duration_ms")
+        progress = track.get("progress_ms")
+        if duration is None or progress is None:
+            return self.interval
+
+        remaining = max(0.0, (duration - progress) / 1000.0)
+        return min(self.interval, remaining + self.boundary_margin)
+
+class EasyEffectsBackend:
+    """Applies presets to EasyEffects."""
+
+    def __init__(self, force_ui_refresh=False, command_timeout=None, executor=None):
+        self.force_ui_refresh = force_ui_refresh
+        self.command_timeout = command_timeout
+        # Runs the file work of async applies (see apply_eq_preset_async)
+        self.executor = executor
+
+    def apply(self, preset):
+        """Apply a preset, returning True on success."""
+        return apply_eq_preset(preset, force_ui_refresh=self.force_ui_refresh)
+
+    async def apply_async(self, preset):
+        """asyncio variant of apply."""
+        return await apply_eq_preset_async(preset, self.force_ui_refresh, self.command_timeout, self.executor)
+
+class AdaptiveEngine:
+    """Detects artist changes, resolves presets and applies them through a backend."""
+
+    def __init__(self, source=None, backend=None, scheduler=None, profile_map=None,
+                 default_preset="default", skip_identical=True,
+                 context_resolver=None, prefetcher=None, genre_fallback=None,
+                 on_track=None, on_preset=None, on_apply_failed=None, on_error=None,
+                 clock=time.monotonic, events=None, blender=None, featured_weight=0.5, similarity=None):
+        """
+        Args:
+            source: Object with get_track() returning a track info dict or None
+            backend: Object with apply(preset) (and optionally apply_async(preset))
+            scheduler: Object with next_delay(track) returning seconds until the next poll
+            profile_map (dict): Artist → preset mapping
+            default_preset (str): Preset for unmapped artists, or None to leave the EQ alone
+            skip_identical (bool): Don't re-apply the preset that is already active
+            context_resolver: Optional ContextResolver for playlist/album pre-resolution
+            prefetcher: Optional QueuePrefetcher for upcoming tracks
+            genre_fallback: Optional GenreFallbackResolver for unmapped artists
+            on_track: Callable(track) after every poll (track may be None)
+            on_preset: Callable(preset, artist) after a preset was applied
+            on_apply_failed: Callable(preset, artist) after a preset failed to apply
+            on_error: Callable(exception) when polling the source raised
+            clock: Monotonic time function
+            events: EventLog for structured events, defaults to the shared one
+            blender: Optional PresetBlender; tracks by several mapped artists get a blend
+                     of their presets (the primary artist's until the blend is made, when
+                     the blender has an enqueue callable)
+            featured_weight (float): Weight of each featured artist's preset in a blend,
+                                     relative to the primary artist's
+            similarity: Optional PresetSimilarity; with skip_identical, presets that sound
+                        the same as the active one aren't applied either
+        """
+        self.source = source or SpotifyTrackSource()
+        self.backend = backend or EasyEffectsBackend()
+        self.scheduler = scheduler or FixedIntervalScheduler()
+        self.profile_map = profile_map if profile_map is not None else {}
+        self.default_preset = default_preset
+        self.skip_identical = skip_identical
+        self.context_resolver = context_resolver
+        self.prefetcher = prefetcher
+        self.genre_fallback = genre_fallback
+        self.on_track = on_track
+        self.on_preset = on_preset
+        self.on_apply_failed = on_apply_failed
+        self.on_error = on_error
+        self.clock = clock
+        self.events = events or get_event_log()
+        self.blender = blender
+        self.featured_weight = featured_weight
+        self.similarity = similarity
+
+        # Adaptive mode; while disabled, tracks are still reported but no presets applied
+        self.enabled = True
+        self.last_artist = None
+        self._last_lineup = ()  # All artists of the last track, while blending
+        self._awaiting_blend = None  # Weights of the current track's blend while it is being made
+        self.last_track_id = None
+        self.requested_preset = None
+        self.current_preset = None
+        self.equivalent_preset = None  # Last preset skipped for sounding like current_preset
+
+        self._apply_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._running = False
+        self.stats = {
+            'polls': 0,
+            'poll_errors': 0,
+            'poll_time_total': 0.0,
+            'poll_time_max': 0.0,
+            'artist_changes': 0,
+            'applies': 0,
+            'apply_failures': 0,
+            'applies_skipped': 0,
+            'applies_skipped_similar': 0,
+            'apply_time_total': 0.0,
+        }
+
+    def _notify(self, callback, *args):
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.error(f"Error in engine callback {getattr(callback, '__name__', callback)}: {e}")
+
+    def resolve_preset(self, track):
+        """
+        Resolve a track's preset from in-memory tables; never blocks on the network.
+        Unmapped artists are handed to the genre fallback and get the default preset.
+        """
+        return self._resolve(track)[0]
+
+    def _resolve(self, track):
+        """resolve_preset, also returning which table the preset came from."""
+        artist = track.get("artist")
+        preset = self.context_resolver.lookup(track) if self.context_resolver else None
+        if preset:
+            return preset, 'context'
+        if self.blender and len(track.get("all_artists") or []) > 1:
+            preset = self._blend_artists(track)
+            if preset:
+                return preset, 'blend'
+        preset = self.profile_map.get(artist)
+        record_cache_lookup('profile', preset is not None)
+        if preset:
+            return preset, 'profile'
+        if self.genre_fallback:
+            preset = self.genre_fallback.submit(artist, (track.get("artist_ids") or [None])[0])
+            if preset:
+                return preset, 'genre'
+        return self.default_preset, 'default'
+
+    def _blend_weights(self, track):
+        """Preset → weight for a track's artists, or None if they don't map to several presets."""
+        artist_ids = track.get("artist_ids") or []
+        weights = {}
+        for index, artist in enumerate(track["all_artists"]):
+            preset = self.profile_map.get(artist)
+            if not preset and self.genre_fallback:
+                preset = self.genre_fallback.submit(artist, artist_ids[index] if index < len(artist_ids) else None)
+            if preset:
+                weights[preset] = weights.get(preset, 0) + (1.0 if index == 0 else self.featured_weight)
+        return weights if len(weights) >= 2 else None
+
+    def _blend_artists(self, track):
+        """The blend of a track's artists' presets if it is ready (see PresetBlender.submit), else None."""
+        weights = self._blend_weights(track)
+        if not weights:
+            return None
+        try:
+            return self.blender.submit(weights)
+        except Exception as e:
+            logger.error(f"Error blending presets for {track.get('track')}: {e}")
+            return None
+
+    def observe(self, track):
+        """
+        Process a polled track and decide whether a preset should be applied.
+
+        Returns:
+            str: The preset to apply now, or None if nothing should change
+        """
+        self._notify(self.on_track, track)
+        if track is None:
+            return None
+
+        if track.get("id") != self.last_track_id:
+            self.last_track_id = track.get("id")
+            self.events.emit('track_detected', track_id=track.get("id"), artist=track.get("artist"),
+                             track=track.get("track"), context=(track.get("context") or {}).get("uri"))
+
+        if self.context_resolver:
+            self.context_resolver.on_track(track)
+
+        if not self.enabled:
+            return None
+
+        artist = track.get("artist")
+        # With blending, a change of featured artists can change the preset too
+        lineup = tuple(track.get("all_artists") or ()) if self.blender else ()
+        if artist != self.last_artist or lineup != self._last_lineup:
+            logger.info(f"Detected new artist: {artist}")
+            self.last_artist = artist
+            self._last_lineup = lineup
+            self.stats['artist_changes'] += 1
+
+            start = self.clock()
+            preset = self.prefetcher.lookup(track) if self.prefetcher else None
+            if preset and preset != self.default_preset:
+                logger.debug(f"Using prefetched preset for {track.get('track')}")
+                source = 'prefetch'
+            else:
+                preset, source = self._resolve(track)
+            self.events.emit('preset_resolved', artist=artist, track_id=track.get("id"), preset=preset,
+                             source=source, duration=round(self.clock() - start, 6))
+            self._awaiting_blend = None
+            if self.blender and source not in ('blend', 'context') and len(lineup) > 1:
+                # The blend is being made in the background; pick it up on a later poll
+                self._awaiting_blend = self._blend_weights(track)
+
+            # The queue has moved on; resolve the next tracks while this one plays
+            if self.prefetcher:
+                self.prefetcher.request_refresh()
+
+            if preset is None:
+                logger.info(f"No EQ preset configured for {artist}")
+            self.requested_preset = preset
+            return preset
+
+        # A blend made in the background replaces the primary artist's preset
+        if self._awaiting_blend:
+            blended = self.blender.lookup(self._awaiting_blend)
+            if blended:
+                self._awaiting_blend = None
+                if blended != self.requested_preset:
+                    logger.info(f"Using blended EQ preset: {blended} for {track.get('track')}")
+                    self.events.emit('preset_resolved', artist=artist, track_id=track.get("id"),
+                                     preset=blended, source='blend', duration=0.0)
+                    self.requested_preset = blended
+                    return blended
+
+        # A background genre lookup may have found something better than the default
+        if self.genre_fallback and self.requested_preset == self.default_preset:
+            resolved = self.genre_fallback.lookup(artist)
+            if resolved and resolved != self.requested_preset:
+                logger.info(f"Using genre-based EQ preset: {resolved} for artist: {artist}")
+                self.events.emit('preset_resolved', artist=artist, track_id=track.get("id"),
+                                 preset=resolved, source='genre', duration=0.0)
+                self.requested_preset = resolved
+                return resolved
+
+        return None
+
+    def compare_active(self, preset):
+        """
+        Compare a preset with the active one. Comparing by sound may read preset
+        files, so async callers run this on an executor and pass the result to
+        apply_async.
+
+        Returns:
+            tuple: (whether the preset is active or sounds the same as the active one,
+                    their distance in RMS dB if they were compared by sound, else None)
+        """
+        active = self.current_preset
+        if preset == active:
+            return True, None
+        if self.similarity is None or active is None:
+            return False, None
+        try:
+            if not self.similarity.equivalent(preset, active):
+                return False, None
+            return True, self.similarity.distance(preset, active)
+        except Exception as e:
+            logger.error(f"Error comparing presets {preset} and {active}: {e}")
+            return False, None
+
+    def _should_skip(self, preset, force, comparison=None):
+        if force or not self.skip_identical:
+            return False
+        same, distance = comparison if comparison is not None else self.compare_active(preset)
+        if not same:
+            return False
+        if preset == self.current_preset:
+            logger.info(f"Preset {preset} already active, skipping application")
+        else:
+            logger.info(f"Preset {preset} sounds the same as the active {self.current_preset}, skipping application")
+            self.stats['applies_skipped_similar'] += 1
+            self.equivalent_preset = preset
+            self.events.emit('apply_skipped', preset=preset, active=self.current_preset,
+                             distance=round(distance, 3) if distance is not None else None)
+        self.stats['applies_skipped'] += 1
+        return True
+
+    def _record_attempt(self, preset, artist, force):
+        logger.info(f"Applying EQ preset: {preset}")
+        self.events.emit('apply_attempt', preset=preset, artist=artist, force=force)
+
+    def _record_result(self, preset, artist, success, elapsed):
+        self.stats['applies'] += 1
+        self.stats['apply_time_total'] += elapsed
+        APPLY_SECONDS.observe(elapsed, result='success' if success else 'failure')
+        self.events.emit('apply_result', preset=preset, artist=artist, success=bool(success),
+                         duration=round(elapsed, 6))
+        if success:
+            logger.info(f"Successfully applied EQ preset: {preset} for artist: {artist}")
+            self.current_preset = preset
+            self.equivalent_preset = None
+            self._notify(self.on_preset, preset, artist)
+        else:
+            logger.error(f"Failed to apply EQ preset: {preset} for artist: {artist}")
+            self.stats['apply_failures'] += 1
+            self._notify(self.on_apply_failed, preset, artist)
+
+    def apply(self, preset, artist=None, force=False):
+        """
+        Apply a preset through the backend.
+
+        Args:
+            preset (str): Preset to apply
+            artist (str): Artist the preset is for (for logging and callbacks)
+            force (bool): Apply even if the preset is already active
+
+        Returns:
+            bool: True if the preset is active afterwards
+        """
+        with self._apply_lock:
+            if self._should_skip(preset, force):
+                return True
+            self._record_attempt(preset, artist, force)
+            preload_presets([preset])
+            start = self.clock()
+            try:
+                success = self.backend.apply(preset)
+            except Exception as e:
+                logger.error(f"Error applying EQ preset {preset}: {e}")
+                success = False
+            self._record_result(preset, artist, success, self.clock() - start)
+            return success
+
+    async def apply_async(self, preset, artist=None, force=False, comparison=None):
+        """
+        asyncio variant of apply, for backends that provide apply_async.
+
+        Args:
+            comparison (tuple): compare_active(preset), computed off the event loop;
+                                without it the comparison runs here and may read files
+        """
+        if self._should_skip(preset, force, comparison):
+            return True
+        self._record_attempt(preset, artist, force)
+        start = self.clock()
+        try:
+            success = await self.backend.apply_async(preset)
+        except Exception as e:
+            logger.error(f"Error applying EQ preset {preset}: {type(e).__name__}: {e}")
+            success = False
+        self._record_result(preset, artist, success, self.clock() - start)
+        return success
+
+    def record_poll(self, elapsed, error=False):
+        """Account for one poll of the track source."""
+        self.stats['polls'] += 1
+        self.stats['poll_time_total'] += elapsed
+        self.stats['poll_time_max'] = max(self.stats['poll_time_max'], elapsed)
+        POLL_SECONDS.observe(elapsed)
+        if error:
+            self.stats['poll_errors'] += 1
+
+    def poll_once(self):
+        """
+        Poll the source once, applying a new preset if needed.
+
+        Returns:
+            dict: The polled track, or None if nothing is playing or polling failed
+        """
+        start = self.clock()
+        try:
+            track = self.source.get_track()
+        except Exception as e:
+            self.record_poll(self.clock() - start, error=True)
+            logger.error(f"Error polling track source: {e}")
+            self._notify(self.on_error, e)
+            return None
+        self.record_poll(self.clock() - start)
+
+        preset = self.observe(track)
+        if preset:
+            self.apply(preset, track.get("artist"))
+        return track
+
+    def wake(self):
+        """Cut the current wait short and poll again now."""
+        reset_idle = getattr(self.scheduler, 'reset_idle', None)
+        if reset_idle:
+            reset_idle()
+        self._wake.set()
+
+    def on_genre_resolved(self, artist, preset):
+        """GenreFallbackResolver callback: re-poll if the resolved artist is playing."""
+        if artist == self.last_artist:
+            self.wake()
+
+    def run(self, duration=None):
+        """
+        Poll the source until stop() is called (or for duration seconds).
+        Blocks; run it on a dedicated thread in GUI applications.
+        """
+        self._running = True
+        deadline = self.clock() + duration if duration is not None else None
+        while self._running:
+            track = self.poll_once()
+            delay = self.scheduler.next_delay(track)
+            if deadline is not None:
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    break
+                delay = min(delay, remaining)
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def stop(self):
+        """Stop a running run() loop."""
+        self._running = False
+        self._wake.set()
@@ -1,27 +1,33 @@
-import subprocess
 import os
 import json
 import time
+import asyncio
 from services.logger import get_logger, log_exceptions
+from services.metrics import APPLY_METHODS, record_cache_lookup
+from services.commands import run_command, run_command_async, start_command
 
 # Set up logger
 logger = get_logger(__name__)
 
 # Path where EasyEffects stores its presets
 EASYEFFECTS_PRESETS_PATH = os.path.expanduser("~/.config/easyeffects/output/")
+SYSTEM_PRESETS_PATH = "/usr/share/easyeffects/output"
 
 # Track preset changes for UI refresh logic
 _last_preset_change = 0
 _last_applied_preset = None
 _forced_ui_refresh_interval = 30  # seconds between forced UI refreshes
 
+# Parsed preset files keyed by preset name: (path, mtime, data)
+_preset_data_cache = {}
+
 @log_exceptions
 def get_available_presets():
     """
     Get a list of available EasyEffects presets.
     """
     # First check system-wide presets
-    system_presets_path = "/usr/share/easyeffects/output"
+    system_presets_path = SYSTEM_PRESETS_PATH
     
     # Start with user presets
     if not os.path.exists(EASYEFFECTS_PRESETS_PATH):
@@ -80,23 +86,125 @@ def get_available_presets():
         logger.error(f"Error listing EasyEffects presets: {e}")
         return []
 
-@log_exceptions
-def apply_eq_preset(preset_name, force_ui_refresh=False):
+def _find_preset_file(preset_name):
+    """Return the path of a preset's JSON file (user presets win), or None."""
+    for presets_dir in (EASYEFFECTS_PRESETS_PATH, SYSTEM_PRESETS_PATH):
+        path = os.path.join(presets_dir, f"{preset_name}.json")
+        if os.path.exists(path):
+            return path
+    return None
+
+def load_preset(preset_name):
     """
-    Apply an EasyEffects preset by name.
-    Uses multiple methods to ensure the preset is applied and the UI is updated.
+    Load and parse a preset file, reusing the cached copy while the file is unchanged.
     
     Args:
-        preset_name: Name of the preset to apply
-        force_ui_refresh: If True, will use more aggressive methods to ensure the UI updates
+        preset_name (str): Name of the preset to load
+        
+    Returns:
+        dict: Parsed preset data, or None if the preset does not exist or is invalid
     """
-    global _last_preset_change, _last_applied_preset, _forced_ui_refresh_interval
+    path = _find_preset_file(preset_name)
+    if not path:
+        _preset_data_cache.pop(preset_name, None)
+        return None
     
-    # Validate preset exists
-    available_presets = get_available_presets()
-    if preset_name not in available_presets:
-        logger.error(f"Preset '{preset_name}' not found. Available presets: {available_presets}")
-        return False
+    try:
+        mtime = os.path.getmtime(path)
+        cached = _preset_data_cache.get(preset_name)
+        hit = bool(cached and cached[0] == path and cached[1] == mtime)
+        record_cache_lookup('preset_data', hit)
+        if hit:
+            return cached[2]
+        
+        with open(path, 'r') as f:
+            data = json.load(f)
+        _preset_data_cache[preset_name] = (path, mtime, data)
+        return data
+    except Exception as e:
+        logger.error(f"Error loading preset '{preset_name}' from {path}: {e}")
+        _preset_data_cache.pop(preset_name, None)
+        return None
+
+def invalidate_preset_cache():
+    """Forget parsed presets, e.g. after the preset directories changed on disk."""
+    _preset_data_cache.clear()
+
+def preload_presets(preset_names):
+    """
+    Parse presets ahead of time so a later apply_eq_preset call can skip
+    validating against the preset directories and re-reading the file.
+    
+    Returns:
+        list: Names of the presets that were loaded successfully
+    """
+    loaded = []
+    for preset_name in preset_names:
+        if preset_name and load_preset(preset_name) is not None:
+            loaded.append(preset_name)
+    if loaded:
+        logger.debug(f"Preloaded presets: {', '.join(loaded)}")
+    return loaded
+
+# Commands shared by the synchronous and asyncio apply paths
+def _gsettings_set_cmd(preset_name):
+    return ["gsettings", "set", "com.github.wwmm.easyeffects", "last-used-output-preset", preset_name]
+
+def _dbus_load_cmd(preset_name):
+    return [
+        "dbus-send", "--session", "--type=method_call",
+        "--dest=com.github.wwmm.easyeffects",
+        "/com/github/wwmm/easyeffects",
+        "com.github.wwmm.easyeffects.load_preset", 
+        "string:" + preset_name
+    ]
+
+_RELOAD_SIGNAL_CMD = ["pkill", "-HUP", "easyeffects"]
+_DCONF_RELOAD_CMD = ["dconf", "write", "/com/github/wwmm/easyeffects/reload-presets", "true"]
+_EASYEFFECTS_RUNNING_CMD = ["pgrep", "-f", "easyeffects"]
+_EASYEFFECTS_SERVICE_CMD = ["easyeffects", "--gapplication-service"]
+
+_GSETTINGS_GET_PRESET_CMD = ["gsettings", "get", "com.github.wwmm.easyeffects", "last-used-output-preset"]
+
+def _parse_active_preset(result):
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip().strip("'") or None
+
+def get_active_preset():
+    """
+    Ask EasyEffects (through gsettings) which output preset is active.
+    
+    Returns:
+        str: The preset name, or None if EasyEffects/gsettings couldn't be reached
+    """
+    return _parse_active_preset(run_command(_GSETTINGS_GET_PRESET_CMD))
+
+async def get_active_preset_async():
+    """asyncio variant of get_active_preset."""
+    return _parse_active_preset(await run_command_async(_GSETTINGS_GET_PRESET_CMD))
+
+def _record_method(method, success):
+    """Count an attempt of one apply method (gsettings, dbus, file or config)."""
+    APPLY_METHODS.inc(method=method, result='success' if success else 'failure')
+
+def _prepare_apply(preset_name, force_ui_refresh):
+    """
+    Validate the preset and update change tracking.
+    
+    Returns:
+        bool: Whether to force a UI refresh, or None if the preset doesn't exist
+    """
+    global _last_preset_change, _last_applied_preset
+    
+    # Validate preset exists (preloaded presets are already known to exist)
+    cached = preset_name in _preset_data_cache
+    record_cache_lookup('preset_catalog', cached)
+    if not cached:
+        available_presets = get_available_presets()
+        if preset_name not in available_presets:
+            logger.error(f"Preset '{preset_name}' not found. Available presets: {available_presets}")
+            return None
     
     # Check if we need to force a UI refresh
     current_time = time.time()
@@ -114,17 +222,80 @@ def apply_eq_preset(preset_name, force_ui_refresh=False):
     # Update tracking variables
     _last_preset_change = current_time
     _last_applied_preset = preset_name
+    return force_refresh
+
+def _write_current_preset(preset_name):
+    """Copy a preset's content to EasyEffects' current_preset.json. Returns True on success."""
+    # Reuse the parsed preset if it was preloaded
+    preset_data = load_preset(preset_name)
+    
+    if preset_data is None:
+        logger.error(f"Failed to apply preset. Preset file not found for {preset_name}")
+        return False
+    
+    current_preset_path = os.path.expanduser("~/.config/easyeffects/current_preset.json")
+    
+    # Make sure the output directory exists
+    os.makedirs(os.path.dirname(current_preset_path), exist_ok=True)
+    
+    with open(current_preset_path, 'w') as dest_file:
+        json.dump(preset_data, dest_file, indent=2)
+    
+    logger.info(f"Applied preset {preset_name} by copying the preset file")
+    return True
+
+def _write_config_preset(preset_name):
+    """Ensure EasyEffects' config.json exists and names the preset as the last used one."""
+    config_dir = os.path.expanduser("~/.config/easyeffects")
+    config_file = os.path.join(config_dir, "config.json")
+    
+    # Create minimal config data if needed
+    config_data = {
+        "spectrum": {"show": "true"},
+        "last-used-input-preset": "default",
+        "last-used-output-preset": preset_name,
+        "use-dark-theme": "true"
+    }
+    
+    # If config exists, update only the necessary part
+    if os.path.exists(config_file):
+        try:
+            with open(config_file, 'r') as f:
+                existing_config = json.load(f)
+            
+            # Update only the preset setting
+            existing_config["last-used-output-preset"] = preset_name
+            config_data = existing_config
+        except Exception as e:
+            logger.warning(f"Error reading existing config.json: {e}, will create new one")
+    
+    # Write the config file
+    os.makedirs(config_dir, exist_ok=True)
+    with open(config_file, 'w') as f:
+        json.dump(config_data, f, indent=2)
+    
+    logger.debug(f"Updated config.json with preset: {preset_name}")
+
+@log_exceptions
+def apply_eq_preset(preset_name, force_ui_refresh=False):
+    """
+    Apply an EasyEffects preset by name.
+    Uses multiple methods to ensure the preset is applied and the UI is updated.
+    
+    Args:
+        preset_name: Name of the preset to apply
+        force_ui_refresh: If True, will use more aggressive methods to ensure the UI updates
+    """
+    force_refresh = _prepare_apply(preset_name, force_ui_refresh)
+    if force_refresh is None:
+        return False
     
     try:
         # Method 1: Use gsettings to apply the preset (preferred method)
         logger.debug("Trying gsettings method")
-        cmd = [
-            "gsettings", "set", "com.github.wwmm.easyeffects", "last-used-output-preset", 
-            preset_name
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = run_command(_gsettings_set_cmd(preset_name))
         success = result.returncode == 0
+        _record_method('gsettings', success)
         
         if success:
             logger.info(f"Successfully applied EasyEffects preset: {preset_name} using gsettings")
@@ -138,14 +309,8 @@ def apply_eq_preset(preset_name, force_ui_refresh=False):
         # Method 2: Try using dbus-send as an alternative approach
         try:
             logger.debug("Trying dbus-send method")
-            dbus_cmd = [
-                "dbus-send", "--session", "--type=method_call",
-                "--dest=com.github.wwmm.easyeffects",
-                "/com/github/wwmm/easyeffects",
-                "com.github.wwmm.easyeffects.load_preset", 
-                "string:" + preset_name
-            ]
-            dbus_result = subprocess.run(dbus_cmd, capture_output=True, text=True)
+            dbus_result = run_command(_dbus_load_cmd(preset_name))
+            _record_method('dbus', dbus_result.returncode == 0)
             
             if dbus_result.returncode == 0:
                 logger.info(f"Applied preset {preset_name} using dbus-send")
@@ -158,128 +323,147 @@ def apply_eq_preset(preset_name, force_ui_refresh=False):
                 logger.warning(f"dbus-send method failed: {dbus_result.stderr}")
         except Exception as e:
             logger.error(f"Error with dbus-send method: {e}")
+            _record_method('dbus', False)
         
         # Method 3: Try by copying the preset file to the current preset location
         try:
             logger.debug("Trying file copy method")
-            # Find the preset file path
-            user_preset_path = os.path.join(EASYEFFECTS_PRESETS_PATH, f"{preset_name}.json")
-            system_preset_path = os.path.join("/usr/share/easyeffects/output", f"{preset_name}.json")
-            
-            src_preset_path = None
-            if os.path.exists(user_preset_path):
-                src_preset_path = user_preset_path
-            elif os.path.exists(system_preset_path):
-                src_preset_path = system_preset_path
-            
-            if src_preset_path:
-                current_preset_path = os.path.expanduser("~/.config/easyeffects/current_preset.json")
-                
-                # Make sure the output directory exists
-                os.makedirs(os.path.dirname(current_preset_path), exist_ok=True)
-                
-                # Copy the preset file content
-                with open(src_preset_path, 'r') as src_file:
-                    preset_data = json.load(src_file)
-                
-                with open(current_preset_path, 'w') as dest_file:
-                    json.dump(preset_data, dest_file, indent=2)
-                
-                logger.info(f"Applied preset {preset_name} by copying the preset file")
-                
+            copied = _write_current_preset(preset_name)
+            _record_method('file', copied)
+            if copied:
                 # Send a refresh signal to EasyEffects
-                refresh_cmd = ["pkill", "-HUP", "easyeffects"]
-                subprocess.run(refresh_cmd, capture_output=True, text=True)
+                run_command(_RELOAD_SIGNAL_CMD)
                 
                 # Also try to trigger a reload via dconf
-                reload_cmd = ["dconf", "write", "/com/github/wwmm/easyeffects/reload-presets", "true"]
-                subprocess.run(reload_cmd, capture_output=True, text=True)
+                run_command(_DCONF_RELOAD_CMD)
                 
                 success = True
                 
                 # If UI refresh not forced, we're done
                 if not force_refresh:
                     return True
-            else:
-                logger.error(f"Failed to apply preset. Preset file not found for {preset_name}")
         except Exception as e:
             logger.error(f"Error applying preset by file copy: {e}")
+            _record_method('file', False)
         
         # Method 4 (Aggressive): If force_refresh is enabled or previous methods failed,
         # try a more aggressive approach - ensure config.json exists with the right preset
         if force_refresh or not success:
             try:
                 logger.debug("Using aggressive method to ensure UI refresh")
-                
-                # Create or update config.json
-                config_dir = os.path.expanduser("~/.config/easyeffects")
-                config_file = os.path.join(config_dir, "config.json")
-                
-                # Create minimal config data if needed
-                config_data = {
-                    "spectrum": {"show": "true"},
-                    "last-used-input-preset": "default",
-                    "last-used-output-preset": preset_name,
-                    "use-dark-theme": "true"
-                }
-                
-                # If config exists, update only the necessary part
-                if os.path.exists(config_file):
-                    try:
-                        with open(config_file, 'r') as f:
-                            existing_config = json.load(f)
-                        
-                        # Update only the preset setting
-                        existing_config["last-used-output-preset"] = preset_name
-                        config_data = existing_config
-                    except Exception as e:
-                        logger.warning(f"Error reading existing config.json: {e}, will create new one")
-                
-                # Write the config file
-                with open(config_file, 'w') as f:
-                    json.dump(config_data, f, indent=2)
-                
-                logger.debug(f"Updated config.json with preset: {preset_name}")
+                _write_config_preset(preset_name)
                 
                 # Check if EasyEffects is running
-                ee_running = subprocess.run(
-                    ["pgrep", "-f", "easyeffects"], 
-                    capture_output=True, text=True
-                ).returncode == 0
+                ee_running = run_command(_EASYEFFECTS_RUNNING_CMD).returncode == 0
                 
                 if ee_running:
                     # Try sending a SIGHUP signal for config reload
-                    subprocess.run(
-                        ["pkill", "-HUP", "easyeffects"], 
-                        capture_output=True, text=True
-                    )
+                    run_command(_RELOAD_SIGNAL_CMD)
                     
                     logger.debug("Sent SIGHUP to EasyEffects for config reload")
                 else:
                     # Start EasyEffects if it's not running
                     logger.debug("EasyEffects not running, starting it")
-                    subprocess.Popen(
-                        ["easyeffects", "--gapplication-service"], 
-                        stdout=subprocess.DEVNULL, 
-                        stderr=subprocess.DEVNULL
-                    )
+                    start_command(_EASYEFFECTS_SERVICE_CMD)
                 
                 # Set via gsettings again after config update
-                subprocess.run(
-                    ["gsettings", "set", "com.github.wwmm.easyeffects", 
-                     "last-used-output-preset", preset_name],
-                    capture_output=True, text=True
-                )
+                run_command(_gsettings_set_cmd(preset_name))
                 
                 # One more attempt via dconf
-                subprocess.run(
-                    ["dconf", "write", "/com/github/wwmm/easyeffects/reload-presets", "true"],
-                    capture_output=True, text=True
-                )
+                run_command(_DCONF_RELOAD_CMD)
+                
+                _record_method('config', True)
+                return True
+            except Exception as e:
+                logger.error(f"Error with aggressive UI refresh method: {e}")
+                _record_method('config', False)
+        
+        return success
+    except Exception as e:
+        logger.error(f"Error applying preset '{preset_name}': {e}")
+        return False
+
+async def apply_eq_preset_async(preset_name, force_ui_refresh=False, command_timeout=None, executor=None):
+    """
+    asyncio variant of apply_eq_preset for the daemon's event loop.
+    Tries the same methods in the same order, but external commands run as
+    asyncio subprocesses and file work (the preset lookup, copying the preset
+    and rewriting config.json) runs on the executor, so a hung gsettings or
+    dbus-send or a slow disk can't stall the rest of the daemon.
+    
+    Args:
+        preset_name: Name of the preset to apply
+        force_ui_refresh: If True, will use more aggressive methods to ensure the UI updates
+        command_timeout: Seconds to wait for each external command (default: per command)
+        executor: concurrent.futures executor for the file work
+                  (defaults to the event loop's default executor)
+    """
+    loop = asyncio.get_running_loop()
+    
+    def in_executor(func, *args):
+        return loop.run_in_executor(executor, func, *args)
+    
+    force_refresh = await in_executor(_prepare_apply, preset_name, force_ui_refresh)
+    if force_refresh is None:
+        return False
+    
+    try:
+        # Method 1: gsettings
+        result = await run_command_async(_gsettings_set_cmd(preset_name), command_timeout)
+        success = result.returncode == 0
+        _record_method('gsettings', success)
+        if success:
+            logger.info(f"Successfully applied EasyEffects preset: {preset_name} using gsettings")
+            if not force_refresh:
+                return True
+        else:
+            logger.warning(f"gsettings method failed: {result.stderr}. Trying alternative methods.")
+        
+        # Method 2: dbus-send
+        result = await run_command_async(_dbus_load_cmd(preset_name), command_timeout)
+        _record_method('dbus', result.returncode == 0)
+        if result.returncode == 0:
+            logger.info(f"Applied preset {preset_name} using dbus-send")
+            success = True
+            if not force_refresh:
+                return True
+        else:
+            logger.warning(f"dbus-send method failed: {result.stderr}")
+        
+        # Method 3: copy the preset file and ask EasyEffects to reload
+        try:
+            copied = await in_executor(_write_current_preset, preset_name)
+            _record_method('file', copied)
+            if copied:
+                await run_command_async(_RELOAD_SIGNAL_CMD, command_timeout)
+                await run_command_async(_DCONF_RELOAD_CMD, command_timeout)
+                success = True
+                if not force_refresh:
+                    return True
+        except Exception as e:
+            logger.error(f"Error applying preset by file copy: {e}")
+            _record_method('file', False)
+        
+        # Method 4 (Aggressive): rewrite config.json and make EasyEffects pick it up
+        if force_refresh or not success:
+            try:
+                await in_executor(_write_config_preset, preset_name)
+                
+                result = await run_command_async(_EASYEFFECTS_RUNNING_CMD, command_timeout)
+                if result.returncode == 0:
+                    await run_command_async(_RELOAD_SIGNAL_CMD, command_timeout)
+                    logger.debug("Sent SIGHUP to EasyEffects for config reload")
+                else:
+                    logger.debug("EasyEffects not running, starting it")
+                    await in_executor(start_command, _EASYEFFECTS_SERVICE_CMD)
                 
+                await run_command_async(_gsettings_set_cmd(preset_name), command_timeout)
+                await run_command_async(_DCONF_RELOAD_CMD, command_timeout)
+                _record_method('config', True)
                 return True
             except Exception as e:
                 logger.error(f"Error with aggressive UI refresh method: {e}")
+                _record_method('config', False)
         
         return success
     except Exception as e:
@@ -296,38 +480,23 @@ def force_ui_refresh():
     
     try:
         # Check if EasyEffects is running
-        ee_running = subprocess.run(
-            ["pgrep", "-f", "easyeffects"], 
-            capture_output=True, text=True
-        ).returncode == 0
+        ee_running = run_command(["pgrep", "-f", "easyeffects"]).returncode == 0
         
         if ee_running:
             # First try a gentle HUP signal
-            subprocess.run(
-                ["pkill", "-HUP", "easyeffects"], 
-                capture_output=True, text=True
-            )
+            run_command(["pkill", "-HUP", "easyeffects"])
             logger.debug("Sent SIGHUP to EasyEffects")
             
             # Also try dconf reload
-            subprocess.run(
-                ["dconf", "write", "/com/github/wwmm/easyeffects/reload-presets", "true"],
-                capture_output=True, text=True
-            )
+            run_command(["dconf", "write", "/com/github/wwmm/easyeffects/reload-presets", "true"])
             
             # If the UI is open (not just the service), we need a more specific approach
-            ui_running = subprocess.run(
-                ["pgrep", "-f", "easyeffects$"], 
-                capture_output=True, text=True
-            ).returncode == 0
+            ui_running = run_command(["pgrep", "-f", "easyeffects$"]).returncode == 0
             
             if ui_running:
                 logger.info("EasyEffects UI is running, sending SIGUSR1")
                 # SIGUSR1 might trigger a reload without killing the app
-                subprocess.run(
-                    ["pkill", "-USR1", "easyeffects$"], 
-                    capture_output=True, text=True
-                )
+                run_command(["pkill", "-USR1", "easyeffects$"])
             
             return True
         else:
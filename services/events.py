@@ -0,0 +1,129 @@
+"""
+Structured event stream for Adaptive EQ
+
+Daemon activity is recorded as compact JSON lines, one typed event per line:
+
+    {"ts":1718000000.123,"event":"apply_result","preset":"rock","success":true,"duration":0.084}
+
+Event types:
+- track_detected: playback moved to a new track
+- preset_resolved: a preset was chosen for a new artist (with where it came from)
+- apply_attempt: a preset application started
+- apply_result: a preset application finished (success, duration)
+- apply_skipped: a preset wasn't applied because it sounds the same as the active one (distance)
+- api_error: a Spotify Web API request failed
+- startup: the preset for the track playing at startup became active (time_to_eq)
+
+Lines go through a buffered writer that is flushed every few seconds, so
+recording an event never costs a disk write on the poll path. Use
+analyze_events.py to summarise event files.
+
+Set ADAPTIVE_EQ_EVENTS to another file path to move the stream, or to "off"
+to disable it.
+"""
+
+import os
+import json
+import time
+import atexit
+import threading
+from services.logger import get_logger
+
+# Set up logger
+logger = get_logger(__name__)
+
+DEFAULT_EVENTS_PATH = os.path.expanduser('~/.cache/adaptive-eq/events.jsonl')
+
+# The event file is moved to events.jsonl.1 when it grows past this size
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+class EventLog:
+    """Appends events as JSON lines through a buffered file."""
+
+    def __init__(self, path=DEFAULT_EVENTS_PATH, buffer_size=64 * 1024, flush_interval=5,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            path (str): Event file, or None to discard events
+            buffer_size (int): Bytes buffered in memory between writes
+            flush_interval (float): Maximum seconds an event stays in the buffer
+                                    (checked whenever an event is recorded)
+            max_bytes (int): Size at which the file is rotated
+        """
+        self.path = path
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self._file = None
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, 'a', buffering=self.buffer_size)
+
+    def emit(self, event, **fields):
+        """Record an event. Never raises; a broken event file disables the stream."""
+        if self.path is None:
+            return
+
+        record = {'ts': round(time.time(), 3), 'event': event}
+        record.update(fields)
+        line = json.dumps(record, separators=(',', ':'), default=str) + '\n'
+
+        with self._lock:
+            try:
+                if self._file is None:
+                    self._open()
+                self._file.write(line)
+                if time.monotonic() - self._last_flush >= self.flush_interval:
+                    self._flush_locked()
+            except OSError as e:
+                logger.error(f"Error writing event stream to {self.path}, disabling it: {e}")
+                self.path = None
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if self._file is None:
+            return
+        self._file.flush()
+        if self._file.tell() >= self.max_bytes:
+            self._file.close()
+            self._file = None
+            os.replace(self.path, f"{self.path}.1")
+
+    def flush(self):
+        """Write buffered events to disk."""
+        with self._lock:
+            try:
+                self._flush_locked()
+            except OSError as e:
+                logger.error(f"Error flushing event stream: {e}")
+
+    def close(self):
+        """Flush and close the event file."""
+        self.flush()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+# Global event log instance
+_event_log = None
+
+def get_event_log():
+    """Get the shared event log, configured from ADAPTIVE_EQ_EVENTS."""
+    global _event_log
+    if _event_log is None:
+        setting = os.environ.get('ADAPTIVE_EQ_EVENTS', '')
+        if setting.lower() in ('off', '0', 'false', 'no'):
+            path = None
+        else:
+            path = os.path.expanduser(setting) if setting else DEFAULT_EVENTS_PATH
+        _event_log = EventLog(path)
+        atexit.register(_event_log.close)
+    return _event_log
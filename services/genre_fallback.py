@@ -0,0 +1,197 @@
+"""
+Non-blocking genre fallback for unmapped artists
+
+Artists that aren't in the profile map get the default preset straight away;
+their genres are looked up on a background worker and classified with
+recommend_preset. Once a better preset is known, the caller is notified so it
+can switch, and the mapping can optionally be persisted to the profile file.
+With a PresetBlender, artists whose genres match several installed presets
+get a blend of them (see services/blend.py); blends are kept in memory only,
+never persisted to the profile file.
+"""
+
+import os
+import json
+import time
+import queue
+import threading
+from services.spotify import get_artist_genres
+from services.eq_control import get_available_presets, preload_presets
+from services.genres import get_genre_cache, recommend_preset, count_genre_presets
+from services.blend import is_blend
+from services.logger import get_logger
+
+# Set up logger
+logger = get_logger(__name__)
+
+class GenreFallbackResolver:
+    """Resolves presets for unmapped artists from their genres on a worker thread."""
+
+    def __init__(self, on_resolved=None, profile_map=None, persist_path=None, retry_interval=60,
+                 enqueue=None, blender=None):
+        """
+        Args:
+            on_resolved: Callable(artist, preset) invoked from the worker thread when
+                         a genre-based preset is found for an artist
+            profile_map (dict): Artist → preset mapping to add persisted results to
+            persist_path (str): If set, resolved mappings are saved to this profile file
+            retry_interval (int): Seconds to wait before retrying an artist whose lookup failed
+            enqueue: Callable((artist, artist_id)) used instead of the worker thread's queue,
+                     for callers that run process() themselves (e.g. the asyncio daemon)
+            blender: Optional PresetBlender for artists whose genres match several presets
+        """
+        self.on_resolved = on_resolved
+        self.profile_map = profile_map
+        self.persist_path = persist_path
+        self.retry_interval = retry_interval
+        self.blender = blender
+
+        # Artist → resolved preset, or None when the artist has no usable genres
+        self._presets = {}
+        self._pending = set()
+        self._failed = {}  # Artist → time of the last failed lookup
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._enqueue = enqueue or self._queue.put
+        self._thread = None
+
+    def start(self):
+        """Start the background worker thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="genre-fallback")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background worker thread."""
+        self._queue.put(None)
+
+    def lookup(self, artist):
+        """Return the genre-based preset for an artist if it has been resolved, else None."""
+        with self._lock:
+            return self._presets.get(artist)
+
+    def submit(self, artist, artist_id=None):
+        """
+        Queue an unmapped artist for genre resolution without blocking.
+
+        Returns:
+            str: The preset if it is already known (from a previous lookup), else None
+        """
+        with self._lock:
+            if artist in self._presets:
+                return self._presets[artist]
+            if artist in self._pending:
+                return None
+            if time.time() - self._failed.get(artist, 0) < self.retry_interval:
+                return None
+            self._pending.add(artist)
+
+        self._enqueue((artist, artist_id))
+        return None
+
+    def resolve(self, artist, artist_id=None):
+        """
+        Resolve an artist's preset from its genres, using the genre cache.
+        Blocks on the Spotify API when the artist isn't cached.
+
+        Returns:
+            str: The recommended preset, or None if no installed preset fits
+            
+        Raises:
+            RuntimeError: If the genres couldn't be fetched; the artist can be retried later
+        """
+        cache = get_genre_cache()
+        genres = cache.get_by_id(artist_id) if artist_id else None
+        if genres is None:
+            genres = cache.get_by_name(artist)
+
+        if genres is None:
+            genres = get_artist_genres(artist, artist_id=artist_id)
+            if genres is None:
+                # Lookup failed (offline, rate limited...); don't cache the failure
+                raise RuntimeError("genre lookup failed")
+            cache.put(artist, genres, artist_id=artist_id)
+            cache.save()
+
+        if self.blender:
+            available = set(get_available_presets())
+            counts = {preset: count for preset, count in count_genre_presets(genres).items() if preset in available}
+            if counts:
+                preset = self.blender.blend(counts)
+                if preset:
+                    return preset
+
+        preset = recommend_preset(genres)
+        if preset and preset not in get_available_presets():
+            logger.debug(f"Recommended preset '{preset}' for {artist} is not installed")
+            preset = None
+        return preset
+
+    def _persist(self, artist, preset):
+        if is_blend(preset):
+            return  # Regenerated from the genre cache; a pruned blend must not stay mapped
+        if self.profile_map is not None:
+            self.profile_map[artist] = preset
+        if not self.persist_path:
+            return
+
+        try:
+            profiles = {}
+            if os.path.exists(self.persist_path):
+                with open(self.persist_path, 'r') as f:
+                    profiles = json.load(f)
+
+            # Never override a mapping the user made in the meantime
+            if artist in profiles:
+                return
+            profiles[artist] = preset
+
+            tmp_path = f"{self.persist_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(profiles, f, indent=2)
+            os.replace(tmp_path, self.persist_path)
+            logger.info(f"Saved genre-based mapping {artist} → {preset} to {self.persist_path}")
+        except Exception as e:
+            logger.error(f"Error saving genre-based mapping for {artist}: {e}")
+
+    def process(self, artist, artist_id=None):
+        """
+        Resolve a submitted artist, record the result and notify on_resolved.
+        Blocks on the Spotify API, so it must run off the main/event-loop thread.
+        """
+        try:
+            preset = self.resolve(artist, artist_id)
+        except Exception as e:
+            logger.warning(f"Error resolving genres for {artist}: {e}")
+            with self._lock:
+                self._pending.discard(artist)
+                self._failed[artist] = time.time()
+            return None
+
+        with self._lock:
+            self._pending.discard(artist)
+            self._failed.pop(artist, None)
+            self._presets[artist] = preset
+
+        if not preset:
+            logger.debug(f"No genre-based preset for {artist}, keeping default")
+            return None
+
+        logger.info(f"Resolved genre-based preset for {artist}: {preset}")
+        preload_presets([preset])
+        self._persist(artist, preset)
+        if self.on_resolved:
+            try:
+                self.on_resolved(artist, preset)
+            except Exception as e:
+                logger.error(f"Error in genre fallback callback for {artist}: {e}")
+        return preset
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            self.process(*item)
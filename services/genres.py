@@ -0,0 +1,206 @@
+"""
+Genre lookup and classification for Adaptive EQ
+
+Maps Spotify artist genres to EQ presets and keeps a persistent cache of
+artist genres so bulk lookups only hit the API for artists not seen before.
+"""
+
+import os
+import json
+import time
+import threading
+from services.events import get_event_log
+from services.metrics import SPOTIFY_REQUESTS, record_cache_lookup
+from services.logger import get_logger
+
+# Set up logger
+logger = get_logger(__name__)
+
+# Genre keyword → preset mapping used to recommend presets
+GENRE_PRESET_MAP = {
+    'rock': 'rock',
+    'alternative': 'alternative',
+    'metal': 'rock',
+    'hard rock': 'rock',
+    'hip hop': 'hiphop',
+    'rap': 'hiphop',
+    'trap': 'hiphop',
+    'pop': 'pop',
+    'dance': 'electronic',
+    'electronic': 'electronic',
+    'edm': 'electronic',
+    'house': 'electronic',
+    'techno': 'electronic',
+    'ambient': 'electronic',
+    'classical': 'classical',
+    'orchestra': 'orchestral',
+    'orchestral': 'orchestral',
+    'soundtrack': 'orchestral',
+    'folk': 'acoustic',
+    'acoustic': 'acoustic',
+    'jazz': 'jazz',
+    'blues': 'blues',
+    'soul': 'vocal',
+    'r&b': 'vocal',
+    'vocal': 'vocal',
+    'reggae': 'reggae'
+}
+
+# Maximum number of artist IDs accepted by the Spotify "several artists" endpoint
+ARTISTS_BATCH_SIZE = 50
+
+DEFAULT_GENRE_CACHE_PATH = os.path.expanduser("~/.cache/adaptive-eq/genre_cache.json")
+
+def count_genre_presets(genres):
+    """Count how many of an artist's genres match each preset (preset → count)."""
+    preset_counts = {}
+    for genre in genres or []:
+        genre_lower = genre.lower()
+
+        # Check for partial matches
+        for key, preset in GENRE_PRESET_MAP.items():
+            if key in genre_lower:
+                preset_counts[preset] = preset_counts.get(preset, 0) + 1
+    return preset_counts
+
+def recommend_preset(genres):
+    """Recommend an EQ preset based on artist genres."""
+    if not genres:
+        return None
+
+    # Count genre matches
+    preset_counts = count_genre_presets(genres)
+
+    # Return the most matched preset or None if no matches
+    if preset_counts:
+        return max(preset_counts.items(), key=lambda x: x[1])[0]
+
+    return None
+
+class GenreCache:
+    """Persistent artist → genres cache, indexed by Spotify artist ID and by name."""
+
+    def __init__(self, path=DEFAULT_GENRE_CACHE_PATH, ttl=30 * 24 * 3600):
+        """
+        Args:
+            path (str): JSON file the cache is persisted to
+            ttl (int): Seconds before a cached entry is considered stale
+        """
+        self.path = path
+        self.ttl = ttl
+        self._by_id = {}
+        self._by_name = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self._by_id = data.get('ids', {})
+            self._by_name = data.get('names', {})
+            logger.debug(f"Loaded genre cache with {len(self._by_id)} artists from {self.path}")
+        except Exception as e:
+            logger.error(f"Error loading genre cache from {self.path}: {e}")
+
+    def _fresh(self, entry):
+        return entry is not None and time.time() - entry.get('fetched', 0) < self.ttl
+
+    def get_by_id(self, artist_id):
+        """Return cached genres for an artist ID, or None if unknown or stale."""
+        with self._lock:
+            entry = self._by_id.get(artist_id)
+        fresh = self._fresh(entry)
+        record_cache_lookup('genre', fresh)
+        return entry['genres'] if fresh else None
+
+    def get_by_name(self, artist_name):
+        """Return cached genres for an artist name, or None if unknown or stale."""
+        with self._lock:
+            entry = self._by_name.get(artist_name.lower())
+        fresh = self._fresh(entry)
+        record_cache_lookup('genre', fresh)
+        return entry['genres'] if fresh else None
+
+    def put(self, artist_name, genres, artist_id=None):
+        """Cache the genres of an artist. An empty list records a negative result."""
+        entry = {'name': artist_name, 'genres': list(genres or []), 'fetched': time.time()}
+        with self._lock:
+            if artist_id:
+                self._by_id[artist_id] = entry
+            if artist_name:
+                self._by_name[artist_name.lower()] = entry
+            self._dirty = True
+
+    def save(self):
+        """Write the cache to disk if it changed since the last save."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'ids': dict(self._by_id), 'names': dict(self._by_name)}
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving genre cache to {self.path}: {e}")
+
+_genre_cache = None
+_genre_cache_lock = threading.Lock()
+
+def get_genre_cache():
+    """Return the shared genre cache, loading it from disk on first use."""
+    global _genre_cache
+    with _genre_cache_lock:
+        if _genre_cache is None:
+            _genre_cache = GenreCache()
+        return _genre_cache
+
+def fetch_artist_genres(client, artists):
+    """
+    Get genres for many artists, using the cache and the batched artists endpoint.
+
+    Args:
+        client: Authenticated spotipy client
+        artists (dict): Artist ID → artist name
+
+    Returns:
+        dict: Artist ID → list of genres (empty for artists without genres)
+    """
+    cache = get_genre_cache()
+    genres = {}
+    missing = []
+    for artist_id in artists:
+        cached = cache.get_by_id(artist_id)
+        if cached is None:
+            missing.append(artist_id)
+        else:
+            genres[artist_id] = cached
+
+    for i in range(0, len(missing), ARTISTS_BATCH_SIZE):
+        batch = missing[i:i + ARTISTS_BATCH_SIZE]
+        try:
+            results = client.artists(batch)
+            SPOTIFY_REQUESTS.inc(endpoint='artists', status=200)
+            for artist in results.get('artists') or []:
+                if not artist:
+                    continue
+                genres[artist['id']] = artist.get('genres', [])
+                cache.put(artist['name'], genres[artist['id']], artist_id=artist['id'])
+        except Exception as e:
+            logger.error(f"Error getting genres for {len(batch)} artists: {e}")
+            get_event_log().emit('api_error', endpoint='artists', status=getattr(e, 'http_status', None),
+                                 error=f"{type(e).__name__}: {e}")
+            SPOTIFY_REQUESTS.inc(endpoint='artists', status=getattr(e, 'http_status', None) or 'error')
+
+    if missing:
+        logger.debug(f"Fetched genres for {len(missing)} artists ({len(artists) - len(missing)} cached)")
+        cache.save()
+
+    return genres
@@ -0,0 +1,312 @@
+"""
+Local IPC between the Adaptive EQ daemon and its clients
+
+The daemon owns Spotify polling, caches and the apply backend, and serves a
+newline-delimited JSON protocol on a Unix socket. The tray and helper CLIs
+are thin clients.
+
+Requests are single JSON objects, one per line:
+    {"cmd": "status"}
+    {"cmd": "set_preset", "preset": "rock"}
+    {"cmd": "set_mode", "adaptive": false}
+    {"cmd": "subscribe"}
+Responses are {"ok": true, "result": ...} or {"ok": false, "error": "..."}.
+After "subscribe", the connection receives events such as
+{"event": "track", ...}, {"event": "preset", ...} and {"event": "mode", ...},
+starting with a {"event": "status", ...} snapshot.
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import socket
+import select
+import asyncio
+import subprocess
+from services.logger import get_logger
+
+# Set up logger
+logger = get_logger(__name__)
+
+# Stop sending events to a subscriber that has this much unread data queued
+MAX_SUBSCRIBER_BACKLOG = 1024 * 1024
+
+def default_socket_path():
+    """Path of the daemon socket: $XDG_RUNTIME_DIR/adaptive-eq.sock, else under ~/.cache."""
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, 'adaptive-eq.sock')
+    return os.path.expanduser('~/.cache/adaptive-eq/adaptive-eq.sock')
+
+class IPCError(Exception):
+    """Raised when the daemon can't be reached or rejects a request."""
+
+class IPCServer:
+    """asyncio Unix-socket server dispatching requests to daemon handlers."""
+
+    def __init__(self, handlers, path=None, snapshot=None):
+        """
+        Args:
+            handlers (dict): Command name → callable(request dict) returning a JSON-able
+                             result (may be a coroutine function)
+            path (str): Socket path, defaults to default_socket_path()
+            snapshot: Callable returning the status dict sent to new subscribers
+        """
+        self.handlers = handlers
+        self.path = path or default_socket_path()
+        self.snapshot = snapshot
+        self._server = None
+        self._lock_file = None
+        self._subscribers = set()
+        self._connections = {}  # Handler task → writer
+
+    async def start(self):
+        """
+        Bind the socket. Only one daemon may own it; a stale socket left by a
+        crashed daemon is replaced.
+
+        Raises:
+            IPCError: If another daemon is already serving the socket
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        # The lock closes the race between two daemons starting at the same time
+        self._lock_file = open(f"{self.path}.lock", 'w')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock_file.close()
+            self._lock_file = None
+            raise IPCError(f"Another Adaptive EQ daemon is already running ({self.path})")
+
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        self._server = await asyncio.start_unix_server(self._handle_client, path=self.path)
+        os.chmod(self.path, 0o600)
+        logger.info(f"IPC server listening on {self.path}")
+
+    async def close(self):
+        """Stop serving and remove the socket."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        # Closing the transports ends the handlers' reads; let them finish cleanly
+        for writer in self._connections.values():
+            writer.close()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        self._subscribers.clear()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def broadcast(self, event, **data):
+        """Send an event to every subscriber."""
+        if not self._subscribers:
+            return
+        line = (json.dumps(dict(data, event=event)) + '\n').encode()
+        for writer in list(self._subscribers):
+            transport = writer.transport
+            if transport.is_closing() or transport.get_write_buffer_size() > MAX_SUBSCRIBER_BACKLOG:
+                logger.warning("Dropping IPC subscriber that stopped reading events")
+                self._subscribers.discard(writer)
+                writer.close()
+                continue
+            writer.write(line)
+
+    @staticmethod
+    def _send(writer, message):
+        writer.write((json.dumps(message) + '\n').encode())
+
+    async def _handle_client(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                try:
+                    request = json.loads(line)
+                    cmd = request['cmd']
+                except (ValueError, KeyError, TypeError):
+                    self._send(writer, {'ok': False, 'error': 'invalid request'})
+                    continue
+
+                if cmd == 'subscribe':
+                    self._send(writer, {'ok': True, 'result': None})
+                    if self.snapshot:
+                        self._send(writer, dict(self.snapshot(), event='status'))
+                    self._subscribers.add(writer)
+                    continue
+
+                handler = self.handlers.get(cmd)
+                if handler is None:
+                    self._send(writer, {'ok': False, 'error': f"unknown command: {cmd}"})
+                    continue
+
+                try:
+                    result = handler(request)
+                    if asyncio.iscoroutine(result):
+                        result = await result
+                    self._send(writer, {'ok': True, 'result': result})
+                except Exception as e:
+                    logger.error(f"Error handling IPC command {cmd}: {e}")
+                    self._send(writer, {'ok': False, 'error': str(e)})
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._subscribers.discard(writer)
+            self._connections.pop(task, None)
+            writer.close()
+
+class IPCClient:
+    """Blocking client for the daemon socket, used by the tray and helper CLIs."""
+
+    def __init__(self, path=None, timeout=5):
+        """
+        Args:
+            path (str): Socket path, defaults to default_socket_path()
+            timeout (float): Seconds to wait for the daemon to answer
+        """
+        self.path = path or default_socket_path()
+        self.timeout = timeout
+
+    def _connect(self, timeout):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(self.path)
+        except OSError as e:
+            sock.close()
+            raise IPCError(f"Adaptive EQ daemon not reachable at {self.path}: {e}")
+        return sock
+
+    @staticmethod
+    def _read_message(stream):
+        line = stream.readline()
+        if not line:
+            raise IPCError("Connection to the Adaptive EQ daemon was closed")
+        return json.loads(line)
+
+    def request(self, cmd, timeout=None, **args):
+        """
+        Send one command and return its result.
+
+        Raises:
+            IPCError: If the daemon is unreachable or the command failed
+        """
+        sock = self._connect(timeout or self.timeout)
+        try:
+            sock.sendall((json.dumps(dict(args, cmd=cmd)) + '\n').encode())
+            with sock.makefile('r') as stream:
+                response = self._read_message(stream)
+        except socket.timeout:
+            raise IPCError(f"Adaptive EQ daemon did not answer '{cmd}' in time")
+        finally:
+            sock.close()
+
+        if not response.get('ok'):
+            raise IPCError(response.get('error', 'request failed'))
+        return response.get('result')
+
+    def events(self, idle_timeout=None):
+        """
+        Subscribe to daemon events. Yields event dicts as they arrive, or None
+        every idle_timeout seconds without events (so callers can check a deadline).
+
+        Raises:
+            IPCError: If the daemon is unreachable or the connection drops
+        """
+        sock = self._connect(self.timeout)
+        try:
+            sock.sendall(b'{"cmd": "subscribe"}\n')
+            # A file stream can't be read again after a socket timeout, so lines are
+            # split here and idle periods are waited out with select()
+            buffer = b''
+            acknowledged = False
+            while True:
+                if b'\n' not in buffer:
+                    wait = self.timeout if not acknowledged else idle_timeout
+                    readable, _, _ = select.select([sock], [], [], wait)
+                    if not readable:
+                        if not acknowledged:
+                            raise IPCError("Adaptive EQ daemon did not answer 'subscribe' in time")
+                        yield None
+                        continue
+                    chunk = sock.recv(65536)
+                    if not chunk:
+                        raise IPCError("Connection to the Adaptive EQ daemon was closed")
+                    buffer += chunk
+                    continue
+                line, buffer = buffer.split(b'\n', 1)
+                message = json.loads(line)
+                if acknowledged:
+                    yield message
+                acknowledged = True
+        finally:
+            sock.close()
+
+def daemon_running(path=None):
+    """Return True if a daemon is answering on the socket."""
+    try:
+        IPCClient(path, timeout=1).request('ping')
+        return True
+    except IPCError:
+        return False
+
+def start_daemon(path=None, wait=10, profile_path=None):
+    """
+    Start the daemon in the background unless one is already running,
+    and wait for it to answer.
+
+    Args:
+        path (str): Socket path, defaults to default_socket_path()
+        wait (float): Seconds to wait for the daemon to answer
+        profile_path (str): Artist → preset mapping file for a daemon started here
+                            (a running daemon keeps its own)
+
+    Returns:
+        bool: True if a daemon is running afterwards
+    """
+    if daemon_running(path):
+        return True
+
+    app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    cmd = [sys.executable, os.path.join(app_dir, 'main.py')]
+    if path:
+        cmd += ['--socket', path]
+    if profile_path:
+        cmd += ['--config', os.path.abspath(profile_path)]
+
+    logger.info("Starting the Adaptive EQ daemon")
+    try:
+        subprocess.Popen(
+            cmd, cwd=app_dir, start_new_session=True,
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+    except OSError as e:
+        logger.error(f"Could not start the Adaptive EQ daemon: {e}")
+        return False
+
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        if daemon_running(path):
+            return True
+        time.sleep(0.1)
+
+    logger.error("Adaptive EQ daemon did not come up in time")
+    return False
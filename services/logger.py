@@ -5,9 +5,14 @@ This module provides consistent logging across all components of the application
 """
 
 import os
+import time
+import queue
+import atexit
 import logging
+import logging.handlers
+import threading
+import functools
 import sys
-from datetime import datetime
 
 # Set up log levels
 LOG_LEVEL_MAP = {
@@ -21,6 +26,16 @@ LOG_LEVEL_MAP = {
 # Default log directory
 DEFAULT_LOG_DIR = os.path.expanduser('~/.cache/adaptive-eq/logs')
 
+# A day's log file is rolled over to adaptive-eq_YYYY-MM-DD.log.1 ... when it reaches this size
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 3
+
+# Daily log files older than this are deleted
+DEFAULT_KEEP_DAYS = 14
+
+CONSOLE_FORMAT = '%(levelname)s - %(message)s'
+FILE_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
 def _ensure_log_directory(log_dir=None):
     """Ensure log directory exists"""
     if log_dir is None:
@@ -29,9 +44,117 @@ def _ensure_log_directory(log_dir=None):
     os.makedirs(log_dir, exist_ok=True)
     return log_dir
 
+class DailyRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Writes to adaptive-eq_YYYY-MM-DD.log, switching to a new file at midnight
+    and rolling a day's file over when it grows past max_bytes.
+    """
+    
+    def __init__(self, log_dir, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT,
+                 keep_days=DEFAULT_KEEP_DAYS):
+        self.log_dir = log_dir
+        self.keep_days = keep_days
+        self._next_day = 0
+        super().__init__(self._path_for_today(), maxBytes=max_bytes, backupCount=backup_count, delay=True)
+    
+    def _path_for_today(self):
+        now = time.localtime()
+        # Local midnight; mktime normalises the day overflow
+        self._next_day = time.mktime((now.tm_year, now.tm_mon, now.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+        return os.path.join(self.log_dir, f"adaptive-eq_{time.strftime('%Y-%m-%d', now)}.log")
+    
+    def shouldRollover(self, record):
+        if record.created >= self._next_day:
+            return True
+        return super().shouldRollover(record)
+    
+    def doRollover(self):
+        if time.time() < self._next_day:
+            super().doRollover()
+            return
+        
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        self.baseFilename = os.path.abspath(self._path_for_today())
+        self._remove_old_logs()
+    
+    def _remove_old_logs(self):
+        cutoff = time.time() - self.keep_days * 86400
+        try:
+            for name in os.listdir(self.log_dir):
+                path = os.path.join(self.log_dir, name)
+                if name.startswith('adaptive-eq_') and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+        except OSError:
+            pass
+
+class _DestinationQueueHandler(logging.handlers.QueueHandler):
+    """Queues records for the writer thread, tagged with where they should go."""
+    
+    def __init__(self, log_queue, to_console, to_file):
+        super().__init__(log_queue)
+        self.to_console = to_console
+        self.to_file = to_file
+    
+    def prepare(self, record):
+        record = super().prepare(record)
+        record.to_console = self.to_console
+        record.to_file = self.to_file
+        return record
+
+class _DestinationFilter(logging.Filter):
+    def __init__(self, attribute):
+        super().__init__()
+        self.attribute = attribute
+    
+    def filter(self, record):
+        return getattr(record, self.attribute, True)
+
+# Loggers only enqueue records; one listener thread owns every handler and does all I/O
+_log_queue = queue.Queue(-1)
+_listener = None
+_queue_handlers = {}
+_pipeline_lock = threading.Lock()
+
+def _stop_listener():
+    global _listener
+    with _pipeline_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+def _get_queue_handler(to_console, to_file, log_dir):
+    """Return the shared queue handler for a destination combination, starting the writer on first use."""
+    global _listener
+    
+    with _pipeline_lock:
+        if _listener is None:
+            console_handler = logging.StreamHandler(stream=sys.stdout)
+            console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+            console_handler.addFilter(_DestinationFilter('to_console'))
+            
+            file_handler = DailyRotatingFileHandler(_ensure_log_directory(log_dir))
+            file_handler.setFormatter(logging.Formatter(FILE_FORMAT))
+            file_handler.addFilter(_DestinationFilter('to_file'))
+            
+            _listener = logging.handlers.QueueListener(_log_queue, console_handler, file_handler)
+            _listener.start()
+            # Flush whatever is still queued when the process exits
+            atexit.register(_stop_listener)
+        
+        key = (to_console, to_file)
+        if key not in _queue_handlers:
+            _queue_handlers[key] = _DestinationQueueHandler(_log_queue, to_console, to_file)
+        return _queue_handlers[key]
+
 def setup_logger(name, log_level='info', log_to_console=True, log_to_file=True, log_dir=None):
     """
-    Set up a logger with console and/or file handlers.
+    Set up a logger with console and/or file output.
+    
+    Records are handed to a shared background writer, so logging never blocks
+    the caller on console or disk I/O. The log directory is fixed by the first
+    call that starts the writer.
     
     Args:
         name (str): Logger name, typically the module name (__name__)
@@ -55,25 +178,10 @@ def setup_logger(name, log_level='info', log_to_console=True, log_to_file=True,
     # Clear existing handlers
     logger.handlers = []
     
-    # Create formatters
-    console_formatter = logging.Formatter('%(levelname)s - %(message)s')
-    file_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    
-    # Add console handler
-    if log_to_console:
-        console_handler = logging.StreamHandler(stream=sys.stdout)
-        console_handler.setFormatter(console_formatter)
-        logger.addHandler(console_handler)
-    
-    # Add file handler
-    if log_to_file:
-        log_dir = _ensure_log_directory(log_dir)
-        today = datetime.now().strftime('%Y-%m-%d')
-        log_file = os.path.join(log_dir, f'adaptive-eq_{today}.log')
-        
-        file_handler = logging.FileHandler(log_file)
-        file_handler.setFormatter(file_formatter)
-        logger.addHandler(file_handler)
+    if log_to_console or log_to_file:
+        logger.addHandler(_get_queue_handler(log_to_console, log_to_file, log_dir))
+    else:
+        logger.addHandler(logging.NullHandler())
     
     return logger
 
@@ -119,8 +227,10 @@ def log_exceptions(func):
     Returns:
         Wrapped function that logs exceptions
     """
+    logger = get_logger(func.__module__)
+    
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        logger = get_logger(func.__module__)
         try:
             return func(*args, **kwargs)
         except Exception as e:
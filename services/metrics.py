@@ -0,0 +1,267 @@
+"""
+Prometheus-style metrics for Adaptive EQ
+
+Counters and histograms are plain in-process objects that cost a dict update
+per observation, so they are always collected. The daemon can optionally
+serve them in the Prometheus text exposition format on a localhost port or a
+Unix socket (main.py --metrics-port / --metrics-socket):
+
+    curl -s localhost:9877/metrics
+    curl -s --unix-socket $XDG_RUNTIME_DIR/adaptive-eq-metrics.sock http://localhost/metrics
+"""
+
+import os
+import asyncio
+import threading
+from services.logger import get_logger
+
+# Set up logger
+logger = get_logger(__name__)
+
+# Latency buckets in seconds, from a cached lookup to a hung external command
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    type = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(label, '')) for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self):
+        """Snapshot of label values → count."""
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        for key, value in sorted(self.values().items()):
+            yield f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # label values → [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(label, '')) for label in self.labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self):
+        with self._lock:
+            snapshot = {key: list(state) for key, state in self._values.items()}
+        for key, state in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(self.labels, key, ('le', _format_value(bound)))} {cumulative}"
+            yield f"{self.name}_bucket{_format_labels(self.labels, key, ('le', '+Inf'))} {state[-1]}"
+            yield f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(state[-2])}"
+            yield f"{self.name}_count{_format_labels(self.labels, key)} {state[-1]}"
+
+class Registry:
+    """Collection of metrics plus callbacks for values computed at scrape time."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """
+        Add a callable returning [(name, help, type, [(labels dict, value), ...]), ...],
+        evaluated on every scrape.
+        """
+        self._collectors.append(collector)
+
+    def render(self):
+        """Render every metric in the Prometheus text format."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+
+        for collector in self._collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                logger.error(f"Error collecting metrics from {getattr(collector, '__name__', collector)}: {e}")
+                continue
+            for name, help, metric_type, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+SPOTIFY_REQUESTS = REGISTRY.register(Counter(
+    'adaptive_eq_spotify_requests_total', 'Spotify Web API requests by endpoint and HTTP status',
+    ('endpoint', 'status')
+))
+APPLY_METHODS = REGISTRY.register(Counter(
+    'adaptive_eq_apply_method_attempts_total', 'Preset apply attempts by method and result',
+    ('method', 'result')
+))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    'adaptive_eq_cache_lookups_total', 'Cache lookups by cache and result (hit or miss)',
+    ('cache', 'result')
+))
+COMMANDS = REGISTRY.register(Counter(
+    'adaptive_eq_commands_total', 'External commands run, by executable and result (ok, failed, timeout, error, cancelled)',
+    ('command', 'result')
+))
+COMMAND_SECONDS = REGISTRY.register(Histogram(
+    'adaptive_eq_command_duration_seconds', 'Wall time of external commands', ('command',)
+))
+POLL_SECONDS = REGISTRY.register(Histogram(
+    'adaptive_eq_poll_duration_seconds', 'Time spent polling the track source'
+))
+APPLY_SECONDS = REGISTRY.register(Histogram(
+    'adaptive_eq_apply_duration_seconds', 'Time spent applying a preset', ('result',)
+))
+
+def record_cache_lookup(cache, hit):
+    """Count a lookup in one of the caches (genre, preset_catalog, preset_data, profile)."""
+    CACHE_LOOKUPS.inc(cache=cache, result='hit' if hit else 'miss')
+
+def _cache_hit_ratios():
+    lookups = {}
+    for (cache, result), count in CACHE_LOOKUPS.values().items():
+        hits, total = lookups.get(cache, (0, 0))
+        lookups[cache] = (hits + (count if result == 'hit' else 0), total + count)
+    return [(
+        'adaptive_eq_cache_hit_ratio', 'Fraction of cache lookups that were hits', 'gauge',
+        [({'cache': cache}, hits / total) for cache, (hits, total) in sorted(lookups.items()) if total]
+    )]
+
+def _process_metrics():
+    families = []
+    try:
+        with open('/proc/self/status') as f:
+            status = dict(line.split(':', 1) for line in f if ':' in line)
+        rss = int(status['VmRSS'].split()[0]) * 1024
+        threads = int(status['Threads'])
+        families.append(('process_resident_memory_bytes', 'Resident memory size in bytes', 'gauge', [({}, rss)]))
+        families.append(('process_threads', 'Number of OS threads', 'gauge', [({}, threads)]))
+    except (OSError, KeyError, ValueError):
+        families.append(('process_threads', 'Number of OS threads', 'gauge', [({}, threading.active_count())]))
+
+    try:
+        fds = len(os.listdir('/proc/self/fd'))
+        families.append(('process_open_fds', 'Number of open file descriptors', 'gauge', [({}, fds)]))
+    except OSError:
+        pass
+    return families
+
+REGISTRY.add_collector(_cache_hit_ratios)
+REGISTRY.add_collector(_process_metrics)
+
+class MetricsServer:
+    """Minimal HTTP server answering GET /metrics for Prometheus scrapers."""
+
+    def __init__(self, registry=REGISTRY, port=None, path=None, host='127.0.0.1'):
+        """
+        Args:
+            registry (Registry): Metrics to serve
+            port (int): TCP port to listen on (bound to host, localhost by default)
+            path (str): Unix socket to listen on instead of a port
+            host (str): Address to bind the TCP port to
+        """
+        self.registry = registry
+        self.port = port
+        self.path = path
+        self.host = host
+        self._server = None
+
+    async def start(self):
+        if self.path:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+            logger.info(f"Serving metrics on {self.path}")
+        else:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+            logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self.path:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            # Skip the headers
+            while True:
+                line = await asyncio.wait_for(reader.readline(), 5)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] in ('/metrics', '/'):
+                status, body = '200 OK', self.registry.render().encode()
+                content_type = 'text/plain; version=0.0.4; charset=utf-8'
+            else:
+                status, body, content_type = '404 Not Found', b'Not found\n', 'text/plain'
+
+            writer.write(
+                f"HTTP/1.0 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,105 @@
+"""
+Queue-aware preset prefetching for Adaptive EQ
+
+Reads the user's upcoming Spotify queue in the background, resolves the EQ
+preset for the next few tracks and preloads those presets, so the switch at
+a track boundary is a dictionary lookup instead of an API round-trip.
+"""
+
+import threading
+from services.spotify import get_queue
+from services.eq_control import preload_presets
+from services.logger import get_logger
+
+# Set up logger
+logger = get_logger(__name__)
+
+class QueuePrefetcher:
+    """Resolves presets for upcoming queue entries ahead of time."""
+
+    def __init__(self, resolve_preset, lookahead=3, interval=15):
+        """
+        Args:
+            resolve_preset: Callable taking a track info dict and returning a preset name
+            lookahead (int): Number of upcoming tracks to resolve
+            interval (int): Seconds between queue refreshes
+        """
+        self.resolve_preset = resolve_preset
+        self.lookahead = lookahead
+        self.interval = interval
+
+        self._presets = {}  # track ID → preset name
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the background prefetch thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="queue-prefetcher")
+        self._thread.daemon = True
+        self._thread.start()
+        logger.debug(f"Queue prefetcher started (lookahead: {self.lookahead}, interval: {self.interval}s)")
+
+    def stop(self):
+        """Stop the background prefetch thread."""
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def request_refresh(self):
+        """Ask the background thread to refresh the queue now (e.g. after a track change)."""
+        self._wake_event.set()
+
+    def lookup(self, track):
+        """
+        Return the prefetched preset for a track, or None if it was not prefetched.
+
+        Args:
+            track (dict): Track info dict as returned by get_current_track
+        """
+        track_id = track.get('id') if track else None
+        if not track_id:
+            return None
+        with self._lock:
+            return self._presets.get(track_id)
+
+    def refresh(self):
+        """
+        Read the queue once and resolve presets for the next tracks.
+
+        Returns:
+            dict: The prefetched track ID → preset table
+        """
+        upcoming = get_queue(limit=self.lookahead)
+
+        presets = {}
+        for track in upcoming:
+            if not track.get('id'):
+                continue
+            try:
+                presets[track['id']] = self.resolve_preset(track)
+            except Exception as e:
+                logger.error(f"Error resolving preset for queued track {track.get('track')}: {e}")
+
+        preload_presets(set(presets.values()))
+
+        with self._lock:
+            # Only the upcoming tracks are worth keeping; everything else has played
+            self._presets = presets
+
+        if presets:
+            logger.debug(f"Prefetched presets for {len(presets)} queued tracks")
+        return dict(presets)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error in queue prefetcher: {e}")
+
+            self._wake_event.wait(self.interval)
+            self._wake_event.clear()
@@ -0,0 +1,212 @@
+"""
+Frequency response and headroom analysis of EQ presets
+
+Computes the combined magnitude response of each preset's bell filters on a
+dense log-frequency grid, for a whole library at once: presets are stacked
+into (presets × bands) arrays (see services/preset_model.py) and evaluated in
+chunks with NumPy, so analyzing 10,000 presets takes about a second.
+
+Each bell band is modelled as the RBJ peaking biquad EasyEffects' IIR
+equalizer approximates. From the response this reports:
+
+- the peak boost (and where it is), including the equalizer's input gain
+- the output gain that keeps the peak at 0 dB, i.e. stops the preset clipping
+- neighbouring bands whose boosts or cuts overlap, so their gains stack up
+  beyond what either band says
+"""
+
+import os
+import json
+from services.preset_model import CompactPreset, find_equalizer, stack_presets, np
+from services.logger import get_logger
+
+# Set up logger
+logger = get_logger(__name__)
+
+SAMPLE_RATE = 48000
+
+# Analysis grid: 20 Hz to 20 kHz in 1/48 octave steps
+GRID_LOW = 20.0
+GRID_HIGH = 20000.0
+POINTS_PER_OCTAVE = 48
+
+# Presets evaluated per chunk (bounds memory at chunk × bands × grid points)
+CHUNK_SIZE = 128
+
+# Level above 0 dB (after the output gain) tolerated at the response peak before a preset counts as clipping
+CLIP_MARGIN = 0.0
+# Neighbouring bands overlap when each adds at least this much (dB) at the other's center
+OVERLAP_MIN_GAIN = 0.5
+
+def frequency_grid(low=GRID_LOW, high=GRID_HIGH, points_per_octave=POINTS_PER_OCTAVE):
+    """Log-spaced analysis frequencies in Hz"""
+    octaves = np.log2(high / low)
+    return low * 2 ** (np.arange(int(octaves * points_per_octave) + 1) / points_per_octave)
+
+def bell_gain_db(freqs, centers, gains, qs):
+    """
+    Gain in dB of analog bell filters (center frequency, gain, Q) at the given
+    frequencies; all arguments broadcast against each other.
+    """
+    x = np.asarray(freqs, dtype=float) / centers
+    a = 10 ** (np.asarray(gains, dtype=float) / 40)
+    real = (1 - x ** 2) ** 2
+    return 10 * np.log10((real + (x * a / qs) ** 2) / (real + (x / (a * qs)) ** 2))
+
+def bell_response_db(freqs, gains, qs, grid=None, sample_rate=SAMPLE_RATE):
+    """
+    Combined magnitude response of stacked bell filters.
+
+    Args:
+        freqs, gains, qs: Arrays of shape (presets, bands), as from stack_presets
+        grid: Frequencies to evaluate in Hz (default: frequency_grid())
+        sample_rate (int): Sample rate the filters run at
+
+    Returns:
+        numpy.ndarray: Response in dB, shape (presets, grid points)
+    """
+    grid = frequency_grid() if grid is None else np.asarray(grid, dtype=float)
+    # Bands at or above Nyquist can't be realised; keep them just below
+    w0 = 2 * np.pi * np.minimum(freqs, 0.49 * sample_rate) / sample_rate
+    a = 10 ** (gains / 40)
+    alpha = np.sin(w0) / (2 * qs)
+    cos_w0 = np.cos(w0)
+
+    # RBJ peaking EQ; b1 == a1, so |H|² = N(ω) / D(ω) with
+    # N(ω) = b0² + b1² + b2² + 2·b1·(b0 + b2)·cos ω + 2·b0·b2·cos 2ω
+    b0, b2 = 1 + alpha * a, 1 - alpha * a
+    a0, a2 = 1 + alpha / a, 1 - alpha / a
+    b1 = -2 * cos_w0
+
+    w = 2 * np.pi * grid / sample_rate
+    basis = np.stack([np.ones_like(w), np.cos(w), np.cos(2 * w)])
+
+    def power(c0, c2):
+        # Polynomial in (1, cos ω, cos 2ω) per band, evaluated on the whole grid as one matrix product
+        coefficients = np.stack([c0 ** 2 + b1 ** 2 + c2 ** 2, 2 * b1 * (c0 + c2), 2 * c0 * c2], axis=-1)
+        return coefficients @ basis
+
+    # Multiply the bands' power ratios and take one logarithm per grid point
+    # (the ratios stay within float range for any realistic preset)
+    return 10 * np.log10((power(b0, b2) / power(a0, a2)).prod(axis=1))
+
+def overlapping_bands(freqs, gains, qs, min_gain=OVERLAP_MIN_GAIN):
+    """
+    Neighbouring bands that push each other's level the same way, so their
+    gains stack up beyond what either band is set to.
+
+    Args:
+        freqs, gains, qs: Arrays of shape (presets, bands), bands sorted by frequency
+        min_gain (float): dB each band must add at the other's center frequency
+
+    Returns:
+        numpy.ndarray: Boolean mask of shape (presets, bands - 1); True where band i
+                       overlaps band i + 1
+    """
+    low, high = np.s_[:, :-1], np.s_[:, 1:]
+    # What the upper band adds at the lower band's center, and the other way round
+    up = bell_gain_db(freqs[low], freqs[high], gains[high], qs[high])
+    down = bell_gain_db(freqs[high], freqs[low], gains[low], qs[low])
+    same_direction = np.sign(gains[low]) == np.sign(gains[high])
+    return same_direction & (np.abs(up) >= min_gain) & (np.abs(down) >= min_gain)
+
+def analyze(models, grid=None, sample_rate=SAMPLE_RATE, chunk_size=CHUNK_SIZE, margin=CLIP_MARGIN):
+    """
+    Analyze compact presets in one batch.
+
+    Args:
+        models (list): CompactPreset objects
+        grid: Frequencies to evaluate (default: frequency_grid())
+        sample_rate (int): Sample rate the filters run at
+        chunk_size (int): Presets evaluated at once
+        margin (float): Peak level (dB) above which a preset is reported as clipping
+
+    Returns:
+        list: One dict per preset with 'name', 'peak_db' (boost at the peak, input
+              gain included), 'peak_hz', 'output_gain', 'suggested_output_gain',
+              'headroom_db' (negative when the preset clips), 'clips' and 'overlaps'
+              (pairs of overlapping band frequencies)
+    """
+    if not models:
+        return []
+    grid = frequency_grid() if grid is None else np.asarray(grid, dtype=float)
+    freqs, gains, qs = stack_presets(models)
+    input_gains = np.array([model.input_gain for model in models])
+    output_gains = np.array([model.output_gain for model in models])
+
+    peaks = np.empty(len(models))
+    peak_hz = np.empty(len(models))
+    for start in range(0, len(models), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        response = bell_response_db(freqs[chunk], gains[chunk], qs[chunk], grid, sample_rate)
+        index = response.argmax(axis=1)
+        peaks[chunk] = response[np.arange(len(index)), index]
+        peak_hz[chunk] = grid[index]
+    overlaps = overlapping_bands(freqs, gains, qs)
+
+    peaks += input_gains
+    # Only ever lower the output gain to make room, never raise it
+    suggested = np.floor(np.round(np.minimum(output_gains, -peaks) * 10, 6)) / 10
+    headroom = -(peaks + output_gains)
+
+    results = []
+    for row, model in enumerate(models):
+        pairs = np.flatnonzero(overlaps[row])
+        results.append({
+            'name': model.name,
+            'peak_db': round(float(peaks[row]), 2),
+            'peak_hz': round(float(peak_hz[row])),
+            'output_gain': model.output_gain,
+            'suggested_output_gain': round(float(suggested[row]), 1) + 0.0,  # No -0.0
+            'headroom_db': round(float(headroom[row]), 2),
+            'clips': bool(headroom[row] < -margin),
+            'overlaps': [(float(freqs[row, i]), float(freqs[row, i + 1])) for i in pairs],
+        })
+    return results
+
+def load_preset_files(paths):
+    """
+    Read preset files into compact presets, skipping files without an equalizer.
+
+    Args:
+        paths (list): Preset JSON files or directories of them
+
+    Returns:
+        tuple: (list of CompactPreset named after their files, dict of name → path)
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.json'))
+        else:
+            files.append(path)
+
+    models, sources = [], {}
+    for path in files:
+        name = os.path.splitext(os.path.basename(path))[0]
+        if name in sources:
+            continue  # Earlier directories win, like the preset search path
+        try:
+            with open(path, 'r') as f:
+                model = CompactPreset.from_data(json.load(f), name=name)
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            logger.warning(f"Skipping {path}: {e}")
+            continue
+        if model is not None:
+            models.append(model)
+            sources[name] = path
+    return models, sources
+
+def write_output_gain(path, output_gain):
+    """Set the output gain of a preset file's equalizer, replacing the file atomically"""
+    with open(path, 'r') as f:
+        data = json.load(f)
+    _, equalizer = find_equalizer(data)
+    if equalizer is None:
+        raise ValueError(f"{path} has no output equalizer")
+    equalizer['output-gain'] = output_gain
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, path)
@@ -0,0 +1,281 @@
+"""
+EQ preset compiler for Adaptive EQ
+
+Presets are defined as compact curves: a few (frequency, gain) control
+points. The compiler interpolates each curve onto an equalizer band layout
+(10, 16, 32... bands) linearly over log-frequency and emits EasyEffects
+preset JSON. With NumPy, a whole library is interpolated at once: curves
+sharing control-point frequencies are one matrix product against a
+(bands × control points) weight matrix. Without NumPy, the same weights are
+applied in plain Python.
+
+Files are only written when their content changes, through a temporary file
+and an atomic rename, so regenerating an unchanged library writes nothing
+and EasyEffects never sees a half-written preset or a needless reload.
+"""
+
+import os
+import re
+import json
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    # Optional: without NumPy curves are interpolated one band at a time
+    np = None
+from services.logger import get_logger
+
+# Set up logger
+logger = get_logger(__name__)
+
+# The classic 10-band layout: octave bands at their nominal frequencies
+NOMINAL_10_BANDS = [32, 64, 125, 250, 500, 1000, 2000, 4000, 8000, 16000]
+# Other band counts are spread evenly over log-frequency across the same range
+LOWEST_BAND = 32.0
+HIGHEST_BAND = 16000.0
+
+# Q of octave-spaced bands (EasyEffects' own 10-band default); narrower spacing gets a proportionally higher Q
+OCTAVE_Q = 1.504
+
+# Settings of every band; frequency, gain and q are filled in per band
+BAND_TEMPLATE = {"frequency": None, "gain": None, "mode": "RLC (BT)", "q": None, "slope": "x1", "solo": False,
+                 "type": "Bell"}
+
+LIMITER = {
+    "alr": False,
+    "alr-attack": 5.0,
+    "alr-knee": 0.0,
+    "alr-release": 50.0,
+    "attack": 5.0,
+    "dithering": "None",
+    "external-sidechain": False,
+    "gain-boost": True,
+    "input-gain": 0.0,
+    "lookahead": 5.0,
+    "mode": "Herm Thin",
+    "output-gain": 0.0,
+    "oversampling": "None",
+    "release": 5.0,
+    "sidechain-preamp": 0.0,
+    "stereo-link": 100.0,
+    "threshold": 0.0
+}
+
+def _spacing_q(octaves):
+    """Q of bands whose centers are the given number of octaves apart"""
+    ratio = 2 ** octaves
+    return math.sqrt(ratio) / (ratio - 1)
+
+def band_layout(count):
+    """
+    Band center frequencies and Q factors for an equalizer with `count` bands.
+
+    Returns:
+        tuple: (list of frequencies, list of Qs)
+    """
+    if count == len(NOMINAL_10_BANDS):
+        return list(NOMINAL_10_BANDS), [OCTAVE_Q] * count
+    if count < 2:
+        raise ValueError("an equalizer needs at least 2 bands")
+    octaves = math.log2(HIGHEST_BAND / LOWEST_BAND) / (count - 1)
+    freqs = [round(LOWEST_BAND * 2 ** (octaves * band), 1) for band in range(count)]
+    q = round(OCTAVE_Q * _spacing_q(octaves) / _spacing_q(1), 3)
+    return freqs, [q] * count
+
+def _interpolation_weights(points, bands):
+    """
+    For each band, the two control points around it and their weights, for
+    linear interpolation over log-frequency (held flat beyond the outer points).
+
+    Returns:
+        list: (lower point index, upper point index, upper weight) per band
+    """
+    x = [math.log2(freq) for freq in points]
+    weights = []
+    for band in bands:
+        target = math.log2(band)
+        if target <= x[0]:
+            weights.append((0, 0, 0.0))
+        elif target >= x[-1]:
+            weights.append((len(x) - 1, len(x) - 1, 0.0))
+        else:
+            upper = next(i for i, value in enumerate(x) if value >= target)
+            lower = upper - 1
+            weights.append((lower, upper, (target - x[lower]) / (x[upper] - x[lower])))
+    return weights
+
+def interpolation_matrix(points, bands):
+    """(bands × control points) matrix turning control-point gains into band gains (needs NumPy)"""
+    matrix = np.zeros((len(bands), len(points)))
+    for band, (lower, upper, weight) in enumerate(_interpolation_weights(points, bands)):
+        matrix[band, lower] += 1 - weight
+        matrix[band, upper] += weight
+    return matrix
+
+def _sorted_points(curve):
+    points = sorted((float(freq), float(gain)) for freq, gain in curve)
+    if not points:
+        raise ValueError("a curve needs at least one control point")
+    return tuple(freq for freq, _ in points), [gain for _, gain in points]
+
+def interpolate_curves(curves, bands):
+    """
+    Interpolate curves onto band frequencies.
+
+    Args:
+        curves (dict): Name → list of (frequency, gain) control points
+        bands (list): Band center frequencies
+
+    Returns:
+        dict: Name → list of band gains in dB (rounded to 0.01 dB)
+    """
+    # Curves sharing control-point frequencies share one set of weights
+    groups = {}
+    for name, curve in curves.items():
+        points, gains = _sorted_points(curve)
+        groups.setdefault(points, []).append((name, gains))
+
+    result = {}
+    for points, members in groups.items():
+        if np is not None:
+            matrix = np.array([gains for _, gains in members]) @ interpolation_matrix(points, bands).T
+            rows = np.round(matrix, 2).tolist()
+        else:
+            weights = _interpolation_weights(points, bands)
+            rows = [[round(gains[lower] * (1 - weight) + gains[upper] * weight, 2)
+                     for lower, upper, weight in weights] for _, gains in members]
+        for (name, _), row in zip(members, rows):
+            result[name] = [gain + 0.0 for gain in row]  # No -0.0 in the JSON
+    return result
+
+def build_preset(freqs, gains, qs, output_gain=0.0):
+    """
+    EasyEffects output preset JSON for one equalizer curve (both channels alike),
+    followed by the limiter.
+    """
+    def channel():
+        return {f"band{index}": dict(BAND_TEMPLATE, frequency=freq, gain=gain, q=q)
+                for index, (freq, gain, q) in enumerate(zip(freqs, gains, qs))}
+
+    return {
+        "output": {
+            "blocklist": [],
+            "equalizer": {
+                "input-gain": 0.0,
+                "output-gain": output_gain,
+                "mode": "IIR",
+                "num-bands": len(freqs),
+                "split-channels": False,
+                "right": channel(),
+                "left": channel()
+            },
+            "plugins_order": ["equalizer"],
+            "limiter": dict(LIMITER)
+        }
+    }
+
+# Stands in for a number when rendering a layout's JSON once (see preset_renderer)
+PLACEHOLDER = re.compile(r'"@(\w+)@"')
+
+def preset_renderer(freqs, qs):
+    """
+    Render function for presets with this band layout.
+
+    Every preset of a layout has the same JSON apart from its gains and output
+    gain, so the text is rendered once with placeholders and each preset only
+    fills in its numbers (the same text json.dumps(build_preset(...), indent=4)
+    gives, without running the pure-Python indenting encoder per preset).
+
+    Returns:
+        function: (gains, output gain) → preset JSON text
+    """
+    placeholders = [f"@{index}@" for index in range(len(freqs))]
+    parts = PLACEHOLDER.split(json.dumps(build_preset(freqs, placeholders, qs, "@output@"), indent=4))
+    literals, fields = parts[::2], parts[1::2]
+
+    def render(gains, output_gain=0.0):
+        values = {str(index): gain for index, gain in enumerate(gains)}
+        values['output'] = output_gain
+        pieces = [literals[0]]
+        for field, literal in zip(fields, literals[1:]):
+            pieces.append(repr(float(values[field])))  # json.dumps writes floats as repr
+            pieces.append(literal)
+        return "".join(pieces)
+
+    return render
+
+def headroom_gains(freqs, gains, qs):
+    """
+    Output gain per curve that keeps its response peak at 0 dB (see
+    services/preset_analysis.py); requires NumPy.
+
+    Args:
+        gains (dict): Name → band gains
+
+    Returns:
+        dict: Name → output gain
+    """
+    from services.preset_analysis import analyze
+    from services.preset_model import CompactPreset
+    results = analyze([CompactPreset(freqs, row, qs, name=name) for name, row in gains.items()])
+    return {result['name']: result['suggested_output_gain'] for result in results}
+
+def write_if_changed(path, content, force=False):
+    """
+    Write content to path unless the file already holds exactly that content
+    (or force is set). Replaces the file atomically.
+
+    Returns:
+        bool: True if the file was written
+    """
+    data = content.encode()
+    try:
+        # Only files of the same size need reading
+        if not force and os.path.getsize(path) == len(data):
+            with open(path, "rb") as f:
+                if f.read() == data:
+                    return False
+    except OSError:
+        pass  # Missing or unreadable; write it
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+def compile_presets(curves, output_dir, bands=10, compensate=False, force=False):
+    """
+    Compile curves into EasyEffects presets named after them.
+
+    Args:
+        curves (dict): Name → list of (frequency, gain) control points
+        output_dir (str): Directory to write the presets to
+        bands (int): Equalizer bands per preset
+        compensate (bool): Lower each preset's output gain so it can't clip (needs NumPy)
+        force (bool): Rewrite files even if they are unchanged
+
+    Returns:
+        dict: 'written' and 'unchanged' lists of preset paths
+    """
+    freqs, qs = band_layout(bands)
+    gains = interpolate_curves(curves, freqs)
+    output_gains = {}
+    if compensate:
+        if np is None:
+            logger.warning("NumPy not installed; presets are written without headroom compensation")
+        else:
+            output_gains = headroom_gains(freqs, gains, qs)
+
+    render = preset_renderer(freqs, qs)
+    os.makedirs(output_dir, exist_ok=True)
+    result = {'written': [], 'unchanged': []}
+    for name, row in gains.items():
+        content = render(row, output_gains.get(name, 0.0))
+        path = os.path.join(output_dir, f"{name}.json")
+        if write_if_changed(path, content, force):
+            result['written'].append(path)
+        else:
+            result['unchanged'].append(path)
+    return result
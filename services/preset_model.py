@@ -0,0 +1,193 @@
+"""
+Compact preset model for Adaptive EQ
+
+EasyEffects presets are deeply nested JSON: one dict per band and channel,
+with the equalizer stored under "equalizer" or "equalizer#0" depending on
+the EasyEffects version. For numeric work (blending, analysis, comparing
+presets) a preset is reduced to a CompactPreset: NumPy arrays of band
+frequencies, gains and Q factors plus the equalizer's input and output gain.
+
+Requires NumPy, which is optional; callers check `np is not None` (or
+catch the RuntimeError from CompactPreset) and fall back to whole presets.
+"""
+
+import copy
+
+try:
+    import numpy as np
+except ImportError:
+    # Optional: without NumPy presets are only applied whole, never blended or analyzed
+    np = None
+from services.eq_control import load_preset
+from services.logger import get_logger
+
+# Set up logger
+logger = get_logger(__name__)
+
+# Q used for bands that don't specify one (the create_eq_presets template's value)
+DEFAULT_Q = 1.504
+
+def _band_index(key):
+    return int(key[4:]) if key[4:].isdigit() else -1
+
+def find_equalizer(data):
+    """
+    Return the (key, equalizer dict) of a preset's first output equalizer.
+
+    Returns:
+        tuple: (key, dict), or (None, None) if the preset has no equalizer
+    """
+    output = (data or {}).get('output')
+    if not isinstance(output, dict):
+        return None, None
+    for key in sorted(output):
+        if (key == 'equalizer' or key.startswith('equalizer#')) and isinstance(output[key], dict):
+            return key, output[key]
+    return None, None
+
+def _channel_bands(channel):
+    """(frequency, gain, q) rows of one channel's bands, in band order"""
+    bands = sorted((key for key in channel if key.startswith('band') and _band_index(key) >= 0),
+                   key=_band_index)
+    return [(float(channel[key].get('frequency', 0)), float(channel[key].get('gain', 0)),
+             float(channel[key].get('q', DEFAULT_Q))) for key in bands]
+
+class CompactPreset:
+    """A preset's equalizer as arrays: one row per band, left and right channels averaged."""
+
+    def __init__(self, freqs, gains, qs=None, output_gain=0.0, input_gain=0.0, name=None):
+        """
+        Args:
+            freqs: Band center frequencies in Hz
+            gains: Band gains in dB
+            qs: Band Q factors (default: DEFAULT_Q for every band)
+            output_gain (float): Equalizer output gain in dB
+            input_gain (float): Equalizer input gain in dB
+            name (str): Preset the model was read from, if any
+
+        Raises:
+            RuntimeError: If NumPy isn't installed
+        """
+        if np is None:
+            raise RuntimeError("NumPy is required for the compact preset model")
+        self.freqs = np.asarray(freqs, dtype=float)
+        self.gains = np.asarray(gains, dtype=float)
+        self.qs = np.full_like(self.freqs, DEFAULT_Q) if qs is None else np.asarray(qs, dtype=float)
+        self.output_gain = float(output_gain)
+        self.input_gain = float(input_gain)
+        self.name = name
+
+    def __len__(self):
+        return len(self.freqs)
+
+    def __repr__(self):
+        return f"CompactPreset({self.name!r}, {len(self)} bands)"
+
+    @classmethod
+    def from_data(cls, data, name=None):
+        """
+        Build the model from parsed preset JSON.
+
+        Returns:
+            CompactPreset: The model, or None if the preset has no usable equalizer
+        """
+        _, equalizer = find_equalizer(data)
+        if equalizer is None:
+            return None
+        channels = [_channel_bands(equalizer.get(side) or {}) for side in ('left', 'right')]
+        channels = [rows for rows in channels if rows]
+        if not channels:
+            return None
+        if len(channels) == 2 and len(channels[0]) != len(channels[1]):
+            channels = channels[:1]
+
+        rows = np.mean([np.asarray(rows, dtype=float) for rows in channels], axis=0)
+        rows = rows[rows[:, 0] > 0]
+        if not len(rows):
+            return None
+        order = np.argsort(rows[:, 0], kind='stable')
+        rows = rows[order]
+        return cls(rows[:, 0], rows[:, 1], np.where(rows[:, 2] > 0, rows[:, 2], DEFAULT_Q),
+                   output_gain=equalizer.get('output-gain', 0.0), input_gain=equalizer.get('input-gain', 0.0),
+                   name=name)
+
+    @classmethod
+    def load(cls, preset_name):
+        """Load an installed preset (through eq_control's parsed-preset cache), or None"""
+        data = load_preset(preset_name)
+        if data is None:
+            return None
+        model = cls.from_data(data, name=preset_name)
+        if model is None:
+            logger.debug(f"Preset '{preset_name}' has no equalizer bands")
+        return model
+
+    def resample(self, freqs):
+        """
+        Gains and Qs of this curve at other band frequencies, interpolated over
+        log-frequency (gains in dB, Q in the log domain).
+
+        Returns:
+            tuple: (gains, qs) arrays matching freqs
+        """
+        freqs = np.asarray(freqs, dtype=float)
+        if len(freqs) == len(self.freqs) and np.allclose(freqs, self.freqs):
+            return self.gains, self.qs
+        x = np.log2(self.freqs)
+        target = np.log2(freqs)
+        return np.interp(target, x, self.gains), np.exp(np.interp(target, x, np.log(self.qs)))
+
+    def to_data(self, template):
+        """
+        Write this model into a copy of a preset's JSON.
+
+        The template's band layout is replaced by this model's (both channels
+        get the same bands); everything else in the template is kept.
+
+        Args:
+            template (dict): Parsed preset JSON with an output equalizer
+
+        Returns:
+            dict: The new preset JSON
+        """
+        data = copy.deepcopy(template)
+        key, equalizer = find_equalizer(data)
+        if equalizer is None:
+            raise ValueError("template has no output equalizer")
+
+        for side in ('left', 'right'):
+            channel = equalizer.setdefault(side, {})
+            prototype = next((channel[band] for band in sorted(channel, key=_band_index)
+                              if band.startswith('band') and isinstance(channel[band], dict)), {})
+            for band in [band for band in channel if band.startswith('band')]:
+                del channel[band]
+            for index, (freq, gain, q) in enumerate(zip(self.freqs, self.gains, self.qs)):
+                band = dict(prototype)
+                band.update({'frequency': round(float(freq), 2), 'gain': round(float(gain), 2),
+                             'q': round(float(q), 3)})
+                channel[f'band{index}'] = band
+
+        equalizer['num-bands'] = len(self)
+        equalizer['output-gain'] = round(self.output_gain, 2)
+        equalizer['input-gain'] = round(self.input_gain, 2)
+        return data
+
+def stack_presets(models):
+    """
+    Stack compact presets into (presets × bands) arrays for batch processing.
+
+    Presets with fewer bands are padded with flat bands (0 dB at 1 kHz), which
+    leave every response unchanged.
+
+    Returns:
+        tuple: (freqs, gains, qs) arrays of shape (presets, max bands)
+    """
+    width = max((len(model) for model in models), default=0)
+    freqs = np.full((len(models), width), 1000.0)
+    gains = np.zeros((len(models), width))
+    qs = np.full((len(models), width), DEFAULT_Q)
+    for row, model in enumerate(models):
+        freqs[row, :len(model)] = model.freqs
+        gains[row, :len(model)] = model.gains
+        qs[row, :len(model)] = model.qs
+    return freqs, gains, qs
@@ -0,0 +1,170 @@
+"""
+Perceptual similarity of EQ presets
+
+Many artist → preset switches go between curves that differ by well under
+1 dB, which nobody can hear but which still cost a full apply. Presets are
+compared by what they do to the sound, not by name: each one becomes a
+vector of its frequency response (see services/preset_analysis.py) on a
+third-octave grid, with the equalizer's input and output gain included, and
+the distance between two presets is the RMS difference of their responses
+in dB. Frequencies the ear is less sensitive to (below 40 Hz, above 12 kHz)
+count half. Only the equalizer is compared; PresetSimilarity never treats
+presets whose other plugins differ as the same.
+
+PresetSimilarity answers "does this preset sound like the active one?" for
+the engine; near_duplicates finds groups of presets in a library that could
+be merged (see analyze_presets.py --duplicates).
+"""
+
+import json
+import threading
+from services.preset_model import CompactPreset, find_equalizer, stack_presets, np
+from services.preset_analysis import bell_response_db, frequency_grid
+from services.eq_control import load_preset
+from services.logger import get_logger
+
+# Set up logger
+logger = get_logger(__name__)
+
+# Presets closer than this (RMS dB) sound the same; about the smallest audible broadband level change
+DEFAULT_THRESHOLD = 0.5
+
+POINTS_PER_OCTAVE = 3
+# Frequencies outside this range count half
+SENSITIVE_LOW = 40.0
+SENSITIVE_HIGH = 12000.0
+
+# Rows compared against the whole library at once when looking for duplicates
+CHUNK_SIZE = 512
+
+def _grid_and_weights():
+    grid = frequency_grid(points_per_octave=POINTS_PER_OCTAVE)
+    weights = np.where((grid < SENSITIVE_LOW) | (grid > SENSITIVE_HIGH), 0.5, 1.0)
+    return grid, weights / weights.sum()
+
+def preset_vectors(models):
+    """
+    Perceptual vectors of compact presets; the Euclidean distance between two
+    vectors is the weighted RMS difference of the presets' responses in dB.
+
+    Returns:
+        numpy.ndarray: Shape (presets, grid points)
+    """
+    grid, weights = _grid_and_weights()
+    freqs, gains, qs = stack_presets(models)
+    levels = np.array([model.input_gain + model.output_gain for model in models])
+    response = bell_response_db(freqs, gains, qs, grid) + levels[:, None]
+    return response * np.sqrt(weights)
+
+def near_duplicates(models, threshold=DEFAULT_THRESHOLD, chunk_size=CHUNK_SIZE):
+    """
+    Find groups of presets that sound the same.
+
+    Every member of a group is within the threshold of the group's first
+    preset (groups don't chain: a ≈ b and b ≈ c doesn't put a and c together).
+    Presets with the most near-duplicates lead groups first.
+
+    Args:
+        models (list): CompactPreset objects
+        threshold (float): Largest distance (RMS dB) counted as the same
+
+    Returns:
+        list: Groups, each a list of (preset name, distance to the first preset)
+              sorted by distance; largest groups first
+    """
+    if len(models) < 2:
+        return []
+    vectors = preset_vectors(models)
+    squares = (vectors ** 2).sum(axis=1)
+
+    neighbours = [[] for _ in models]  # Index → [(distance², index)] of the presets close to it
+    for start in range(0, len(models), chunk_size):
+        rows = slice(start, start + chunk_size)
+        # |a - b|² = |a|² + |b|² - 2·a·b, for a chunk of rows against every preset at once
+        distances = squares[rows, None] + squares[None, :] - 2 * vectors[rows] @ vectors.T
+        close_rows, close_cols = np.nonzero(distances <= threshold ** 2)
+        for row, col in zip(close_rows, close_cols):
+            if row + start != col:
+                neighbours[row + start].append((max(float(distances[row, col]), 0.0), int(col)))
+
+    grouped = set()
+    groups = []
+    for leader in sorted(range(len(models)), key=lambda i: (-len(neighbours[i]), models[i].name or '')):
+        if leader in grouped or not neighbours[leader]:
+            continue
+        members = [(distance, i) for distance, i in sorted(neighbours[leader]) if i not in grouped]
+        if not members:
+            continue
+        grouped.add(leader)
+        grouped.update(i for _, i in members)
+        groups.append([(models[leader].name, 0.0)]
+                      + [(models[i].name, round(distance ** 0.5, 2)) for distance, i in members])
+    groups.sort(key=lambda group: (-len(group), group[0][0] or ''))
+    return groups
+
+class PresetSimilarity:
+    """Compares installed presets by sound, caching each preset's vector while its file is unchanged. Thread-safe."""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        """
+        Args:
+            threshold (float): Largest distance (RMS dB) at which two presets sound the same
+
+        Raises:
+            RuntimeError: If NumPy isn't installed
+        """
+        if np is None:
+            raise RuntimeError("NumPy is required for preset similarity")
+        self.threshold = threshold
+        self._vectors = {}  # Preset → (parsed preset data, (vector, other settings) or None)
+        self._lock = threading.Lock()
+
+    def _entry(self, preset):
+        """(vector, settings outside the equalizer) of a preset, or None if it can't be loaded"""
+        data = load_preset(preset)
+        if data is None:
+            return None
+        with self._lock:
+            cached = self._vectors.get(preset)
+        # load_preset returns the same object until the file changes
+        if cached and cached[0] is data:
+            return cached[1]
+
+        model = CompactPreset.from_data(data, name=preset)
+        entry = None
+        if model is not None:
+            key, _ = find_equalizer(data)
+            rest = json.dumps({name: value for name, value in data['output'].items() if name != key},
+                              sort_keys=True)
+            entry = (preset_vectors([model])[0], rest)
+        with self._lock:
+            self._vectors[preset] = (data, entry)
+        return entry
+
+    def vector(self, preset):
+        """The preset's perceptual vector, or None if it has no usable equalizer"""
+        entry = self._entry(preset)
+        return entry[0] if entry else None
+
+    def distance(self, preset, other):
+        """
+        Perceptual distance between two presets' equalizers in RMS dB.
+
+        Returns:
+            float: The distance, or None if either preset has no usable equalizer
+        """
+        if preset == other:
+            return 0.0
+        a, b = self.vector(preset), self.vector(other)
+        if a is None or b is None:
+            return None
+        return float(np.sqrt(((a - b) ** 2).sum()))
+
+    def equivalent(self, preset, other):
+        """Whether two presets sound the same: equalizers within the threshold, everything else equal"""
+        if preset == other:
+            return True
+        a, b = self._entry(preset), self._entry(other)
+        if a is None or b is None or a[1] != b[1]:
+            return False
+        return float(np.sqrt(((a[0] - b[0]) ** 2).sum())) <= self.threshold
@@ -0,0 +1,193 @@
+"""
+Built-in sampling profiler for Adaptive EQ
+
+Off by default and costs nothing until started. When running, a background
+thread samples the stacks of all threads (including the tray's GTK main loop
+and its monitoring thread) and tracemalloc tracks allocations. Results are
+written to ~/.cache/adaptive-eq/profiles/:
+
+- profile-<pid>-<start>.collapsed: stack samples in the collapsed format read
+  by flamegraph.pl and speedscope ("thread;outer;...;inner count")
+- profile-<pid>-<start>-memory.txt: tracemalloc growth since the previous
+  snapshot and since profiling started, appended every snapshot interval
+
+Start it with ADAPTIVE_EQ_PROFILE=1, or toggle it at runtime with
+`kill -USR2 <pid>`.
+"""
+
+import os
+import sys
+import time
+import atexit
+import signal
+import threading
+import tracemalloc
+from collections import Counter
+from services.logger import get_logger
+
+# Set up logger
+logger = get_logger(__name__)
+
+DEFAULT_PROFILE_DIR = os.path.expanduser('~/.cache/adaptive-eq/profiles')
+
+# Signal that starts/stops profiling
+PROFILE_SIGNAL = signal.SIGUSR2
+
+class SamplingProfiler:
+    """Periodically samples all thread stacks and tracemalloc snapshots."""
+
+    def __init__(self, output_dir=DEFAULT_PROFILE_DIR, interval=0.01, snapshot_interval=60, max_depth=64,
+                 traceback_frames=10):
+        """
+        Args:
+            output_dir (str): Directory for collapsed stacks and memory reports
+            interval (float): Seconds between stack samples
+            snapshot_interval (float): Seconds between tracemalloc snapshots (and file flushes)
+            max_depth (int): Innermost frames kept per sampled stack
+            traceback_frames (int): Frames tracemalloc records per allocation
+        """
+        self.output_dir = output_dir
+        self.interval = interval
+        self.snapshot_interval = snapshot_interval
+        self.max_depth = max_depth
+        self.traceback_frames = traceback_frames
+
+        self.samples = Counter()
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._session = None
+        self._baseline = None
+        self._previous = None
+        self._started_tracemalloc = False
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start sampling (no-op if already running)."""
+        with self._lock:
+            if self.running:
+                return
+            os.makedirs(self.output_dir, exist_ok=True)
+            self._session = os.path.join(self.output_dir, f"profile-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}")
+            self.samples = Counter()
+
+            # Don't take over tracemalloc if something else (e.g. -X tracemalloc) started it
+            self._started_tracemalloc = not tracemalloc.is_tracing()
+            if self._started_tracemalloc:
+                tracemalloc.start(self.traceback_frames)
+            self._baseline = self._previous = self._snapshot()
+
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler")
+            self._thread.daemon = True
+            self._thread.start()
+        logger.info(f"Profiling started, writing to {self._session}.*")
+
+    def stop(self):
+        """Stop sampling and write the final results."""
+        with self._lock:
+            if not self.running:
+                return
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self._write_results()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+            self._baseline = self._previous = None
+        logger.info(f"Profiling stopped, results in {self._session}.*")
+
+    def toggle(self):
+        """Start profiling if stopped, stop it if running."""
+        if self.running:
+            self.stop()
+        else:
+            self.start()
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(names.get(thread_id, f"thread-{thread_id}"))
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def _run(self):
+        next_snapshot = time.monotonic() + self.snapshot_interval
+        while not self._stop.wait(self.interval):
+            self._sample()
+            if time.monotonic() >= next_snapshot:
+                next_snapshot = time.monotonic() + self.snapshot_interval
+                try:
+                    self._write_results()
+                except Exception as e:
+                    logger.error(f"Error writing profile results: {e}")
+
+    def _write_results(self):
+        # Collapsed stacks are cumulative for the session, so the file is rewritten
+        tmp_path = f"{self._session}.collapsed.tmp"
+        with open(tmp_path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        os.replace(tmp_path, f"{self._session}.collapsed")
+
+        snapshot = self._snapshot()
+        with open(f"{self._session}-memory.txt", 'a') as f:
+            current, peak = tracemalloc.get_traced_memory()
+            f.write(f"=== {time.strftime('%Y-%m-%d %H:%M:%S')}: traced {current / 1024:.0f} KiB "
+                    f"(peak {peak / 1024:.0f} KiB)\n")
+            for title, reference in (("since previous snapshot", self._previous),
+                                     ("since profiling started", self._baseline)):
+                f.write(f"--- Top allocation growth {title}\n")
+                for stat in snapshot.compare_to(reference, 'lineno')[:25]:
+                    f.write(f"{stat}\n")
+            f.write("\n")
+        self._previous = snapshot
+
+# Global profiler instance
+_profiler = None
+
+def get_profiler():
+    """Get the shared profiler instance (created stopped)."""
+    global _profiler
+    if _profiler is None:
+        _profiler = SamplingProfiler()
+    return _profiler
+
+def install_profiler(install_signal_handler=True):
+    """
+    Set up profiling for this process: start it now if ADAPTIVE_EQ_PROFILE is
+    set, and toggle it on SIGUSR2. GTK applications should pass
+    install_signal_handler=False and route the signal through GLib instead,
+    since Python signal handlers don't run while Gtk.main() is blocking.
+
+    Returns:
+        SamplingProfiler: The shared profiler
+    """
+    profiler = get_profiler()
+    # Write the results of a session still running at exit
+    atexit.register(profiler.stop)
+
+    if install_signal_handler:
+        signal.signal(PROFILE_SIGNAL, lambda signum, frame: threading.Thread(target=profiler.toggle).start())
+
+    if os.environ.get('ADAPTIVE_EQ_PROFILE', '').lower() in ('1', 'true', 'yes', 'on'):
+        profiler.start()
+    return profiler
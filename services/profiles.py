@@ -0,0 +1,54 @@
+"""
+Artist → preset profile map loading for Adaptive EQ, and the record of the
+last preset applied (restored at startup before the first Spotify poll)
+"""
+
+import os
+import json
+import time
+from services.logger import get_logger
+
+# Set up logger
+logger = get_logger(__name__)
+
+# Default location of the artist → preset mapping, relative to the working directory
+DEFAULT_PROFILE_PATH = "config/eq_profiles.json"
+
+# The preset applied most recently, kept across restarts
+LAST_PRESET_PATH = os.path.expanduser("~/.cache/adaptive-eq/last_preset.json")
+
+def load_profile_map(path=DEFAULT_PROFILE_PATH):
+    """Load EQ profile mapping (artist → preset)."""
+    if not os.path.exists(path):
+        logger.warning(f"Profile map not found at {path}")
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+def load_last_preset(path=LAST_PRESET_PATH):
+    """
+    Read the preset applied most recently.
+
+    Returns:
+        dict: {'preset', 'artist', 'time'}, or None if none was recorded
+    """
+    try:
+        with open(path, "r") as f:
+            last = json.load(f)
+        return last if last.get('preset') else None
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, AttributeError) as e:
+        logger.warning(f"Could not read the last applied preset from {path}: {e}")
+        return None
+
+def save_last_preset(preset, artist=None, path=LAST_PRESET_PATH):
+    """Record the preset that was just applied."""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({'preset': preset, 'artist': artist, 'time': time.time()}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not record the last applied preset: {e}")
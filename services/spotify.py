@@ -1,9 +1,20 @@
 import os
+import asyncio
 import spotipy
-from spotipy.oauth2 import SpotifyOAuth
+from spotipy.oauth2 import SpotifyOAuth, SpotifyClientCredentials
+from spotipy.cache_handler import MemoryCacheHandler
 import time
 import json
+from urllib.parse import urljoin
+
+try:
+    import aiohttp
+except ImportError:
+    # Optional: without aiohttp the async client runs spotipy on worker threads
+    aiohttp = None
 from services.logger import get_logger, log_exceptions
+from services.events import get_event_log
+from services.metrics import SPOTIFY_REQUESTS
 
 # Set up logger
 logger = get_logger(__name__)
@@ -12,6 +23,8 @@ logger = get_logger(__name__)
 _spotify_client = None
 _last_auth_attempt = 0
 _auth_retry_interval = 60  # seconds to wait before retrying authentication
+_last_cached_track_id = None
+_last_logged_track_id = None
 
 # Environment variables for Spotify API authentication
 # You'll need to set these or load from a config file
@@ -19,6 +32,42 @@ SPOTIFY_CLIENT_ID = os.environ.get('SPOTIFY_CLIENT_ID')
 SPOTIFY_CLIENT_SECRET = os.environ.get('SPOTIFY_CLIENT_SECRET')
 SPOTIFY_REDIRECT_URI = os.environ.get('SPOTIFY_REDIRECT_URI', 'http://localhost:8888/callback')
 
+# Base URL of the Spotify Web API. SPOTIFY_API_URL points the app at another
+# server implementing it, e.g. the local mock server (benchmarks/mock_spotify.py)
+DEFAULT_SPOTIFY_API_URL = "https://api.spotify.com/v1/"
+SPOTIFY_API_URL = os.environ.get('SPOTIFY_API_URL', DEFAULT_SPOTIFY_API_URL).rstrip('/') + '/'
+
+class SpotifyAPIError(RuntimeError):
+    """Non-success response from the Web API (mirrors spotipy's SpotifyException.http_status)."""
+    
+    def __init__(self, message, http_status=None):
+        super().__init__(message)
+        self.http_status = http_status
+
+def _record_api_call(endpoint, status=200):
+    """Count a completed Web API request."""
+    SPOTIFY_REQUESTS.inc(endpoint=endpoint, status=status)
+
+def _record_api_error(endpoint, error):
+    """
+    Add an api_error event to the event stream and count the failed request.
+    A 401 drops the cached client, so the next call authenticates again.
+    """
+    global _spotify_client, _last_auth_attempt
+    status = getattr(error, 'http_status', None)
+    if status == 401 and _spotify_client is not None:
+        logger.warning("Spotify rejected the access token. Re-authenticating...")
+        _spotify_client = None
+        # Authenticate again straight away rather than after the retry interval
+        _last_auth_attempt = 0
+    get_event_log().emit('api_error', endpoint=endpoint, status=status, error=f"{type(error).__name__}: {error}")
+    
+    # Responses from the async client were already counted with their status
+    if not isinstance(error, SpotifyAPIError):
+        if status is None:
+            status = 'timeout' if isinstance(error, asyncio.TimeoutError) else 'error'
+        _record_api_call(endpoint, status)
+
 def load_credentials_from_file():
     """Load credentials from the credentials file if environment variables are not set."""
     global SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET, SPOTIFY_REDIRECT_URI
@@ -48,26 +97,52 @@ def load_credentials_from_file():
     logger.warning("No Spotify credentials found in environment or credentials file")
     return False
 
+def create_spotify_client(client_id, client_secret, redirect_uri, scope, cache_path, api_url=None):
+    """
+    Create a spotipy client for the Web API at api_url.
+    
+    The real API authenticates through the browser OAuth flow. Any other base
+    URL is treated as a test server: tokens come from its /api/token endpoint
+    through the client credentials flow, so no login is needed.
+    
+    Args:
+        api_url (str): Web API base URL, defaults to SPOTIFY_API_URL
+    """
+    api_url = (api_url or SPOTIFY_API_URL).rstrip('/') + '/'
+    if api_url == DEFAULT_SPOTIFY_API_URL:
+        auth_manager = SpotifyOAuth(
+            client_id=client_id,
+            client_secret=client_secret,
+            redirect_uri=redirect_uri,
+            scope=scope,
+            cache_path=cache_path
+        )
+    else:
+        logger.info(f"Using Spotify Web API at {api_url}")
+        # Tokens from a test server are only valid for that server instance, so they aren't cached on disk
+        auth_manager = SpotifyClientCredentials(client_id=client_id or 'mock', client_secret=client_secret or 'mock',
+                                                cache_handler=MemoryCacheHandler())
+        auth_manager.OAUTH_TOKEN_URL = urljoin(api_url, '/api/token')
+    
+    sp = spotipy.Spotify(auth_manager=auth_manager)
+    sp.prefix = api_url
+    return sp
+
 @log_exceptions
 def get_spotify_client():
     """
     Initialize and return a Spotify client with proper authentication.
     Returns None if authentication fails.
     
-    Uses a cached client to avoid repeated authentication.
+    Uses a cached client to avoid repeated authentication. The cached client
+    isn't re-checked per call (spotipy refreshes its token by itself); it is
+    dropped when a request is rejected with 401 (see _record_api_error).
     """
     global _spotify_client, _last_auth_attempt
     
     # If we already have a client, return it
     if _spotify_client:
-        try:
-            # Test the client with a simple API call
-            _spotify_client.current_user()
-            return _spotify_client
-        except:
-            # If the client is no longer valid, clear it and try again
-            logger.warning("Cached Spotify client is no longer valid. Re-authenticating...")
-            _spotify_client = None
+        return _spotify_client
     
     # If we've recently tried and failed to authenticate, don't try again yet
     current_time = time.time()
@@ -77,14 +152,16 @@ def get_spotify_client():
     
     _last_auth_attempt = current_time
     
-    # Try to load credentials if not already set
-    if not SPOTIFY_CLIENT_ID or not SPOTIFY_CLIENT_SECRET:
+    # Try to load credentials if not already set (a local mock server doesn't check them)
+    if (not SPOTIFY_CLIENT_ID or not SPOTIFY_CLIENT_SECRET) and SPOTIFY_API_URL == DEFAULT_SPOTIFY_API_URL:
         if not load_credentials_from_file():
             logger.error("Spotify credentials not found. Please set up your credentials.")
             return None
     
     try:
         # Set up authentication scope
+        # Adding a scope would invalidate every cached token and force a new browser login,
+        # so private playlists aren't read as playback contexts (see get_context_tracks)
         scope = "user-read-currently-playing user-read-playback-state"
         logger.debug("Initializing Spotify client with OAuth")
         
@@ -94,13 +171,9 @@ def get_spotify_client():
         # Make sure the directory exists
         os.makedirs(os.path.dirname(cache_path), exist_ok=True)
         
-        sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
-            client_id=SPOTIFY_CLIENT_ID,
-            client_secret=SPOTIFY_CLIENT_SECRET,
-            redirect_uri=SPOTIFY_REDIRECT_URI,
-            scope=scope,
-            cache_path=cache_path
-        ))
+        sp = create_spotify_client(
+            SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET, SPOTIFY_REDIRECT_URI, scope, cache_path
+        )
         
         # Test the connection
         sp.current_user()
@@ -123,7 +196,7 @@ def get_current_track():
     client = get_spotify_client()
     if not client:
         logger.warning("Could not obtain Spotify client, trying cached track info")
-        cached_track = _get_cached_track_info()
+        cached_track = get_cached_track_info()
         if cached_track:
             logger.info("Using cached track information")
             return cached_track
@@ -133,57 +206,187 @@ def get_current_track():
         # Get currently playing track
         logger.debug("Requesting current playback from Spotify API")
         current = client.current_playback()
+        _record_api_call('me/player', 200 if current else 204)
         
-        if not current or not current.get('is_playing'):
-            logger.debug("No track is currently playing")
-            return None
-            
-        item = current.get('item')
-        if not item:
-            logger.warning("Track is playing but no item information available")
-            return None
-            
-        # Extract relevant track information
-        track_info = {
-            'artist': item['artists'][0]['name'],  # Primary artist
-            'all_artists': [artist['name'] for artist in item['artists']],
-            'track': item['name'],
-            'album': item['album']['name'],
-            'id': item['id'],
-            'uri': item['uri']
-        }
-        
-        logger.info(f"Current track: {track_info['artist']} - {track_info['track']}")
-        
-        # Store in cache for offline use
-        _cache_track_info(track_info)
+        track_info = _track_info_from_playback(current)
+        if track_info:
+            # Store in cache for offline use
+            _cache_track_info(track_info)
         
         return track_info
     except Exception as e:
         logger.error(f"Error getting current track: {e}")
+        _record_api_error('me/player', e)
         
         # If we can't get the current track, try to use cached information
-        cached_track = _get_cached_track_info()
+        cached_track = get_cached_track_info()
         if cached_track:
             logger.info("Using cached track information due to error")
             return cached_track
         
         return None
 
+def _track_info_from_playback(current):
+    """Build a track info dict from a current playback response, or None if nothing is playing."""
+    if not current or not current.get('is_playing'):
+        logger.debug("No track is currently playing")
+        return None
+        
+    item = current.get('item')
+    if not item:
+        logger.warning("Track is playing but no item information available")
+        return None
+        
+    # Extract relevant track information
+    track_info = _track_info_from_item(item)
+    track_info['progress_ms'] = current.get('progress_ms')
+    
+    # Playlist, album or artist the track is being played from (if any)
+    context = current.get('context')
+    track_info['context'] = {'type': context.get('type'), 'uri': context.get('uri')} if context else None
+    
+    # Every poll passes through here; only track changes are worth an info line
+    global _last_logged_track_id
+    if track_info['id'] != _last_logged_track_id:
+        _last_logged_track_id = track_info['id']
+        logger.info(f"Current track: {track_info['artist']} - {track_info['track']}")
+    else:
+        logger.debug(f"Current track: {track_info['artist']} - {track_info['track']}")
+    return track_info
+
+def _track_info_from_item(item):
+    """Build the track info dict used throughout the app from a Spotify track item."""
+    return {
+        'artist': item['artists'][0]['name'],  # Primary artist
+        'all_artists': [artist['name'] for artist in item['artists']],
+        'artist_ids': [artist.get('id') for artist in item['artists']],
+        'track': item['name'],
+        'album': item.get('album', {}).get('name'),
+        'id': item['id'],
+        'uri': item['uri'],
+        'duration_ms': item.get('duration_ms')
+    }
+
+@log_exceptions
+def get_queue(limit=None):
+    """
+    Get the tracks queued to play after the current one.
+    Returns a list of track info dicts (same shape as get_current_track,
+    without playback progress) or an empty list if the queue is unavailable.
+    
+    Args:
+        limit (int): Maximum number of upcoming tracks to return
+    """
+    client = get_spotify_client()
+    if not client:
+        return []
+    
+    try:
+        logger.debug("Requesting playback queue from Spotify API")
+        queue = client.queue()
+        _record_api_call('me/player/queue')
+        
+        tracks = []
+        for item in (queue or {}).get('queue') or []:
+            # Podcast episodes and local files have no artists/album we can map
+            if not item or item.get('type') != 'track' or not item.get('artists'):
+                continue
+            tracks.append(_track_info_from_item(item))
+            if limit and len(tracks) >= limit:
+                break
+        
+        return tracks
+    except Exception as e:
+        logger.error(f"Error getting playback queue: {e}")
+        _record_api_error('me/player/queue', e)
+        return []
+
+@log_exceptions
+def get_context_tracks(context_uri, max_tracks=5000):
+    """
+    Get every track of a playback context (playlist, album or artist URI).
+    Returns a list of track info dicts (album may be None for album contexts)
+    or an empty list if the context can't be read (e.g. a private playlist, as
+    the client isn't authorized with playlist-read-private).
+    
+    Args:
+        context_uri (str): Spotify URI, e.g. "spotify:playlist:37i9dQZF1DXcBWIGoYBM5M"
+        max_tracks (int): Stop after this many tracks
+    """
+    client = get_spotify_client()
+    if not client or not context_uri:
+        return []
+    
+    parts = context_uri.split(':')
+    if len(parts) < 3:
+        return []
+    context_type, context_id = parts[-2], parts[-1]
+    
+    try:
+        if context_type == 'playlist':
+            results = client.playlist_items(
+                context_id,
+                fields='items.track(id,name,uri,type,duration_ms,album.name,artists(id,name)),next',
+                limit=100,
+                additional_types=('track',)
+            )
+        elif context_type == 'album':
+            results = client.album_tracks(context_id, limit=50)
+        elif context_type == 'artist':
+            results = {'items': client.artist_top_tracks(context_id).get('tracks', [])}
+        else:
+            logger.debug(f"Unsupported playback context type: {context_type}")
+            return []
+        _record_api_call(f"{context_type}s")
+        
+        tracks = []
+        while results:
+            for item in results.get('items', []):
+                # Playlist pages wrap each track in an item with added_at etc.
+                if context_type == 'playlist':
+                    item = item.get('track')
+                if item and item.get('id') and item.get('artists'):
+                    tracks.append(_track_info_from_item(item))
+            if len(tracks) >= max_tracks or not results.get('next'):
+                break
+            results = client.next(results)
+            _record_api_call(f"{context_type}s")
+        
+        logger.debug(f"Fetched {len(tracks)} tracks for context {context_uri}")
+        return tracks[:max_tracks]
+    except Exception as e:
+        _record_api_error(f"{context_type}s", e)
+        if getattr(e, 'http_status', None) in (403, 404):
+            # Private or deleted; presets are resolved per track instead
+            logger.info(f"Context {context_uri} can't be read (HTTP {e.http_status}), resolving presets per track")
+        else:
+            logger.error(f"Error getting tracks for context {context_uri}: {e}")
+        return []
+
 def _cache_track_info(track_info):
     """Cache track information for offline use."""
+    global _last_cached_track_id
+    
+    # Only write when the track changes, not on every poll
+    if track_info.get('id') and track_info.get('id') == _last_cached_track_id:
+        return
+    
     try:
         cache_dir = os.path.expanduser("~/.cache/adaptive-eq")
         os.makedirs(cache_dir, exist_ok=True)
         
+        # Playback progress goes stale immediately, so it is not cached
+        cached_info = {k: v for k, v in track_info.items() if k != 'progress_ms'}
+        
         cache_file = os.path.join(cache_dir, "last_track.json")
         with open(cache_file, 'w') as f:
-            json.dump(track_info, f)
+            json.dump(cached_info, f)
+        _last_cached_track_id = track_info.get('id')
         logger.debug(f"Cached track info for {track_info['artist']} - {track_info['track']}")
     except Exception as e:
         logger.error(f"Error caching track info: {e}")
 
-def _get_cached_track_info():
+def get_cached_track_info():
     """Get cached track information."""
     try:
         cache_file = os.path.expanduser("~/.cache/adaptive-eq/last_track.json")
@@ -197,18 +400,29 @@ def _get_cached_track_info():
     
     return None
 
-def get_artist_genres(artist_name):
+def get_artist_genres(artist_name, artist_id=None):
     """
     Get genres associated with an artist.
-    Returns a list of genre strings or empty list if none found or there's an error.
+    Returns a list of genre strings, an empty list if none were found,
+    or None if the lookup failed (so failures aren't mistaken for "no genres").
+    
+    Args:
+        artist_name (str): Artist name to search for
+        artist_id (str): Spotify artist ID; when given, the artist is fetched directly
     """
     client = get_spotify_client()
     if not client:
-        return []
+        return None
     
     try:
+        if artist_id:
+            artist = client.artist(artist_id)
+            _record_api_call('artists')
+            return artist.get('genres', []) if artist else []
+        
         # Search for the artist
         results = client.search(q=f'artist:{artist_name}', type='artist', limit=1)
+        _record_api_call('search')
         
         if not results or not results['artists']['items']:
             return []
@@ -226,5 +440,130 @@ def get_artist_genres(artist_name):
         
         return artist.get('genres', [])
     except Exception as e:
-        print(f"Error getting artist genres: {e}")
-        return []
+        logger.error(f"Error getting artist genres: {e}")
+        _record_api_error('artists' if artist_id else 'search', e)
+        return None
+
+class AsyncSpotifyClient:
+    """
+    Non-blocking access to the Spotify Web API for the asyncio daemon.
+    
+    Requests go straight to the Web API through aiohttp when it is installed,
+    reusing the spotipy OAuth token; otherwise the spotipy client is called on a
+    worker thread. Every request is bounded by a timeout.
+    """
+    
+    def __init__(self, timeout=10, executor=None):
+        """
+        Args:
+            timeout (int): Seconds before a request is abandoned
+            executor: concurrent.futures executor for blocking spotipy calls
+                      (defaults to the event loop's default executor)
+        """
+        self.timeout = timeout
+        self.executor = executor
+        self._client = None
+        self._session = None
+        self._token = None
+        self._token_expires_at = 0
+        self._client_lock = None
+    
+    async def _run_blocking(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(loop.run_in_executor(self.executor, func, *args), self.timeout)
+    
+    async def _get_client(self):
+        if self._client is None:
+            if self._client_lock is None:
+                self._client_lock = asyncio.Lock()
+            # Warm-up and the first poll may both get here; authenticate once
+            async with self._client_lock:
+                if self._client is None:
+                    self._client = await self._run_blocking(get_spotify_client)
+        if self._client is None:
+            raise RuntimeError("Could not obtain Spotify client")
+        return self._client
+    
+    async def warm_up(self):
+        """Load the spotipy client and its access token ahead of the first request."""
+        client = await self._get_client()
+        if aiohttp is not None:
+            await self._get_token(client)
+    
+    async def _get_token(self, client):
+        # Refresh a minute early so a request never goes out with an expiring token
+        if self._token and time.time() < self._token_expires_at - 60:
+            return self._token
+        
+        auth_manager = client.auth_manager
+        if isinstance(auth_manager, SpotifyClientCredentials):
+            # Test servers: fetches a new token once the cached one expires
+            fetch_token = lambda: auth_manager.get_access_token(as_dict=True)
+        else:
+            fetch_token = lambda: auth_manager.validate_token(auth_manager.cache_handler.get_cached_token())
+        token_info = await self._run_blocking(fetch_token)
+        if not token_info:
+            raise RuntimeError("No valid Spotify access token")
+        self._token = token_info['access_token']
+        self._token_expires_at = token_info.get('expires_at', 0)
+        return self._token
+    
+    async def _request(self, endpoint, fallback):
+        """
+        GET a Web API endpoint and return the decoded JSON (None for 204 No Content).
+        
+        Args:
+            endpoint (str): Path relative to the API base URL, e.g. "me/player"
+            fallback: Callable taking a spotipy client, used when aiohttp isn't available
+        """
+        client = await self._get_client()
+        if aiohttp is None:
+            result = await self._run_blocking(fallback, client)
+            _record_api_call(endpoint, 200 if result is not None else 204)
+            return result
+        
+        token = await self._get_token(client)
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        
+        async with self._session.get(
+            SPOTIFY_API_URL + endpoint,
+            headers={'Authorization': f'Bearer {token}'}
+        ) as response:
+            _record_api_call(endpoint, response.status)
+            if response.status == 204:
+                return None
+            if response.status == 401:
+                # Token revoked or expired early; fetch a fresh one next time
+                self._token = None
+            if response.status != 200:
+                raise SpotifyAPIError(f"Spotify API returned HTTP {response.status} for {endpoint}", response.status)
+            return await response.json()
+    
+    async def get_current_track(self):
+        """
+        asyncio variant of get_current_track.
+        Returns a track info dict or None if no track is playing.
+        
+        Unlike get_current_track, request failures (timeouts included) are raised
+        rather than answered with the cached track, so the caller can tell an
+        unreachable Spotify from one that is playing it; see get_cached_track_info.
+        """
+        try:
+            logger.debug("Requesting current playback from Spotify API (async)")
+            current = await self._request('me/player', lambda client: client.current_playback())
+        except Exception as e:
+            _record_api_error('me/player', e)
+            raise
+        
+        track_info = _track_info_from_playback(current)
+        if track_info and track_info.get('id') != _last_cached_track_id:
+            # Fire and forget; the file is only read when Spotify can't be reached
+            asyncio.get_running_loop().run_in_executor(self.executor, _cache_track_info, track_info)
+        return track_info
+    
+    async def close(self):
+        """Close the HTTP session, if one was opened."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -0,0 +1,258 @@
+"""
+Playback trace recording and replay for Adaptive EQ
+
+A trace is a compact record of a listening session: the playback state the
+daemon saw, stored only when it changed in a way the progress clock can't
+explain (a new track, a pause, a seek). Replaying a trace through a virtual
+clock reproduces the same states at any speed, so the whole detect → resolve
+→ apply pipeline can be measured against a day of real listening in seconds
+(see benchmarks/replay.py).
+
+File format: JSON lines, gzip-compressed when the path ends in .gz.
+
+    {"trace":1,"start":1718000000.0}              header
+    ["t",0,{"id":"...","artist":"...",...}]       track definition (ref 0)
+    [12.503,0,41200]                              at +12.5 s: track 0 playing at 41.2 s
+    [305.1,null,0]                                at +305.1 s: nothing playing
+    ["end",86400.0]                               end of the recording
+
+Record a session with `main.py --record-trace ~/listening.jsonl.gz`.
+"""
+
+import os
+import gzip
+import json
+import time
+import bisect
+import threading
+from services.logger import get_logger
+
+# Set up logger
+logger = get_logger(__name__)
+
+TRACE_VERSION = 1
+
+# Track info keys stored in a trace (everything but the playback progress)
+TRACK_FIELDS = ('id', 'artist', 'all_artists', 'artist_ids', 'track', 'album', 'uri', 'duration_ms', 'context')
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+class TraceRecorder:
+    """Writes the playback states seen by a poller to a trace file."""
+
+    def __init__(self, path, seek_tolerance=2.0, flush_interval=60):
+        """
+        Args:
+            path (str): Trace file (.gz to compress)
+            seek_tolerance (float): Seconds the reported progress may drift from
+                                    the expected one before a state is written
+            flush_interval (float): Minimum seconds between flushes to disk (frequent
+                                    flushes would defeat the gzip compression)
+        """
+        self.path = path
+        self.seek_tolerance = seek_tolerance
+        self.flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+        self._file = None
+        self._start = None
+        self._refs = {}
+        self._last = None  # (time, ref, progress_ms) of the last written state
+        self._last_seen = None
+        self._lock = threading.Lock()
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def record(self, track, now=None):
+        """
+        Record the result of one playback poll.
+
+        Args:
+            track (dict): Track info from get_current_track, or None if nothing is playing
+            now (float): Time of the poll (epoch seconds), defaults to now
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            try:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                    self._file = _open(self.path, 'w')
+                    self._start = now
+                    self._write({'trace': TRACE_VERSION, 'start': round(now, 3)})
+                self._record_locked(track, now)
+            except OSError as e:
+                logger.error(f"Error writing playback trace to {self.path}, stopping the recording: {e}")
+                self._file = None
+                self.path = None
+
+    def _record_locked(self, track, now):
+        offset = round(now - self._start, 3)
+        self._last_seen = offset
+        if track is None:
+            if self._last is not None and self._last[1] is not None:
+                self._last = (offset, None, 0)
+                self._write(list(self._last))
+            return
+
+        key = (track.get('id'), (track.get('context') or {}).get('uri'))
+        ref = self._refs.get(key)
+        if ref is None:
+            ref = self._refs[key] = len(self._refs)
+            self._write(['t', ref, {field: track.get(field) for field in TRACK_FIELDS}])
+
+        progress = track.get('progress_ms') or 0
+        if self._last is not None and self._last[1] == ref:
+            expected = self._last[2] + (offset - self._last[0]) * 1000
+            if abs(progress - expected) <= self.seek_tolerance * 1000:
+                return
+        self._last = (offset, ref, progress)
+        self._write(list(self._last))
+
+    def flush(self):
+        """Write buffered states to disk, at most every flush_interval seconds."""
+        with self._lock:
+            if self._file is None or time.monotonic() - self._last_flush < self.flush_interval:
+                return
+            self._last_flush = time.monotonic()
+            try:
+                self._file.flush()
+            except OSError as e:
+                logger.error(f"Error flushing playback trace {self.path}: {e}")
+
+    def close(self):
+        """Mark the end of the recording and close the file."""
+        with self._lock:
+            if self._file is None:
+                return
+            try:
+                self._write(['end', self._last_seen or 0.0])
+                self._file.close()
+            except OSError as e:
+                logger.error(f"Error closing playback trace {self.path}: {e}")
+            self._file = None
+
+class Trace:
+    """A loaded trace: the playback state at any offset from its start."""
+
+    def __init__(self, start, tracks, states, end):
+        """
+        Args:
+            start (float): Epoch time the recording started
+            tracks (dict): Ref → track info
+            states (list): (offset, ref or None, progress_ms), sorted by offset
+            end (float): Offset at which the recording ended
+        """
+        self.start = start
+        self.tracks = tracks
+        self.states = states
+        self.end = end
+        self._offsets = [state[0] for state in states]
+
+    @property
+    def duration(self):
+        return self.end
+
+    def state_at(self, offset):
+        """
+        Playback at an offset (seconds) into the trace.
+
+        Returns:
+            dict: Track info with the interpolated progress_ms, or None if nothing was playing
+        """
+        index = bisect.bisect_right(self._offsets, offset) - 1
+        if index < 0:
+            return None
+        at, ref, progress = self.states[index]
+        if ref is None:
+            return None
+        track = dict(self.tracks[ref])
+        progress += (offset - at) * 1000
+        duration = track.get('duration_ms')
+        track['progress_ms'] = int(min(progress, duration) if duration else progress)
+        return track
+
+    def track_started_at(self, offset):
+        """Offset of the state that made the track playing at offset current."""
+        index = bisect.bisect_right(self._offsets, offset) - 1
+        if index < 0:
+            return None
+        ref = self.states[index][1]
+        while index > 0 and self.states[index - 1][1] == ref:
+            index -= 1
+        return self.states[index][0]
+
+def load_trace(path):
+    """
+    Read a trace file.
+
+    Returns:
+        Trace: The recording; a recording cut short (no end marker) ends at its last
+               state, plus the rest of the track playing then
+    """
+    start = None
+    tracks = {}
+    states = []
+    end = None
+    with _open(path, 'r') as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                if isinstance(record, dict):
+                    if record.get('trace') != TRACE_VERSION:
+                        raise ValueError(f"unsupported trace version {record.get('trace')}")
+                    start = record['start']
+                elif record[0] == 't':
+                    tracks[record[1]] = record[2]
+                elif record[0] == 'end':
+                    end = record[1]
+                else:
+                    states.append((record[0], record[1], record[2]))
+            except (ValueError, KeyError, IndexError, TypeError) as e:
+                # A recording cut off mid-line is still usable up to that point
+                logger.warning(f"Skipping malformed line {number} of {path}: {e}")
+
+    if start is None:
+        raise ValueError(f"{path} is not a playback trace")
+    states.sort(key=lambda state: state[0])
+    if end is None:
+        end = states[-1][0] if states else 0.0
+        if states and states[-1][1] is not None:
+            at, ref, progress = states[-1]
+            end = at + max(0, (tracks[ref].get('duration_ms') or 0) - progress) / 1000
+    return Trace(start, tracks, states, end)
+
+class VirtualClock:
+    """Clock that only moves when advanced, for replaying traces faster than real time."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += max(0.0, seconds)
+        return self.now
+
+class TraceTrackSource:
+    """Track source answering polls from a trace at the clock's current offset."""
+
+    def __init__(self, trace, clock):
+        """
+        Args:
+            trace (Trace): The recording to replay
+            clock: Callable returning the current offset into the trace (e.g. a VirtualClock)
+        """
+        self.trace = trace
+        self.clock = clock
+        self.polls = 0
+
+    def get_track(self):
+        self.polls += 1
+        return self.trace.state_at(self.clock())
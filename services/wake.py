@@ -0,0 +1,89 @@
+"""
+Local wake-up signals for the Adaptive EQ daemon
+
+While nothing is playing, the daemon polls Spotify less and less often (see
+the idle backoff in services/engine.py). These session D-Bus signals cut the
+wait short, so playback is picked up immediately anyway:
+
+- mpris: a media player's PlaybackStatus changed (Spotify started, paused, stopped)
+- unlock: the screensaver was deactivated (session unlocked)
+
+The signals are read from `dbus-monitor` on the session bus, so no D-Bus
+Python bindings are needed. Without dbus-monitor or a session bus, the
+daemon relies on polling alone.
+"""
+
+import time
+import asyncio
+from services.commands import start_command_async
+from services.logger import get_logger
+
+# Set up logger
+logger = get_logger(__name__)
+
+MATCH_RULES = [
+    "type='signal',interface='org.freedesktop.DBus.Properties',member='PropertiesChanged',"
+    "path='/org/mpris/MediaPlayer2'",
+    "type='signal',interface='org.freedesktop.ScreenSaver',member='ActiveChanged'",
+    "type='signal',interface='org.gnome.ScreenSaver',member='ActiveChanged'",
+]
+
+# Seconds before dbus-monitor is restarted after it exits
+RESTART_DELAY = 60
+# dbus-monitor exiting sooner than this after starting means there is no session bus
+MIN_RUN_TIME = 5
+
+class DBusWakeMonitor:
+    """Follows dbus-monitor's output and reports wake-up signals."""
+
+    def __init__(self, on_wake):
+        """
+        Args:
+            on_wake: Called with the source ('mpris' or 'unlock') and a detail string
+        """
+        self.on_wake = on_wake
+        self._member = None
+        self._playback_status = False
+
+    async def run(self):
+        """Follow the session bus until cancelled."""
+        cmd = ['dbus-monitor', '--session'] + MATCH_RULES
+        while True:
+            process = await start_command_async(cmd)
+            if process is None:
+                logger.info("dbus-monitor not available; idle polling won't be woken by playback or unlock signals")
+                return
+            started = time.monotonic()
+
+            try:
+                while True:
+                    line = await process.stdout.readline()
+                    if not line:
+                        break
+                    self.feed(line.decode(errors='replace'))
+            finally:
+                if process.returncode is None:
+                    process.kill()
+                await process.wait()
+
+            if time.monotonic() - started < MIN_RUN_TIME:
+                logger.info(f"dbus-monitor exited with status {process.returncode} (no session bus?); "
+                            "idle polling won't be woken by playback or unlock signals")
+                return
+            logger.warning(f"dbus-monitor exited with status {process.returncode}, restarting in {RESTART_DELAY} s")
+            await asyncio.sleep(RESTART_DELAY)
+
+    def feed(self, line):
+        """Parse one line of dbus-monitor output."""
+        stripped = line.strip()
+        if line.startswith('signal '):
+            self._member = stripped.rsplit('member=', 1)[-1] if 'member=' in stripped else None
+            self._playback_status = False
+        elif self._member == 'PropertiesChanged':
+            if stripped == 'string "PlaybackStatus"':
+                self._playback_status = True
+            elif self._playback_status and stripped.startswith('variant'):
+                self._playback_status = False
+                self.on_wake('mpris', stripped.split()[-1].strip('"'))
+        elif self._member == 'ActiveChanged' and stripped == 'boolean false':
+            self.on_wake('unlock', 'screensaver deactivated')
@@ -18,7 +18,7 @@ setup(
         ],
     },
     install_requires=[
-        'spotipy>=2.19.0',
+        'spotipy>=2.22.1',
         'pygobject>=3.42.0',
     ],
     classifiers=[
@@ -26,12 +26,11 @@ setup(
         'Intended Audience :: End Users/Desktop',
         'License :: OSI Approved :: MIT License',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.6',
         'Programming Language :: Python :: 3.7',
         'Programming Language :: Python :: 3.8',
         'Programming Language :: Python :: 3.9',
         'Programming Language :: Python :: 3.10',
         'Topic :: Multimedia :: Sound/Audio :: Players',
     ],
-    python_requires='>=3.6',
+    python_requires='>=3.7',
 )
@@ -0,0 +1,124 @@
+"""
+Desktop notifications for the Adaptive EQ tray
+
+All notifications go through one Gio.Application, registered on the session
+bus the first time a notification is sent. Each notification has an ID, so a
+newer one replaces the previous one with that ID instead of stacking up (one
+"preset applied" bubble while skipping through tracks). When more than a few
+arrive within a short window (rapid skipping, a burst of errors), the rest of
+the window is held back and sent as a single summary at its end.
+
+notify() may be called from any thread; sending always happens on the GLib
+main loop.
+"""
+
+import time
+from gi.repository import GLib, Gio
+from services.logger import get_logger
+
+# Set up logger
+logger = get_logger(__name__)
+
+APPLICATION_ID = "com.github.adaptive-eq"
+
+# Notifications sent within one window before the rest are held for a summary
+DEFAULT_BURST_LIMIT = 3
+DEFAULT_BURST_WINDOW = 2.0
+
+# Held messages listed in a summary body
+SUMMARY_LINES = 3
+
+class NotificationService:
+    """Sends tray notifications through a single registered Gio.Application."""
+
+    def __init__(self, app_id=APPLICATION_ID, burst_limit=DEFAULT_BURST_LIMIT, burst_window=DEFAULT_BURST_WINDOW):
+        """
+        Args:
+            app_id (str): Application ID to register on the session bus
+            burst_limit (int): Notifications sent immediately within one burst window
+            burst_window (float): Seconds over which bursts are counted
+        """
+        self.app_id = app_id
+        self.burst_limit = burst_limit
+        self.burst_window = burst_window
+        self._application = None
+        self._sent = []  # Monotonic times of the notifications sent in the current window
+        self._held = []  # (notification_id, title, message, notification_type) awaiting the summary
+        self._flush_source = None
+        self.stats = {'sent': 0, 'held': 0, 'summaries': 0, 'errors': 0}
+
+    def notify(self, title, message, notification_type="info", notification_id="status"):
+        """
+        Show a notification, replacing any earlier one with the same ID.
+
+        Args:
+            title (str): Notification title
+            message (str): Notification body
+            notification_type (str): "info" or "error" (sent with high priority)
+            notification_id (str): Notifications sharing an ID replace each other
+        """
+        GLib.idle_add(self._submit, notification_id, title, message, notification_type)
+
+    def _get_application(self):
+        if self._application is None:
+            application = Gio.Application.new(self.app_id, Gio.ApplicationFlags.FLAGS_NONE)
+            application.register()
+            self._application = application
+            logger.debug(f"Registered {self.app_id} for notifications")
+        return self._application
+
+    def _submit(self, notification_id, title, message, notification_type):
+        """Send now or hold for the summary (main loop)"""
+        now = time.monotonic()
+        self._sent = [sent for sent in self._sent if now - sent < self.burst_window]
+        if self._held or len(self._sent) >= self.burst_limit:
+            self._held.append((notification_id, title, message, notification_type))
+            self.stats['held'] += 1
+            if self._flush_source is None:
+                delay = self.burst_window - (now - self._sent[0]) if self._sent else self.burst_window
+                self._flush_source = GLib.timeout_add(max(1, int(delay * 1000)), self._flush)
+        else:
+            self._send(notification_id, title, message, notification_type)
+        return False  # Required for GLib.idle_add
+
+    def _flush(self):
+        """Send what was held back during a burst as one notification (main loop)"""
+        self._flush_source = None
+        held, self._held = self._held, []
+        if not held:
+            return False
+
+        notification_type = "error" if any(item[3] == "error" for item in held) else "info"
+        if len({item[0] for item in held}) == 1:
+            # All replacements of one notification; only the latest matters
+            notification_id, title, message, _ = held[-1]
+            self._send(notification_id, title, message, notification_type)
+        else:
+            # Keep the newest message per ID, most recent first
+            latest = {}
+            for notification_id, title, message, _ in reversed(held):
+                latest.setdefault(notification_id, message)
+            lines = list(latest.values())
+            body = "\n".join(lines[:SUMMARY_LINES])
+            if len(lines) > SUMMARY_LINES:
+                body += f"\n…and {len(lines) - SUMMARY_LINES} more"
+            self._send("summary", held[-1][1], body, notification_type)
+            self.stats['summaries'] += 1
+        return False  # One-shot GLib timeout
+
+    def _send(self, notification_id, title, message, notification_type):
+        self._sent.append(time.monotonic())
+        try:
+            notification = Gio.Notification.new(title)
+            notification.set_body(message)
+
+            if notification_type == "error":
+                notification.set_priority(Gio.NotificationPriority.HIGH)
+            else:
+                notification.set_priority(Gio.NotificationPriority.NORMAL)
+
+            self._get_application().send_notification(notification_id, notification)
+            self.stats['sent'] += 1
+        except Exception as e:
+            logger.error(f"Error showing notification: {e}")
+            self.stats['errors'] += 1
@@ -0,0 +1,315 @@
+"""
+Presets submenu for the Adaptive EQ tray
+
+Large libraries are grouped by name: presets sharing a leading word
+("rock-live", "rock-studio", "Rock Hall") go into a "rock" submenu, and
+groups that are still too long are split again by their next word. A group's
+items are only created the first time its submenu is opened, so building the
+menu costs what is visible rather than the size of the library.
+
+The menu is kept in sync with the preset catalog by diffing: after a rescan
+only the entries that appeared or disappeared are added or removed, and the
+changes are applied in small batches from GLib idle callbacks so a large
+library never blocks the main loop for long.
+
+A recent/frequent section at the top lists the presets applied most recently
+and most often, from usage counts kept across sessions.
+"""
+
+import os
+import re
+import json
+import time
+import bisect
+from collections import deque, defaultdict
+from gi.repository import Gtk, GLib
+from services.logger import get_logger
+
+# Set up logger
+logger = get_logger(__name__)
+
+# Menu items added or removed per idle callback
+BATCH_SIZE = 100
+
+# Menus with at most this many presets are not grouped
+FLAT_LIMIT = 30
+# Presets sharing a word needed to form a group
+MIN_GROUP_SIZE = 3
+# Nesting levels below the presets menu
+MAX_DEPTH = 3
+
+# Presets in the recent/frequent section
+RECENT_COUNT = 3
+FREQUENT_COUNT = 5
+
+USAGE_PATH = os.path.expanduser("~/.cache/adaptive-eq/preset_usage.json")
+# Presets whose usage is remembered; the least used are forgotten first
+MAX_TRACKED_PRESETS = 500
+# Seconds usage changes are collected before they are written to disk
+USAGE_SAVE_DELAY = 10
+
+_WORD_SEPARATORS = re.compile(r"[\s\-_./:]+")
+
+def _words(preset):
+    return [word.lower() for word in _WORD_SEPARATORS.split(preset) if word]
+
+def _entry_key(entry):
+    # Groups first, then presets, each alphabetically
+    kind, name = entry
+    return (0 if kind == 'group' else 1, name.lower(), name)
+
+class PresetUsage:
+    """How often and how recently each preset was applied, persisted across sessions."""
+
+    def __init__(self, path=USAGE_PATH):
+        self.path = path
+        self.usage = {}  # Preset → {'count', 'last'}
+        self._save_source = None
+
+    def load(self):
+        """Read the usage file (any thread, before the first record())"""
+        try:
+            with open(self.path, "r") as f:
+                self.usage = {preset: entry for preset, entry in json.load(f).items()
+                              if isinstance(entry, dict) and 'count' in entry}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"Could not read preset usage from {self.path}: {e}")
+
+    def record(self, preset):
+        """Count one application of a preset (UI thread)"""
+        entry = self.usage.setdefault(preset, {'count': 0, 'last': 0})
+        entry['count'] += 1
+        entry['last'] = time.time()
+        if self._save_source is None:
+            self._save_source = GLib.timeout_add_seconds(USAGE_SAVE_DELAY, self._save_later)
+
+    def top(self, recent=RECENT_COUNT, frequent=FREQUENT_COUNT):
+        """The most recently used presets, then the most used of the rest"""
+        by_recency = sorted(self.usage, key=lambda preset: self.usage[preset]['last'], reverse=True)
+        top = by_recency[:recent]
+        by_count = sorted(self.usage, key=lambda preset: (self.usage[preset]['count'], self.usage[preset]['last']),
+                          reverse=True)
+        top += [preset for preset in by_count if preset not in top][:frequent]
+        return top
+
+    def _save_later(self):
+        self._save_source = None
+        self.save()
+        return False  # One-shot GLib timeout
+
+    def save(self):
+        """Write the usage counts, forgetting the least used presets beyond MAX_TRACKED_PRESETS"""
+        if len(self.usage) > MAX_TRACKED_PRESETS:
+            keep = sorted(self.usage, key=lambda preset: (self.usage[preset]['count'], self.usage[preset]['last']),
+                          reverse=True)[:MAX_TRACKED_PRESETS]
+            self.usage = {preset: self.usage[preset] for preset in keep}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.usage, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save preset usage: {e}")
+
+class _MenuNode:
+    """
+    One level of the presets menu: presets and groups of presets. Widgets are
+    only created once the node is built (its submenu was opened).
+    """
+
+    def __init__(self, menu, on_activate, depth, batch_size, placeholder="Loading…"):
+        self.menu = menu
+        self.on_activate = on_activate
+        self.depth = depth
+        self.batch_size = batch_size
+        self.presets = set()
+        self.children = {}  # Group word → _MenuNode
+        self.built = False
+        self.leading = 0  # Fixed items in the menu before this node's entries
+        self._wanted = set()  # Entries ('group', word) or ('preset', name) the menu should show
+        self._shown = {}  # Entry → Gtk.MenuItem
+        self._order = []  # Keys of the shown entries, in menu order
+        self._pending = deque()  # ('add' or 'remove', entry) still to apply
+        self._source = None
+
+        # Shown while the menu has no entries
+        self._placeholder = Gtk.MenuItem(label=placeholder)
+        self._placeholder.set_sensitive(False)
+        self.menu.append(self._placeholder)
+        self._placeholder.show()
+
+    def _layout(self, presets):
+        """
+        Group presets by their word at this depth.
+
+        Returns:
+            tuple: (set of entries, dict of group word → member presets)
+        """
+        if len(presets) <= FLAT_LIMIT or self.depth >= MAX_DEPTH:
+            return {('preset', preset) for preset in presets}, {}
+
+        by_word = defaultdict(set)
+        entries = set()
+        for preset in presets:
+            words = _words(preset)
+            if len(words) > self.depth:
+                by_word[words[self.depth]].add(preset)
+            else:
+                entries.add(('preset', preset))
+
+        groups = {}
+        for word, members in by_word.items():
+            if len(members) >= MIN_GROUP_SIZE:
+                groups[word] = members
+                entries.add(('group', word))
+            else:
+                entries.update(('preset', preset) for preset in members)
+        return entries, groups
+
+    def update(self, presets):
+        """Set the presets under this node; widgets change only where the node is built"""
+        self.presets = set(presets)
+        self._wanted, groups = self._layout(self.presets)
+
+        # Vanished groups keep their node (emptied): a group that comes back before the
+        # pending batch runs must reuse the node whose submenu its shown item still has
+        for word in set(self.children) - set(groups):
+            self.children[word].update(())
+        for word, members in groups.items():
+            child = self.children.get(word)
+            if child is None:
+                child = self.children[word] = _MenuNode(Gtk.Menu(), self.on_activate, self.depth + 1,
+                                                        self.batch_size)
+            child.update(members)
+
+        if self.built:
+            self._schedule()
+
+    def build(self, *args):
+        """Create this node's widgets (when its submenu is first opened)"""
+        if not self.built:
+            self.built = True
+            self._schedule()
+
+    def _schedule(self):
+        # Replaces the rest of an unfinished update; the diff is against what is shown
+        removed = set(self._shown) - self._wanted
+        added = sorted(self._wanted - set(self._shown), key=_entry_key)
+        self._pending = deque([('remove', entry) for entry in removed] + [('add', entry) for entry in added])
+        if self._source is None:
+            self._source = GLib.idle_add(self._apply_batch)
+
+    def _apply_batch(self):
+        """Apply the next batch of changes (idle callback)"""
+        for _ in range(min(self.batch_size, len(self._pending))):
+            action, entry = self._pending.popleft()
+            if action == 'add':
+                self._add(entry)
+            else:
+                self._remove(entry)
+
+        if self._shown and self._placeholder.get_parent() is not None:
+            self.menu.remove(self._placeholder)
+        elif not self._shown and not self._pending:
+            self._placeholder.set_label("No presets found")
+            if self._placeholder.get_parent() is None:
+                self.menu.insert(self._placeholder, self.leading)
+
+        if self._pending:
+            return True
+        self._source = None
+        return False
+
+    def _add(self, entry):
+        if entry in self._shown:
+            return
+        kind, name = entry
+        key = _entry_key(entry)
+        index = bisect.bisect_left(self._order, key)
+        item = Gtk.MenuItem(label=name)
+        if kind == 'group':
+            child = self.children[name]
+            item.set_submenu(child.menu)
+            item.connect("activate", child.build)
+        else:
+            item.connect("activate", self.on_activate, name)
+        # The placeholder, while still shown, stays first
+        offset = self.leading + (1 if self._placeholder.get_parent() is not None else 0)
+        self.menu.insert(item, index + offset)
+        item.show()
+        self._order.insert(index, key)
+        self._shown[entry] = item
+
+    def _remove(self, entry):
+        item = self._shown.pop(entry, None)
+        if item is None:
+            return
+        del self._order[bisect.bisect_left(self._order, _entry_key(entry))]
+        item.destroy()
+
+class PresetMenu:
+    """The tray's presets menu: recent/frequent presets, then the grouped library (UI thread only)."""
+
+    def __init__(self, on_activate, usage=None, batch_size=BATCH_SIZE):
+        """
+        Args:
+            on_activate: Called as on_activate(menu_item, preset) when a preset is chosen
+            usage (PresetUsage): Usage counts for the recent/frequent section
+            batch_size (int): Items changed per idle callback
+        """
+        self.menu = Gtk.Menu()
+        self.on_activate = on_activate
+        self.usage = usage or PresetUsage()
+        self._root = _MenuNode(self.menu, on_activate, 0, batch_size, placeholder="Loading presets…")
+        self._root.build()
+        self._section = []  # Widgets of the recent/frequent section
+        self._section_presets = []
+
+    @property
+    def presets(self):
+        return self._root.presets
+
+    def update(self, presets):
+        """
+        Bring the menu in line with a freshly scanned catalog.
+
+        Returns:
+            tuple: (added, removed) preset counts
+        """
+        old = self._root.presets
+        new = set(presets)
+        self._root.update(new)
+        self.refresh_section()
+        return len(new - old), len(old - new)
+
+    def record_use(self, preset):
+        """Count an applied preset for the recent/frequent section"""
+        self.usage.record(preset)
+
+    def refresh_section(self, *args):
+        """Rebuild the recent/frequent section if its presets changed (e.g. when the menu opens)"""
+        presets = [preset for preset in self.usage.top() if preset in self._root.presets]
+        if presets == self._section_presets:
+            return
+        self._section_presets = presets
+
+        for item in self._section:
+            item.destroy()
+        self._section = []
+        if presets:
+            header = Gtk.MenuItem(label="Recent & frequent")
+            header.set_sensitive(False)
+            self._section.append(header)
+            for preset in presets:
+                item = Gtk.MenuItem(label=preset)
+                item.connect("activate", self.on_activate, preset)
+                self._section.append(item)
+            self._section.append(Gtk.SeparatorMenuItem())
+
+        for index, item in enumerate(self._section):
+            self.menu.insert(item, index)
+            item.show()
+        self._root.leading = len(self._section)
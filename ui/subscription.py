@@ -0,0 +1,107 @@
+"""
+Daemon event subscription driven by the GLib main loop
+
+The tray follows the daemon's event stream (see services/ipc.py) without a
+thread of its own: the subscription socket is non-blocking and watched with
+GLib.io_add_watch, so the main loop only wakes up when the daemon actually
+sends something, and event handlers run on the UI thread.
+"""
+
+import json
+import socket
+from gi.repository import GLib
+from services.ipc import IPCError
+from services.logger import get_logger
+
+# Set up logger
+logger = get_logger(__name__)
+
+# Bytes read from the socket per wakeup
+READ_SIZE = 65536
+
+class EventSubscription:
+    """A subscription to the daemon's events, read from the GLib main loop (UI thread only)."""
+
+    def __init__(self, path, on_event, on_disconnect):
+        """
+        Args:
+            path (str): Daemon socket path
+            on_event: Called with each event dict
+            on_disconnect: Called with an error message when the connection drops
+        """
+        self.path = path
+        self.on_event = on_event
+        self.on_disconnect = on_disconnect
+        self._sock = None
+        self._watch = None
+        self._buffer = b''
+
+    @property
+    def connected(self):
+        return self._sock is not None
+
+    def connect(self, timeout=1):
+        """
+        Connect and subscribe.
+
+        Raises:
+            IPCError: If the daemon is unreachable
+        """
+        self.close()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(self.path)
+            sock.sendall(b'{"cmd": "subscribe"}\n')
+        except OSError as e:
+            sock.close()
+            raise IPCError(f"Adaptive EQ daemon not reachable at {self.path}: {e}")
+
+        sock.setblocking(False)
+        self._sock = sock
+        self._buffer = b''
+        self._watch = GLib.io_add_watch(sock.fileno(), GLib.PRIORITY_DEFAULT,
+                                        GLib.IOCondition.IN | GLib.IOCondition.HUP | GLib.IOCondition.ERR,
+                                        self._on_readable)
+
+    def close(self):
+        if self._watch is not None:
+            GLib.source_remove(self._watch)
+            self._watch = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _on_readable(self, fd, condition):
+        try:
+            data = self._sock.recv(READ_SIZE)
+        except BlockingIOError:
+            return True
+        except OSError as e:
+            return self._lost(str(e))
+        if not data:
+            return self._lost("Connection to the Adaptive EQ daemon was closed")
+
+        *lines, self._buffer = (self._buffer + data).split(b'\n')
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                message = json.loads(line)
+            except ValueError as e:
+                logger.warning(f"Ignoring malformed message from the daemon: {e}")
+                continue
+            if 'event' not in message:
+                continue  # The reply to the subscribe request
+            try:
+                self.on_event(message)
+            except Exception as e:
+                logger.error(f"Error handling daemon event {message.get('event')}: {e}")
+        return True  # Keep watching
+
+    def _lost(self, message):
+        self._watch = None  # Removed by returning False
+        self._sock.close()
+        self._sock = None
+        self.on_disconnect(message)
+        return False
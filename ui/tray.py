@@ -3,23 +3,40 @@ gi.require_version('Gtk', '3.0')
 gi.require_version('AppIndicator3', '0.1')
 from gi.repository import Gtk, AppIndicator3, GLib, Gio
 import os
+import time
 import threading
 import signal
 import sys
-import time
 import argparse
 
 # Add parent directory to path to enable imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from services.spotify import get_current_track
-from services.eq_control import get_available_presets, apply_eq_preset, force_ui_refresh
+# Only what's needed to show the icon is imported up front; the IPC client and
+# preset catalog (services.ipc, services.eq_control) are imported on a
+# background thread once the icon is up
+from services.profiler import install_profiler, PROFILE_SIGNAL
 from services.logger import setup_logger
+from ui.notifications import NotificationService
+from ui.preset_menu import PresetMenu
 
 # Set up logger
 logger = setup_logger("adaptive_eq_tray", log_level="info")
 
+_STARTED = time.monotonic()
+
+# Quiet period after a preset directory change before the catalog is rescanned
+PRESET_RESCAN_DELAY_MS = 500
+
+# Longest wait between attempts to reach or start the daemon
+MAX_RECONNECT_DELAY = 30
+
+def _log_phase(phase):
+    """Log how long after process start a startup phase finished"""
+    logger.debug(f"Tray startup: {phase} after {(time.monotonic() - _STARTED) * 1000:.0f} ms")
+
 class AdaptiveEQTray:
     def __init__(self):
+        _log_phase("GTK loaded")
         self.app = 'adaptive-eq'
         self.indicator = AppIndicator3.Indicator.new(
             self.app,
@@ -32,16 +49,153 @@ class AdaptiveEQTray:
         self.running = True
         self.adaptive_mode = True
         self.current_preset = "None"
-        self.last_notification_id = None
+        self.status_text = None
+        self.notifications = NotificationService()
+        self.started_daemon = False
+        self._syncing_mode = False
+        self._preset_monitors = []
+        self._rescan_source = None
+        self._scan_lock = threading.Lock()
+        self._subscription = None
+        self._reconnect_delay = 1
+        self._first_event = True
+        
+        # Monitoring happens in the shared daemon; the tray only talks to it.
+        # The client is created by the background startup thread
+        self.client = None
+        self._client_ready = threading.Event()
         
-        # Initialize the menu
+        # Initialize the menu (the presets submenu is filled in once they are loaded)
         self.menu = self.create_menu()
         self.indicator.set_menu(self.menu)
+        _log_phase("icon and menu created")
+        
+        # The rest waits until the main loop is running, so the icon shows first
+        GLib.idle_add(self._start_background)
+    
+    def _start_background(self):
+        """Start the deferred startup work (UI thread, first main loop iteration)"""
+        _log_phase("main loop running")
+        thread = threading.Thread(target=self._background_startup, name="tray-startup")
+        thread.daemon = True
+        thread.start()
+        return False  # Required for GLib.idle_add
+    
+    def _background_startup(self):
+        """Connect to the daemon and load the presets off the UI thread"""
+        from services.ipc import IPCClient
+        self.client = IPCClient()
+        self._client_ready.set()
+        _log_phase("IPC client ready")
+        
+        # Before daemon events start recording preset changes into it
+        self.preset_menu.usage.load()
+        
+        # Daemon events are read by the main loop from here on
+        GLib.idle_add(self._connect_events)
+        
+        presets = self._load_presets()
+        GLib.idle_add(self._update_presets_menu, presets)
+        _log_phase(f"{len(presets)} presets loaded")
+        
+        from services.eq_control import EASYEFFECTS_PRESETS_PATH, SYSTEM_PRESETS_PATH
+        GLib.idle_add(self._watch_preset_dirs, [EASYEFFECTS_PRESETS_PATH, SYSTEM_PRESETS_PATH])
+    
+    def _load_presets(self):
+        """Read the preset catalog (background thread)"""
+        from services.eq_control import get_available_presets
+        try:
+            return get_available_presets()
+        except Exception as e:
+            logger.error(f"Error loading EQ presets: {e}")
+            return []
+    
+    def _watch_preset_dirs(self, paths):
+        """Rescan the presets when files are added to or removed from the preset directories (UI thread)"""
+        for path in paths:
+            if not os.path.isdir(path):
+                logger.debug(f"Not watching missing preset directory {path}")
+                continue
+            try:
+                monitor = Gio.File.new_for_path(path).monitor_directory(Gio.FileMonitorFlags.WATCH_MOVES, None)
+            except GLib.Error as e:
+                logger.warning(f"Cannot watch preset directory {path}: {e}")
+                continue
+            monitor.connect("changed", self._on_preset_dir_changed)
+            self._preset_monitors.append(monitor)
+        return False  # Required for GLib.idle_add
+    
+    def _on_preset_dir_changed(self, monitor, file, other_file, event_type):
+        """Schedule a rescan once a burst of directory changes has settled (UI thread)"""
+        if event_type not in (Gio.FileMonitorEvent.CREATED, Gio.FileMonitorEvent.DELETED,
+                              Gio.FileMonitorEvent.MOVED_IN, Gio.FileMonitorEvent.MOVED_OUT,
+                              Gio.FileMonitorEvent.RENAMED):
+            return  # Edits to a preset don't change the menu
+        names = [f.get_basename() for f in (file, other_file) if f is not None]
+        if not any(name.endswith('.json') for name in names):
+            return
+        if self._rescan_source is not None:
+            GLib.source_remove(self._rescan_source)
+        self._rescan_source = GLib.timeout_add(PRESET_RESCAN_DELAY_MS, self._rescan_presets)
+    
+    def _rescan_presets(self):
+        self._rescan_source = None
+        self.scan_presets()
+        return False  # One-shot GLib timeout
+    
+    def scan_presets(self, notify=False):
+        """Rescan the preset catalog on a worker thread and update the presets menu"""
+        def worker():
+            # Scans run one at a time so an older one can't overwrite a newer result
+            with self._scan_lock:
+                presets = self._load_presets()
+                GLib.idle_add(self._update_presets_menu, presets, notify)
         
-        # Start background thread for monitoring
-        self.monitor_thread = threading.Thread(target=self.monitor_spotify)
-        self.monitor_thread.daemon = True
-        self.monitor_thread.start()
+        thread = threading.Thread(target=worker, name="scan-presets")
+        thread.daemon = True
+        thread.start()
+    
+    def ensure_daemon(self):
+        """Make sure the shared daemon is running, starting it if necessary"""
+        from services.ipc import daemon_running, start_daemon
+        if daemon_running(self.client.path):
+            return True
+        
+        if getattr(sys, 'frozen', False):
+            # Bundled builds have no interpreter to start main.py with, so host the daemon here
+            import asyncio
+            from services.daemon import AdaptiveDaemon
+            profile_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'eq_profiles.json')
+            daemon = AdaptiveDaemon(profile_path=profile_path, force_refresh=True, socket_path=self.client.path)
+            thread = threading.Thread(target=lambda: asyncio.run(daemon.run()), name="adaptive-daemon")
+            thread.daemon = True
+            thread.start()
+            for _ in range(100):
+                if daemon_running(self.client.path):
+                    return True
+                time.sleep(0.1)
+            return False
+        
+        self.started_daemon = start_daemon(self.client.path)
+        return self.started_daemon
+    
+    def request(self, cmd, on_done=None, **args):
+        """Send a command to the daemon without blocking the UI; on_done(result, error) runs in the UI thread"""
+        def worker():
+            result, error = None, None
+            from services.ipc import IPCError
+            self._client_ready.wait()
+            try:
+                result = self.client.request(cmd, timeout=60, **args)
+            except IPCError as e:
+                logger.error(f"Daemon request {cmd} failed: {e}")
+                error = e
+            if on_done:
+                GLib.idle_add(on_done, result, error)
+        
+        thread = threading.Thread(target=worker, name=f"ipc-{cmd}")
+        thread.daemon = True
+        thread.start()
     
     def create_menu(self):
         """Create the tray icon menu"""
@@ -67,19 +221,12 @@ class AdaptiveEQTray:
         
         menu.append(Gtk.SeparatorMenuItem())
         
-        # Manual EQ preset selection submenu
-        presets_item = Gtk.MenuItem(label="EQ Presets")
-        presets_menu = Gtk.Menu()
-        
-        # Add all available presets
-        presets = get_available_presets()
-        for preset in presets:
-            preset_item = Gtk.MenuItem(label=preset)
-            preset_item.connect("activate", self.apply_preset, preset)
-            presets_menu.append(preset_item)
-        
-        presets_item.set_submenu(presets_menu)
-        menu.append(presets_item)
+        # Manual EQ preset selection submenu, filled in once the presets are scanned
+        self.presets_item = Gtk.MenuItem(label="EQ Presets")
+        self.preset_menu = PresetMenu(self.apply_preset)
+        self.presets_item.set_submenu(self.preset_menu.menu)
+        self.presets_item.connect("activate", self.preset_menu.refresh_section)
+        menu.append(self.presets_item)
         
         # Add option to refresh profiles
         refresh_item = Gtk.MenuItem(label="Refresh Profiles")
@@ -110,61 +257,60 @@ class AdaptiveEQTray:
         menu.append(quit_item)
         
         menu.show_all()
+        # Opening the menu asks for fresh status; this also ends the daemon's idle backoff
+        menu.connect("show", self._on_menu_shown)
         return menu
     
+    def _on_menu_shown(self, menu):
+        self.request('wake', source='tray')
+    
     def toggle_adaptive(self, widget):
         """Toggle adaptive mode on/off"""
+        if self._syncing_mode:
+            return
         self.adaptive_mode = widget.get_active()
+        self.request('set_mode', adaptive=self.adaptive_mode)
         if self.adaptive_mode:
             logger.info("Adaptive EQ mode enabled")
-            self.show_notification("Adaptive EQ", "Adaptive EQ mode enabled")
+            self.show_notification("Adaptive EQ", "Adaptive EQ mode enabled", notification_id="mode")
         else:
             logger.info("Adaptive EQ mode disabled (manual mode)")
-            self.show_notification("Adaptive EQ", "Manual EQ mode enabled")
+            self.show_notification("Adaptive EQ", "Manual EQ mode enabled", notification_id="mode")
     
     def apply_preset(self, widget, preset_name):
         """Apply a specific EQ preset manually"""
-        success = apply_eq_preset(preset_name, force_ui_refresh=True)
-        if success:
-            self.current_preset = preset_name
-            self.update_preset_status(preset_name)
-            self.show_notification("Adaptive EQ", f"Applied preset: {preset_name}")
-            return True
-        else:
-            self.show_notification("Adaptive EQ", f"Failed to apply preset: {preset_name}", "error")
+        def done(success, error):
+            if success:
+                self.show_notification("Adaptive EQ", f"Applied preset: {preset_name}", notification_id="preset")
+            else:
+                self.show_notification("Adaptive EQ", f"Failed to apply preset: {preset_name}", "error", "preset")
             return False
+        
+        self.request('set_preset', done, preset=preset_name)
     
     def refresh_profiles(self, widget=None):
         """Refresh the EQ profiles and presets"""
-        # Rebuild the presets submenu
-        presets_item = None
-        for item in self.menu.get_children():
-            if isinstance(item, Gtk.MenuItem) and item.get_label() == "EQ Presets":
-                presets_item = item
-                break
-        
-        if presets_item:
-            presets_menu = Gtk.Menu()
-            presets = get_available_presets()
-            for preset in presets:
-                preset_item = Gtk.MenuItem(label=preset)
-                preset_item.connect("activate", self.apply_preset, preset)
-                presets_menu.append(preset_item)
-            
-            presets_menu.show_all()
-            presets_item.set_submenu(presets_menu)
-            
-            self.show_notification("Adaptive EQ", "Profiles refreshed")
+        # The menu also follows the preset directories on its own; this forces a rescan
+        self.scan_presets(notify=True)
+    
+    def _update_presets_menu(self, presets, notify=False):
+        """Apply a scanned catalog to the presets menu (UI thread)"""
+        added, removed = self.preset_menu.update(presets)
+        if added or removed:
+            logger.debug(f"Presets menu: {added} added, {removed} removed")
+        if notify:
+            self.show_notification("Adaptive EQ", "Profiles refreshed", notification_id="profiles")
+        return False  # Required for GLib.idle_add
     
     def create_eq_presets(self, widget=None):
         """Launch the create_eq_presets.py script"""
         try:
             import subprocess
             subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'create_eq_presets.py'), '--all'])
-            self.show_notification("Adaptive EQ", "Creating EQ presets...", "info")
+            self.show_notification("Adaptive EQ", "Creating EQ presets...", "info", "create-presets")
         except Exception as e:
             logger.error(f"Error launching create_eq_presets.py: {e}")
-            self.show_notification("Adaptive EQ", f"Error creating presets: {e}", "error")
+            self.show_notification("Adaptive EQ", f"Error creating presets: {e}", "error", "create-presets")
     
     def configure_spotify(self, widget=None):
         """Launch the configure_spotify.py script"""
@@ -173,39 +319,43 @@ class AdaptiveEQTray:
             subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'configure_spotify.py')])
         except Exception as e:
             logger.error(f"Error launching configure_spotify.py: {e}")
-            self.show_notification("Adaptive EQ", f"Error configuring Spotify: {e}", "error")
+            self.show_notification("Adaptive EQ", f"Error configuring Spotify: {e}", "error", "configure")
     
     def force_refresh(self, widget=None):
         """Force EasyEffects UI to refresh"""
         logger.info("Manually forcing EasyEffects UI refresh")
-        if force_ui_refresh():
-            self.show_notification("Adaptive EQ", "EasyEffects UI refresh triggered", "info")
-        else:
-            self.show_notification("Adaptive EQ", "EasyEffects not running, nothing to refresh", "info")
-            
-        # Also reapply the current preset if one is active
-        if self.current_preset and self.current_preset != "None":
-            logger.info(f"Reapplying current preset: {self.current_preset}")
-            apply_eq_preset(self.current_preset, force_ui_refresh=True)
-            self.show_notification("Adaptive EQ", f"Reapplied preset: {self.current_preset}")
+        
+        def done(reapplied, error):
+            if error:
+                self.show_notification("Adaptive EQ", f"EasyEffects refresh failed: {error}", "error", "refresh")
+            elif reapplied:
+                self.show_notification("Adaptive EQ", f"Reapplied preset: {self.current_preset}", notification_id="refresh")
+            else:
+                self.show_notification("Adaptive EQ", "EasyEffects UI refresh triggered", "info", "refresh")
+            return False
+        
+        # The daemon refreshes the UI and reapplies the current preset if one is active
+        self.request('refresh', done)
     
     def update_status(self, track_info=None):
-        """Update the status display in the menu"""
+        """Update the status display in the menu (UI thread)"""
         if track_info:
             status_text = f"▶️ {track_info['artist']} - {track_info['track']}"
         else:
             status_text = "No track playing"
-            
-        # Update in the UI thread
-        GLib.idle_add(self._update_status_ui, status_text)
+        self._update_status_ui(status_text)
     
     def update_preset_status(self, preset_name):
-        """Update the preset status display in the menu"""
-        GLib.idle_add(self._update_preset_ui, preset_name)
+        """Update the preset status display in the menu (UI thread)"""
+        if preset_name != self.current_preset:
+            self.current_preset = preset_name
+            self._update_preset_ui(preset_name)
     
     def _update_status_ui(self, status_text):
         """Update UI elements (must be called from UI thread)"""
-        self.status_item.set_label(status_text)
+        if status_text != self.status_text:
+            self.status_text = status_text
+            self.status_item.set_label(status_text)
         return False  # Required for GLib.idle_add
     
     def _update_preset_ui(self, preset_name):
@@ -213,97 +363,121 @@ class AdaptiveEQTray:
         self.preset_item.set_label(f"Current EQ: {preset_name}")
         return False  # Required for GLib.idle_add
     
-    def show_notification(self, title, message, notification_type="info"):
-        """Show a desktop notification"""
+    def show_notification(self, title, message, notification_type="info", notification_id="status"):
+        """Show a desktop notification, replacing the previous one with the same ID (any thread)"""
+        self.notifications.notify(title, message, notification_type, notification_id)
+    
+    def set_adaptive_ui(self, adaptive):
+        """Reflect the daemon's adaptive mode without sending it back (UI thread)"""
+        if adaptive == self.adaptive_mode and adaptive == self.adaptive_item.get_active():
+            return
+        self.adaptive_mode = adaptive
+        self._syncing_mode = True
+        self.adaptive_item.set_active(adaptive)
+        self._syncing_mode = False
+    
+    def handle_event(self, event):
+        """Handle an event pushed by the daemon (UI thread)"""
+        kind = event.get('event')
+        if kind == 'status':
+            self.set_adaptive_ui(event['adaptive'])
+            self.update_status(event['track'])
+            if event['preset']:
+                self.update_preset_status(event['preset'])
+        elif kind == 'track':
+            self.update_status(event['track'])
+        elif kind == 'preset':
+            self.preset_menu.record_use(event['preset'])
+            self.update_preset_status(event['preset'])
+            # Show notification for adaptive preset changes (manual ones notify themselves)
+            if event['artist'] and not event.get('manual'):
+                self.show_notification("Adaptive EQ", f"Applied '{event['preset']}' preset for {event['artist']}",
+                                       notification_id="preset")
+        elif kind == 'apply_failed' and not event.get('manual'):
+            self.show_notification("Adaptive EQ", f"Failed to apply preset: {event['preset']}", "error", "preset")
+        elif kind == 'mode':
+            self.set_adaptive_ui(event['adaptive'])
+        elif kind == 'error':
+            self.show_notification(
+                "Adaptive EQ Error",
+                f"{event['message']}. Please check your Spotify connection.",
+                "error",
+                "connection"
+            )
+        return False  # Required for GLib.idle_add
+    
+    def _connect_events(self):
+        """Subscribe to the daemon's events, read from the main loop (UI thread)"""
+        from services.ipc import IPCError
+        from ui.subscription import EventSubscription
+        if self._subscription is None:
+            self._subscription = EventSubscription(self.client.path, self._on_daemon_event, self._on_daemon_lost)
         try:
-            notification = Gio.Notification.new(title)
-            notification.set_body(message)
-            
-            if notification_type == "error":
-                notification.set_priority(Gio.NotificationPriority.HIGH)
-            else:
-                notification.set_priority(Gio.NotificationPriority.NORMAL)
-            
-            # Create a new application object for notifications
-            application = Gio.Application.new("com.github.adaptive-eq", Gio.ApplicationFlags.FLAGS_NONE)
-            application.register()
-            application.send_notification(None, notification)
-        except Exception as e:
-            logger.error(f"Error showing notification: {e}")
+            self._subscription.connect()
+        except IPCError as e:
+            self._on_daemon_lost(str(e))
+        return False  # Required for GLib.idle_add / one-shot GLib timeout
     
-    def monitor_spotify(self):
-        """Background thread that monitors Spotify and applies EQ profiles"""
-        import json
-        import os
-
-        # Load EQ profile mapping (artist → preset)
-        profile_map = {}
-        profile_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'eq_profiles.json')
-        if os.path.exists(profile_path):
-            with open(profile_path, "r") as f:
-                profile_map = json.load(f)
+    def _on_daemon_event(self, event):
+        if self._first_event:
+            self._first_event = False
+            _log_phase("first daemon status received")
+        self._reconnect_delay = 1
+        self.handle_event(event)
+    
+    def _on_daemon_lost(self, message):
+        """Start the daemon if needed and reconnect, backing off while it can't be reached (UI thread)"""
+        if not self.running:
+            return
+        logger.warning(f"Lost connection to the Adaptive EQ daemon: {message}")
+        self._update_status_ui("Adaptive EQ daemon not running")
         
-        logger.info(f"Loaded {len(profile_map)} artist → preset mappings")
-        last_artist = None
-        current_preset = None
-        retry_count = 0
-        max_retries = 3
-
-        while self.running:
-            try:
-                track = get_current_track()
-                retry_count = 0  # Reset retry counter on successful API call
-                self.update_status(track)
-
-                if track and self.adaptive_mode:
-                    artist = track.get("artist")
-                    if artist != last_artist:
-                        logger.info(f"Detected new artist: {artist}")
-                        preset = profile_map.get(artist, "default")
-                        
-                        # Only change preset if it's different from the current one
-                        if preset != current_preset:
-                            logger.info(f"Applying EQ preset: {preset}")
-                            success = apply_eq_preset(preset, force_ui_refresh=True)
-                            if success:
-                                logger.info(f"Successfully applied EQ preset: {preset} for artist: {artist}")
-                                current_preset = preset
-                                self.current_preset = preset
-                                self.update_preset_status(preset)
-                                
-                                # Show notification for preset change
-                                self.show_notification(
-                                    "Adaptive EQ", 
-                                    f"Applied '{preset}' preset for {artist}"
-                                )
-                            else:
-                                logger.warning(f"Failed to apply EQ preset: {preset} for artist: {artist}")
-                        else:
-                            logger.info(f"Preset {preset} already active, skipping application")
-                        
-                        last_artist = artist
-            except Exception as e:
-                retry_count += 1
-                logger.error(f"Error in monitor_spotify: {e}")
-                if retry_count >= max_retries:
-                    self.show_notification(
-                        "Adaptive EQ Error", 
-                        f"Failed to connect to Spotify after {max_retries} attempts. Please check your Spotify connection.",
-                        "error"
-                    )
-                    retry_count = 0  # Reset after showing notification
-                    
-            time.sleep(5)
+        def worker():
+            # Starting the daemon waits for it to answer; keep that off the UI thread
+            running = self.ensure_daemon()
+            GLib.idle_add(self._on_daemon_checked, running)
+        
+        thread = threading.Thread(target=worker, name="ensure-daemon")
+        thread.daemon = True
+        thread.start()
+    
+    def _on_daemon_checked(self, running):
+        if not self.running:
+            return False
+        if running and self._reconnect_delay == 1:
+            self._connect_events()
+        else:
+            # Also when the daemon answers but the subscription keeps failing
+            GLib.timeout_add_seconds(self._reconnect_delay, self._connect_events)
+        # Reset by the first event of a working subscription
+        self._reconnect_delay = min(self._reconnect_delay * 2, MAX_RECONNECT_DELAY)
+        return False  # Required for GLib.idle_add
     
     def quit(self, widget):
         """Quit the application"""
         self.running = False
+        if self._subscription is not None:
+            self._subscription.close()
+        self.preset_menu.usage.save()
+        if self.started_daemon:
+            # Other clients may still use a daemon the tray didn't start; only stop our own
+            from services.ipc import IPCError
+            try:
+                self.client.request('shutdown', timeout=2)
+            except IPCError as e:
+                logger.warning(f"Could not stop the Adaptive EQ daemon: {e}")
         Gtk.main_quit()
 
 def main():
     # Set up signal handling for clean exit
     signal.signal(signal.SIGINT, signal.SIG_DFL)
     
+    # ADAPTIVE_EQ_PROFILE=1 profiles from the start; SIGUSR2 toggles profiling.
+    # The signal goes through GLib because Python handlers can't run inside Gtk.main()
+    profiler = install_profiler(install_signal_handler=False)
+    GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, PROFILE_SIGNAL,
+                         lambda: threading.Thread(target=profiler.toggle).start() or True)
+    
     # Start the tray application
     app = AdaptiveEQTray()
     Gtk.main()
@@ -8,7 +8,7 @@ by asking for user feedback.
 
 import sys
 import time
-import subprocess
+from services.commands import run_command, start_command
 from services.eq_control import get_available_presets, apply_eq_preset, force_ui_refresh
 from services.logger import setup_logger
 
@@ -17,19 +17,11 @@ logger = setup_logger("verify_ui_sync", log_level="info")
 
 def ensure_easyeffects_running():
     """Make sure EasyEffects is running"""
-    is_running = subprocess.run(
-        ["pgrep", "-f", "easyeffects"], 
-        capture_output=True, 
-        text=True
-    ).returncode == 0
+    is_running = run_command(["pgrep", "-f", "easyeffects"]).returncode == 0
     
     if not is_running:
         logger.info("Starting EasyEffects...")
-        subprocess.Popen(
-            ["easyeffects"], 
-            stdout=subprocess.DEVNULL, 
-            stderr=subprocess.DEVNULL
-        )
+        start_command(["easyeffects"])
         time.sleep(2)  # Wait for it to start
 
 def test_ui_sync():